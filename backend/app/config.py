@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pathlib import Path
 
 # Get the directory where this config.py file is located
@@ -22,6 +22,109 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "uploads/videos"
     MAX_VIDEO_SIZE_MB: int = 500
     ALLOWED_VIDEO_FORMATS: List[str] = ["mp4", "webm", "mov"]
+    # Uploads are copied (and hashed) in chunks of this size
+    UPLOAD_CHUNK_SIZE_KB: int = 1024
+
+    # Frame extraction
+    FRAME_INTERVAL_SECONDS: float = 2.0
+    # "sequential" decodes every frame, "grab" skips retrieve() for unused frames,
+    # "seek" jumps to each sample point (fastest when the interval is longer than the GOP),
+    # "auto" picks seek or grab from the video's keyframe interval
+    FRAME_SAMPLING_MODE: str = "auto"
+    # "opencv" (cv2.VideoCapture) or "ffmpeg" (rawvideo pipe, samples and downscales inside ffmpeg)
+    FRAME_DECODER: str = "opencv"
+    # ffmpeg decoder only: decode I-frames only (samples may lag by up to one GOP)
+    FRAME_KEYFRAMES_ONLY: bool = False
+    # Downscale wider frames before JPEG encoding (0 = keep source resolution)
+    FRAME_MAX_WIDTH: int = 0
+    FRAME_JPEG_QUALITY: int = 85
+    # Only keep samples at scene changes (0 = keep every sample), with a max gap safety net
+    FRAME_SCENE_THRESHOLD: float = 0.0
+    FRAME_SCENE_MAX_GAP_SECONDS: float = 30.0
+    # Collapse runs of near-identical frames (dHash Hamming distance) before analysis
+    FRAME_DEDUP_ENABLED: bool = True
+    FRAME_DEDUP_MAX_DISTANCE: int = 4
+    # Processes decoding time-range shards, in one pool shared by all analyses
+    # (1 = decode in a thread of the API process). 1 by default: that thread already
+    # keeps decoding off the event loop, while a pool spawns this many decoder processes
+    # per uvicorn worker, so set it from the cores a host can give each API process
+    FRAME_EXTRACTION_WORKERS: int = 1
+    # Frames decoded ahead of the consumer when streaming (0 = decode inline)
+    FRAME_QUEUE_DEPTH: int = 16
+    # On-disk cache of extracted frames, keyed by video content hash + sampling parameters
+    FRAME_CACHE_ENABLED: bool = True
+    FRAME_CACHE_DIR: str = "data/frame_cache"
+    FRAME_CACHE_MAX_MB: int = 2048
+    # Region-of-interest cropping: attributes are grouped by screen region and each
+    # group is sent only its cropped tiles. Regions: "top-right 20%", "bottom 15%",
+    # "full", or fractions "x,y,width,height". Unlisted attributes get the full frame.
+    ROI_CROPPING_ENABLED: bool = False
+    ROI_PROFILES: Dict[str, str] = {
+        "Main Logo": "top-right 20%",
+        "Copyright": "bottom 15%",
+        "Scoreboard": "top 25%",
+    }
+    ROI_TILE_MAX_WIDTH: int = 640
+    # Contact-sheet mode: tile frames into COLUMNS x ROWS grid images with frame numbers burned in
+    CONTACT_SHEET_ENABLED: bool = False
+    CONTACT_SHEET_COLUMNS: int = 4
+    CONTACT_SHEET_ROWS: int = 4
+    CONTACT_SHEET_CELL_WIDTH: int = 320
+    # Coarse-to-fine analysis: after the pass at FRAME_INTERVAL_SECONDS, re-extract the
+    # interval before each detection at REFINE_INTERVAL_SECONDS to find the transition frame
+    REFINEMENT_ENABLED: bool = False
+    REFINE_INTERVAL_SECONDS: float = 0.25
+    # Local template pre-detection: {TEMPLATE_LIBRARY_DIR}/{video_family}/{attribute}/*.png
+    TEMPLATE_LIBRARY_DIR: str = "data/templates"
+    TEMPLATE_MATCH_THRESHOLD: float = 0.85   # >= : present
+    TEMPLATE_REJECT_THRESHOLD: float = 0.5   # <= : absent, in between: ask Gemini
+    # Background analysis jobs (in-process: poll status on the worker that accepted the job)
+    ANALYSIS_MAX_CONCURRENT_JOBS: int = 2
+    ANALYSIS_FINISHED_JOBS_KEPT: int = 100
+    ANALYSIS_SSE_KEEPALIVE_SECONDS: float = 15.0
+    # Threads for blocking work (hashing, database, sync model calls) kept off the event loop
+    BLOCKING_IO_THREADS: int = 16
+    # Reuse stored results for identical content + attributes, and let identical
+    # requests wait for one in-flight analysis instead of running their own
+    ANALYSIS_DEDUP_ENABLED: bool = True
+    # Save analysis job progress per completed window, so jobs whose worker stopped
+    # (no heartbeat for ANALYSIS_RESUME_AFTER_SECONDS) are resumed by another worker
+    ANALYSIS_CHECKPOINTS_ENABLED: bool = True
+    ANALYSIS_HEARTBEAT_SECONDS: float = 30.0
+    ANALYSIS_RESUME_AFTER_SECONDS: float = 120.0
+    # "frames" sends sampled JPEGs; "clip" sends each window as a low-bitrate proxy video
+    GEMINI_INPUT_MODE: str = "frames"
+    GEMINI_CLIP_WINDOW_SECONDS: float = 600.0
+    GEMINI_CLIP_OVERLAP_SECONDS: float = 10.0
+    PROXY_CLIP_FPS: float = 1.0
+    PROXY_CLIP_MAX_WIDTH: int = 480
+    PROXY_CLIP_CRF: int = 35
+    # Frames per Gemini request when analysing a frame stream
+    GEMINI_WINDOW_FRAMES: int = 300
+    # Frames repeated from the end of the previous window, so edge transitions keep context
+    GEMINI_WINDOW_OVERLAP_FRAMES: int = 5
+    # Windows analysed concurrently through the async client
+    GEMINI_MAX_CONCURRENCY: int = 4
+    # Same-attribute events closer than this are merged (temporal NMS, highest confidence wins)
+    GEMINI_MERGE_SECONDS: float = 4.0
+    # Persistent cache of Gemini responses for identical requests (e.g. retried uploads)
+    GEMINI_CACHE_ENABLED: bool = True
+    GEMINI_CACHE_PATH: str = "data/gemini_cache.db"
+    GEMINI_CACHE_MAX_MB: int = 256
+    GEMINI_CACHE_TTL_HOURS: float = 168.0
+    # Process-wide Vertex AI quota (0 = unlimited) and resilience for every model call
+    GEMINI_REQUESTS_PER_MINUTE: int = 60
+    GEMINI_TOKENS_PER_MINUTE: int = 0
+    GEMINI_MAX_ATTEMPTS: int = 5                 # Retries 408/429/5xx with jittered exponential backoff
+    GEMINI_RETRY_MAX_WAIT_SECONDS: float = 30.0
+    GEMINI_CIRCUIT_FAILURE_THRESHOLD: int = 5    # Consecutive failures before failing fast
+    GEMINI_CIRCUIT_RESET_SECONDS: float = 30.0
+    GEMINI_METRICS_RECENT_CALLS: int = 500       # Per-call records kept for GET /api/videos/analyze/metrics
+    # "vertex", "stub" (local Gemini API stub at MODEL_STUB_URL, see app/services/model_stub.py),
+    # "record" (Vertex AI, exchanges appended to MODEL_RECORDING_PATH) or "replay" (recording only)
+    MODEL_BACKEND: str = "vertex"
+    MODEL_STUB_URL: str = "http://127.0.0.1:8090"
+    MODEL_RECORDING_PATH: str = "data/model_recording.jsonl"
 
     # Video asset serving
     # Local dev: path relative to where uvicorn runs (backend/)
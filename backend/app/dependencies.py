@@ -0,0 +1,133 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional
+import multiprocessing
+import os
+import logging
+
+from fastapi import Request
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.analysis_checkpoints import CheckpointStore
+from app.services.analysis_jobs import AnalysisJobManager
+from app.services.call_guard import CallGuard, CircuitBreaker
+from app.services.call_metrics import CallMetrics
+from app.services.model_backends import create_model_client
+from app.services.response_cache import ResponseCache
+from app.services.upload_store import UploadStore
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def create_genai_client():
+    """
+    Build the model client shared by the whole app (see the lifespan hook in
+    app.main) for the configured MODEL_BACKEND: credential discovery and TLS
+    setup happen once and its HTTP connections are reused by every request.
+    """
+    if settings.MODEL_BACKEND in ("vertex", "record"):
+        if not settings.GOOGLE_CLOUD_PROJECT:
+            logger.warning("GOOGLE_CLOUD_PROJECT not set. Gemini calls will fail.")
+            return None
+
+        # Set service account credentials if provided
+        if settings.GOOGLE_APPLICATION_CREDENTIALS:
+            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = settings.GOOGLE_APPLICATION_CREDENTIALS
+            logger.info(f"Using service account credentials from: {settings.GOOGLE_APPLICATION_CREDENTIALS}")
+
+    logger.info(f"Using model backend: {settings.MODEL_BACKEND}")
+    return create_model_client(
+        settings.MODEL_BACKEND,
+        project=settings.GOOGLE_CLOUD_PROJECT,
+        location=settings.GOOGLE_CLOUD_LOCATION,
+        stub_url=settings.MODEL_STUB_URL,
+        recording_path=settings.MODEL_RECORDING_PATH
+    )
+
+
+def create_decode_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Process pool that decodes frame shards for every analysis (see the lifespan hook
+    in app.main). Workers start with the first analysis and are reused after that.
+    None with FRAME_EXTRACTION_WORKERS=1: frames are then decoded in a thread.
+    """
+    if settings.FRAME_EXTRACTION_WORKERS <= 1:
+        return None
+    # spawn: forking a process that already holds decoder threads is not safe
+    return ProcessPoolExecutor(
+        max_workers=settings.FRAME_EXTRACTION_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def get_genai_client(request: Request):
+    return request.app.state.genai_client
+
+
+def get_job_manager(request: Request) -> AnalysisJobManager:
+    return request.app.state.job_manager
+
+
+def get_decode_pool(request: Request) -> Optional[Executor]:
+    return request.app.state.decode_pool
+
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> Optional[ResponseCache]:
+    """One response cache per process, so its hit/miss counters cover every analysis."""
+    if not settings.GEMINI_CACHE_ENABLED:
+        return None
+    return ResponseCache(
+        settings.GEMINI_CACHE_PATH,
+        max_bytes=settings.GEMINI_CACHE_MAX_MB * 1024 * 1024,
+        ttl_seconds=settings.GEMINI_CACHE_TTL_HOURS * 3600
+    )
+
+
+@lru_cache(maxsize=1)
+def get_upload_store() -> UploadStore:
+    return UploadStore(
+        settings.UPLOAD_DIR,
+        max_bytes=settings.MAX_VIDEO_SIZE_MB * 1024 * 1024,
+        allowed_formats=settings.ALLOWED_VIDEO_FORMATS,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE_KB * 1024
+    )
+
+
+@lru_cache(maxsize=1)
+def get_call_guard() -> CallGuard:
+    """Process-wide guard, so every analysis and feedback call shares one quota and breaker."""
+    return CallGuard(
+        requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+        tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE,
+        max_attempts=settings.GEMINI_MAX_ATTEMPTS,
+        max_wait_seconds=settings.GEMINI_RETRY_MAX_WAIT_SECONDS,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.GEMINI_CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=settings.GEMINI_CIRCUIT_RESET_SECONDS
+        )
+    )
+
+
+@lru_cache(maxsize=1)
+def get_analysis_flights() -> Optional[SingleFlight]:
+    """Analyses in progress in this process, by analysis key (see AnalysisPipeline.run)."""
+    if not settings.ANALYSIS_DEDUP_ENABLED:
+        return None
+    return SingleFlight()
+
+
+@lru_cache(maxsize=1)
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """This worker's view of analysis job checkpoints; its owner id tells workers apart."""
+    if not settings.ANALYSIS_CHECKPOINTS_ENABLED:
+        return None
+    return CheckpointStore(SessionLocal)
+
+
+@lru_cache(maxsize=1)
+def get_call_metrics() -> CallMetrics:
+    """Process-wide model call metrics; per-analysis collectors pass their records up to it."""
+    return CallMetrics(max_recent=settings.GEMINI_METRICS_RECENT_CALLS)
@@ -1,9 +1,30 @@
+from sqlalchemy import inspect, text
+
 from app.database import engine, Base
 from app.models import *
 
+def upgrade_schema():
+    """
+    create_all() never alters existing tables, so add any model columns
+    missing from an older database (additive changes only).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                print(f"Added column {table.name}.{column.name}")
+
 def init():
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
     print("Tables created successfully.")
 
 if __name__ == "__main__":
@@ -1,13 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 from app.config import settings
+from app.dependencies import create_decode_pool, create_genai_client
+from app.services.analysis_jobs import AnalysisJobManager
+from app.services.upload_store import FORM_OVERHEAD_BYTES, UploadSizeLimitMiddleware
 from app.routes import video_analysis, events, sessions, video_list, video_serve
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bounded pool behind asyncio.to_thread, which analyses use for their blocking steps
+    blocking_io = ThreadPoolExecutor(max_workers=settings.BLOCKING_IO_THREADS, thread_name_prefix="blocking-io")
+    asyncio.get_running_loop().set_default_executor(blocking_io)
+    # Frame decoding runs in worker processes, not on the API process's GIL
+    app.state.decode_pool = create_decode_pool()
+    # One Vertex AI client for the app's lifetime, shared via app.dependencies.get_genai_client
+    app.state.genai_client = create_genai_client()
+    # Background analysis jobs (POST /api/videos/analyze/jobs), cancelled on shutdown
+    app.state.job_manager = AnalysisJobManager(
+        max_concurrent_jobs=settings.ANALYSIS_MAX_CONCURRENT_JOBS,
+        max_finished_jobs=settings.ANALYSIS_FINISHED_JOBS_KEPT
+    )
+    # Jobs whose worker stopped are resumed here from their checkpoints
+    resume_task = asyncio.create_task(video_analysis.resume_interrupted_jobs(app))
+    yield
+    resume_task.cancel()
+    await app.state.job_manager.shutdown()
+    if app.state.decode_pool is not None:
+        app.state.decode_pool.shutdown(cancel_futures=True)
+    if app.state.genai_client is not None:
+        app.state.genai_client.close()
+        await app.state.genai_client.aio.aclose()
+
 app = FastAPI(
     title="EPG Training Feedback Loop API",
     description="API for EPG training video analysis and feedback",
     version="0.1.0",
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 app.include_router(video_analysis.router)
@@ -16,6 +48,13 @@ app.include_router(sessions.router)
 app.include_router(video_list.router)
 app.include_router(video_serve.router)
 
+# Refuse oversized video uploads before their body is read (UploadStore enforces the exact limit)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=settings.MAX_VIDEO_SIZE_MB * 1024 * 1024 + FORM_OVERHEAD_BYTES,
+    path_prefix="/api/videos/analyze"
+)
+
 # CORS Setup
 app.add_middleware(
     CORSMiddleware,
@@ -1,5 +1,8 @@
 from .video import Video
 from .event import GroundTruthEvent
+from .draft_event import DraftEvent
 from .user import User
 from .session import TrainingSession
 from .attempt import UserAttempt
+from .analysis_result import AnalysisResult
+from .analysis_checkpoint import AnalysisCheckpoint
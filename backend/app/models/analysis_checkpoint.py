@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class AnalysisCheckpoint(Base):
+    """
+    Progress of an analysis job, saved per completed window so a job whose worker
+    stopped can be resumed (see CheckpointStore).
+    """
+    __tablename__ = "analysis_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, unique=True, index=True)
+    status = Column(String, default='queued', index=True) # 'queued', 'running', 'completed', 'failed'
+    owner = Column(String) # Worker process running the job
+    heartbeat_at = Column(Float) # Unix time; stale heartbeats mark orphaned jobs
+
+    # The request, enough to start the job again
+    video_path = Column(String) # Upload kept until the job finishes
+    filename = Column(String)
+    broadcast_start_time = Column(String)
+    attributes = Column(Text) # JSON list, as requested
+    video_family = Column(String, nullable=True)
+    content_hash = Column(String)
+    reanalyze = Column(Boolean, default=False)
+
+    # Progress, valid for analysis_key only (settings may change between runs)
+    analysis_key = Column(String, nullable=True)
+    resume_from_seconds = Column(Float, default=0.0)
+    frames_done = Column(Integer, default=0)
+    windows_done = Column(Integer, default=0)
+    events_json = Column(Text, default="[]") # Events of completed windows, unmerged
+    resumed_count = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class AnalysisResult(Base):
+    """
+    Events found by a completed analysis, keyed by what determines them (see
+    analysis_key in app.services.analysis_pipeline), so the same content
+    uploaded again is answered without extraction or model calls.
+    """
+    __tablename__ = "analysis_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_key = Column(String, unique=True, index=True)
+    content_hash = Column(String, index=True) # SHA-256 of the video file
+    attributes = Column(String) # Comma-separated, sorted
+    video_family = Column(String, nullable=True)
+    video_id = Column(String) # Video the analysis first ran for
+    duration_seconds = Column(Float)
+    frames_analyzed = Column(Integer)
+    events_json = Column(Text) # Detected events before ground truth formatting
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
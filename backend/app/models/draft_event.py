@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class DraftEvent(Base):
+    """
+    An event streamed in by an analysis job still running (see EventRecorder), shown
+    as its partial events by the job status. Drafts stay apart from GroundTruthEvent,
+    so a video's ground truth is only replaced once an analysis completes; a failed
+    job's drafts are what it found.
+    """
+    __tablename__ = "draft_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, index=True) # Analysis job id
+    video_id = Column(String, index=True)
+    attribute = Column(String)
+    timestamp_seconds = Column(Float)
+    live_clock_time = Column(String)
+    clue_description = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -12,6 +12,16 @@ class Video(Base):
     file_path = Column(String)
     duration_seconds = Column(Float)
     broadcast_start_time = Column(String) # ISO format: "2026-02-11T19:00:00"
+    
+    # Container metadata from VideoProbe, stored so it is only read once per file
+    content_hash = Column(String, nullable=True, index=True) # SHA-256 of the file
+    fps = Column(Float, nullable=True)
+    frame_count = Column(Integer, nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    codec = Column(String, nullable=True)
+    # analysis_key of the analysis whose events are saved for this video
+    analysis_key = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     events = relationship("GroundTruthEvent", back_populates="video")
@@ -4,12 +4,12 @@ from app.database import get_db
 from app.models import TrainingSession, GroundTruthEvent, UserAttempt
 from app.schemas.event import EventLogRequest, FeedbackResponse
 from app.utils.proximity_comparator import ProximityComparator
-from app.services.vertex_ai_service import VertexAIService
 
 router = APIRouter(prefix="/api/events", tags=["events"])
 
+# Plain def: FastAPI runs it in its threadpool, so the queries never hold up the event loop
 @router.post("/log", response_model=FeedbackResponse)
-async def log_event(
+def log_event(
     event_data: EventLogRequest,
     db: Session = Depends(get_db)
 ):
@@ -40,7 +40,6 @@ async def log_event(
             nearest_event = event
     
     comparator = ProximityComparator()
-    vertex_ai = VertexAIService()
     
     if not nearest_event:
         # False Positive logic
@@ -34,7 +34,7 @@ class SessionHistoryItem(BaseModel):
 
 
 @router.post("/start", response_model=SessionResponse)
-async def start_session(
+def start_session(
     request: StartSessionRequest,
     db: Session = Depends(get_db)
 ):
@@ -102,7 +102,7 @@ async def start_session(
 
 
 @router.get("/history", response_model=List[SessionHistoryItem])
-async def get_session_history(
+def get_session_history(
     user_email: str = "guest@example.com",
     db: Session = Depends(get_db)
 ):
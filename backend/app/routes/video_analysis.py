@@ -1,152 +1,113 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-import tempfile
-import time
-from pathlib import Path
+from concurrent.futures import Executor
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, List, Optional
 import os
-import shutil
+import uuid
 
-from app.services.video_processor import VideoProcessor
-from app.services.gemini_analyzer import GeminiAnalyzer
-from app.services.ground_truth_generator import GroundTruthGenerator
+from app.models import AnalysisCheckpoint
+from app.services.analysis_checkpoints import CheckpointStore, JobCheckpoint
+from app.services.analysis_jobs import AnalysisJob, AnalysisJobManager, ProgressCallback
+from app.services.analysis_pipeline import AnalysisPipeline, UnreadableVideoError
+from app.services.call_guard import CircuitOpenError
+from app.services.call_metrics import CallMetrics
+from app.services.event_recorder import EventRecorder
+from app.services.response_cache import ResponseCache
+from app.services.upload_store import StoredUpload, UnsupportedVideoFormatError, UploadStore, UploadTooLargeError
 from app.config import settings
-from app.database import get_db
-from app.models import Video, GroundTruthEvent
+from app.database import SessionLocal, get_db
+from app.dependencies import (
+    get_analysis_flights, get_call_guard, get_call_metrics, get_checkpoint_store, get_decode_pool, get_genai_client,
+    get_job_manager, get_response_cache, get_upload_store
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/videos", tags=["video-analysis"])
 
+DEFAULT_ATTRIBUTES = "Main Logo,Copyright,Post-Game Start,Scoreboard,Replay Graphic"
+
+@router.get("/analyze/cache")
+async def response_cache_stats(response_cache: Optional[ResponseCache] = Depends(get_response_cache)):
+    """Hit/miss counters and size of the Gemini response cache."""
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+@router.get("/analyze/metrics")
+async def model_call_metrics(call_metrics: CallMetrics = Depends(get_call_metrics)):
+    """Latency, token usage, payload size and retries of recent model calls, with running totals."""
+    return call_metrics.summary(include_calls=True)
+
+async def _save_upload(video_file: UploadFile, upload_store: UploadStore) -> StoredUpload:
+    """Stream the upload into UPLOAD_DIR, hashing it on the way (see UploadStore)."""
+    try:
+        return await upload_store.save(video_file)
+    except UnsupportedVideoFormatError as e:
+        raise HTTPException(400, str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(413, str(e))
+
+def _pipeline(
+    db: Session,
+    genai_client,
+    response_cache: Optional[ResponseCache],
+    decode_pool: Optional[Executor],
+    progress: Optional[ProgressCallback] = None
+) -> AnalysisPipeline:
+    return AnalysisPipeline(
+        db,
+        genai_client,
+        response_cache=response_cache,
+        call_guard=get_call_guard(),
+        call_metrics=CallMetrics(parent=get_call_metrics()),
+        progress=progress,
+        decode_pool=decode_pool,
+        flights=get_analysis_flights()
+    )
+
 @router.post("/analyze")
 async def analyze_video(
     video_file: UploadFile = File(...),
     broadcast_start_time: str = Form(...),
-    attribute_types: str = Form(
-        default="Main Logo,Copyright,Post-Game Start,Scoreboard,Replay Graphic"
-    ),
-    db: Session = Depends(get_db)
+    attribute_types: str = Form(default=DEFAULT_ATTRIBUTES),
+    video_family: Optional[str] = Form(default=None),
+    reanalyze: bool = Form(default=False),
+    db: Session = Depends(get_db),
+    response_cache: Optional[ResponseCache] = Depends(get_response_cache),
+    genai_client = Depends(get_genai_client),
+    decode_pool: Optional[Executor] = Depends(get_decode_pool),
+    upload_store: UploadStore = Depends(get_upload_store)
 ):
     """
-    Analyze a video and generate ground truth JSON.
+    Analyze a video and generate ground truth JSON, holding the connection until done.
     Also saves the Video and GroundTruthEvent records to the database.
+    video_family selects a template library for local pre-detection (see TemplateDetector).
+    Content already analysed for the same attributes is answered from the stored result
+    unless reanalyze is set; while an identical analysis runs, the request waits for it.
+    For long videos prefer POST /api/videos/analyze/jobs.
     """
-    start_time = time.time()
     print(f"Analyzing video: {video_file.filename}")
-    
-    # Validate file type
-    allowed_types = ['video/mp4', 'video/webm', 'video/quicktime', 'application/octet-stream'] # Octet stream sometimes sent
-    if video_file.content_type not in allowed_types:
-        # Check by extension if content-type is generic
-        ext = Path(video_file.filename).suffix.lower()
-        if ext not in ['.mp4', '.webm', '.mov']:
-             raise HTTPException(400, f"Invalid video format: {video_file.content_type}")
-    
-    # Save uploaded file temporarily
-    # Ensure upload directory exists
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    
-    tmp_path = os.path.join(settings.UPLOAD_DIR, f"temp_{int(time.time())}_{video_file.filename}")
+    upload = await _save_upload(video_file, upload_store)
+    tmp_path = upload.path
     
     try:
-        with open(tmp_path, "wb") as buffer:
-            shutil.copyfileobj(video_file.file, buffer)
-            
-        # Initialize services
-        # Note: frame_interval could be dynamic based on video length
-        processor = VideoProcessor(frame_interval_seconds=2.0)
-        analyzer = GeminiAnalyzer(
-            project_id=settings.GOOGLE_CLOUD_PROJECT,
-            location=settings.GOOGLE_CLOUD_LOCATION,
-            credentials_path=settings.GOOGLE_APPLICATION_CREDENTIALS,
-            model_id=settings.GEMINI_MODEL
-        )
-        generator = GroundTruthGenerator()
-        
-        # Extract frames
-        print("Extracting frames...")
-        frames = processor.extract_frames(tmp_path)
-        print(f"Extracted {len(frames)} frames")
-        
-        duration = processor.get_video_duration(tmp_path)
-        
-        if not frames:
-             raise HTTPException(400, "Could not extract any frames from the video")
-        
-        # Analyze with Gemini
         attributes = [a.strip() for a in attribute_types.split(',')]
-        print(f"Analyzing frames with Gemini... looking for {attributes}")
-        events = analyzer.analyze_frames(frames, attributes)
-        print(f"Gemini found {len(events)} events")
-        
-        # Generate ground truth JSON
-        video_id = Path(video_file.filename).stem
-        ground_truth = generator.generate_json(
-            video_id=video_id,
-            broadcast_start_time=broadcast_start_time,
-            events=events,
-            duration_seconds=duration
+        ground_truth = await _pipeline(db, genai_client, response_cache, decode_pool).run(
+            tmp_path, video_file.filename, broadcast_start_time, attributes, video_family,
+            content_hash=upload.content_hash, reuse=settings.ANALYSIS_DEDUP_ENABLED and not reanalyze
         )
-        
-        # === NEW: Save to Database ===
-        try:
-            # 1. Check if video already exists, if not create it
-            video_record = db.query(Video).filter(Video.video_id == video_id).first()
-            if not video_record:
-                video_record = Video(
-                    video_id=video_id,
-                    title=video_file.filename,
-                    file_path=video_file.filename,
-                    duration_seconds=duration,
-                    broadcast_start_time=broadcast_start_time
-                )
-                db.add(video_record)
-                db.commit()
-                db.refresh(video_record)
-                print(f"✅ Created Video record: {video_id}")
-            else:
-                print(f"✅ Video record already exists: {video_id}")
-            
-            # 2. Delete existing ground truth events for this video (if re-analyzing)
-            existing_count = db.query(GroundTruthEvent).filter(
-                GroundTruthEvent.video_id == video_id
-            ).count()
-            
-            if existing_count > 0:
-                db.query(GroundTruthEvent).filter(
-                    GroundTruthEvent.video_id == video_id
-                ).delete()
-                db.commit()
-                print(f"🗑️  Deleted {existing_count} existing ground truth events")
-            
-            # 3. Save new ground truth events
-            for event_data in ground_truth['events']:
-                gt_event = GroundTruthEvent(
-                    video_id=video_id,
-                    attribute=event_data['attribute'],
-                    timestamp_seconds=event_data['timestamp_seconds'],
-                    live_clock_time=event_data['live_clock_time'],
-                    clue_description=event_data['clue_description']
-                )
-                db.add(gt_event)
-            
-            db.commit()
-            print(f"✅ Saved {len(ground_truth['events'])} ground truth events to database")
-            
-            ground_truth['database_saved'] = True
-            ground_truth['events_saved'] = len(ground_truth['events'])
-            
-        except Exception as db_error:
-            print(f"⚠️  Database save failed: {db_error}")
-            db.rollback()
-            ground_truth['database_saved'] = False
-            ground_truth['database_error'] = str(db_error)
-        
-        # Add metadata
-        ground_truth['analysis_status'] = 'completed'
-        ground_truth['processing_time_seconds'] = time.time() - start_time
-        ground_truth['frames_analyzed'] = len(frames)
-        
         return JSONResponse(content=ground_truth)
         
+    except CircuitOpenError as e:
+        # Vertex AI is failing repeatedly; tell the client to come back later instead of queueing more calls
+        raise HTTPException(503, f"Analysis unavailable: {str(e)}")
+    except UnreadableVideoError as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -156,3 +117,243 @@ async def analyze_video(
         # Cleanup temp file
         if os.path.exists(tmp_path):
             os.remove(tmp_path)
+
+@router.post("/analyze/jobs", status_code=202)
+async def submit_analysis_job(
+    video_file: UploadFile = File(...),
+    broadcast_start_time: str = Form(...),
+    attribute_types: str = Form(default=DEFAULT_ATTRIBUTES),
+    video_family: Optional[str] = Form(default=None),
+    reanalyze: bool = Form(default=False),
+    response_cache: Optional[ResponseCache] = Depends(get_response_cache),
+    genai_client = Depends(get_genai_client),
+    decode_pool: Optional[Executor] = Depends(get_decode_pool),
+    jobs: AnalysisJobManager = Depends(get_job_manager),
+    upload_store: UploadStore = Depends(get_upload_store)
+):
+    """
+    Same analysis as POST /api/videos/analyze, run in the background: returns a job id
+    as soon as the upload is stored. Follow it with GET /api/videos/analyze/jobs/{job_id}
+    or the SSE stream at /api/videos/analyze/jobs/{job_id}/events.
+    """
+    print(f"Queueing analysis of video: {video_file.filename}")
+    upload = await _save_upload(video_file, upload_store)
+    filename = video_file.filename
+    attributes = [a.strip() for a in attribute_types.split(',')]
+    job_id = uuid.uuid4().hex
+
+    store = get_checkpoint_store()
+    if store is not None:
+        try:
+            await asyncio.to_thread(
+                store.create, job_id, upload.path, filename, broadcast_start_time, attributes,
+                video_family, upload.content_hash, reanalyze
+            )
+        except Exception as e:
+            # e.g. the table is missing (run python -m app.init_db); the job just can't resume
+            logger.warning(f"Analysis job {job_id} is not checkpointed: {e}")
+            store = None
+
+    work = _job_work(
+        job_id, store, upload.path, filename, broadcast_start_time, attributes, video_family,
+        upload.content_hash, reanalyze, genai_client, response_cache, decode_pool
+    )
+    job = _submit_job(jobs, store, job_id, filename, work)
+    return {
+        **job.snapshot(),
+        'content_hash': upload.content_hash,
+        'status_url': f"/api/videos/analyze/jobs/{job.id}",
+        'events_url': f"/api/videos/analyze/jobs/{job.id}/events"
+    }
+
+def _submit_job(
+    jobs: AnalysisJobManager,
+    store: Optional[CheckpointStore],
+    job_id: str,
+    filename: str,
+    work: Callable[[ProgressCallback], Awaitable[dict]]
+) -> AnalysisJob:
+    """
+    Queue the job, heartbeating its checkpoint from now until the work ends: a job
+    waiting for a slot must not look orphaned to the other workers.
+    """
+    if store is None:
+        return jobs.submit(filename, work, job_id=job_id)
+    heartbeat = asyncio.create_task(store.keep_alive(job_id, settings.ANALYSIS_HEARTBEAT_SECONDS))
+
+    async def heartbeating(progress: ProgressCallback):
+        try:
+            return await work(progress)
+        finally:
+            heartbeat.cancel()
+
+    return jobs.submit(filename, heartbeating, job_id=job_id)
+
+def _job_work(
+    job_id: str,
+    store: Optional[CheckpointStore],
+    video_path: str,
+    filename: str,
+    broadcast_start_time: str,
+    attributes: List[str],
+    video_family: Optional[str],
+    content_hash: str,
+    reanalyze: bool,
+    genai_client,
+    response_cache: Optional[ResponseCache],
+    decode_pool: Optional[Executor]
+):
+    """
+    The analysis job's work, for _submit_job. With a checkpoint store it marks the job
+    running, resumes from its checkpoint and records the outcome. A job cancelled by
+    shutdown keeps its upload and checkpoint for the next worker.
+    """
+    async def work(progress: ProgressCallback):
+        # The request's session closes when it returns, so the job opens its own
+        db = SessionLocal()
+        checkpoint = None
+        status, error, keep_upload = 'completed', None, False
+        try:
+            if store is not None:
+                if not await asyncio.to_thread(store.start, job_id):
+                    # Another worker took the job over while it waited here: the upload is its now
+                    keep_upload = True
+                    raise RuntimeError("Analysis job was taken over by another worker")
+                checkpoint = JobCheckpoint(store, await asyncio.to_thread(store.get, job_id))
+            return await _pipeline(db, genai_client, response_cache, decode_pool, progress).run(
+                video_path, filename, broadcast_start_time, attributes, video_family,
+                content_hash=content_hash, reuse=settings.ANALYSIS_DEDUP_ENABLED and not reanalyze,
+                checkpoint=checkpoint, run_id=job_id
+            )
+        except asyncio.CancelledError:
+            keep_upload = checkpoint is not None
+            raise
+        except Exception as e:
+            status, error = 'failed', str(e)
+            raise
+        finally:
+            if checkpoint is not None:
+                await asyncio.to_thread(checkpoint.close)
+                if not keep_upload:
+                    await _finish_checkpoint(store, job_id, status, error)
+            db.close()
+            if not keep_upload and os.path.exists(video_path):
+                os.remove(video_path)
+
+    return work
+
+async def _finish_checkpoint(store: CheckpointStore, job_id: str, status: str, error: Optional[str] = None):
+    try:
+        await asyncio.to_thread(store.finish, job_id, status, error)
+    except Exception as e:
+        logger.warning(f"Could not record the outcome of analysis job {job_id}: {e}")
+
+async def resume_interrupted_jobs(app):
+    """
+    Every ANALYSIS_HEARTBEAT_SECONDS, take over checkpointed jobs whose worker stopped
+    heartbeating and run them here from their last completed window (started by the
+    lifespan hook in app.main, cancelled on shutdown). Jobs this worker still holds
+    are never claimed, even if a heartbeat was missed.
+    """
+    store = get_checkpoint_store()
+    if store is None:
+        return
+    jobs: AnalysisJobManager = app.state.job_manager
+    while True:
+        try:
+            orphans = await asyncio.to_thread(
+                store.claim_orphans, settings.ANALYSIS_RESUME_AFTER_SECONDS, jobs.unfinished_ids()
+            )
+        except Exception as e:
+            logger.warning(f"Could not look for interrupted analysis jobs: {e}")
+            orphans = []
+        for state in orphans:
+            if not os.path.exists(state.video_path):
+                print(f"Cannot resume analysis job {state.job_id}: upload {state.video_path} is gone")
+                await _finish_checkpoint(store, state.job_id, 'failed', "Upload no longer available")
+                continue
+            print(f"Resuming analysis job {state.job_id} ({state.filename}) at {state.resume_from_seconds:.1f}s")
+            work = _job_work(
+                state.job_id, store, state.video_path, state.filename, state.broadcast_start_time,
+                json.loads(state.attributes), state.video_family, state.content_hash, state.reanalyze,
+                app.state.genai_client, get_response_cache(), app.state.decode_pool
+            )
+            _submit_job(jobs, store, state.job_id, state.filename, work)
+        await asyncio.sleep(settings.ANALYSIS_HEARTBEAT_SECONDS)
+
+def _partial_events(job_id: str) -> Optional[List[dict]]:
+    """Events an unfinished or failed job has found so far (its drafts); None if unreadable."""
+    db = SessionLocal()
+    try:
+        return EventRecorder.drafts(db, job_id)
+    except Exception as e:
+        # e.g. the table is missing (run python -m app.init_db)
+        logger.warning(f"Draft events of analysis job {job_id} could not be read: {e}")
+        return None
+    finally:
+        db.close()
+
+def _checkpoint_snapshot(checkpoint: AnalysisCheckpoint) -> dict:
+    """Job state from its checkpoint, for jobs running on (or finished by) another worker."""
+    return {
+        'job_id': checkpoint.job_id,
+        'filename': checkpoint.filename,
+        'status': checkpoint.status,
+        'stage': 'analyzing' if checkpoint.status == 'running' else checkpoint.status,
+        'percent': None,
+        'message': f"{checkpoint.windows_done} windows analysed up to {checkpoint.resume_from_seconds:.0f}s",
+        'error': checkpoint.error,
+        'resumed_count': checkpoint.resumed_count,
+        'worker': checkpoint.owner,
+    }
+
+@router.get("/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: str, jobs: AnalysisJobManager = Depends(get_job_manager)):
+    """
+    Status, stage and percent done of an analysis job; the ground truth once completed,
+    and until then (or after a failure) the events found so far as partial_events.
+    Jobs this worker does not know are looked up in the checkpoints (without the result).
+    """
+    job = jobs.get(job_id)
+    if job is not None:
+        snapshot = job.snapshot()
+        if job.status != 'completed':
+            snapshot['partial_events'] = await asyncio.to_thread(_partial_events, job_id)
+        return snapshot
+    store = get_checkpoint_store()
+    checkpoint = None
+    if store is not None:
+        try:
+            checkpoint = await asyncio.to_thread(store.get, job_id)
+        except Exception as e:
+            logger.warning(f"Checkpoint lookup of analysis job {job_id} failed: {e}")
+    if checkpoint is None:
+        raise HTTPException(404, f"Unknown analysis job: {job_id}")
+    snapshot = _checkpoint_snapshot(checkpoint)
+    if checkpoint.status != 'completed':
+        snapshot['partial_events'] = await asyncio.to_thread(_partial_events, job_id)
+    return snapshot
+
+@router.get("/analyze/jobs/{job_id}/events")
+async def stream_analysis_job(job_id: str, jobs: AnalysisJobManager = Depends(get_job_manager)):
+    """
+    Server-sent events: a "progress" event per stage/percent update, then one
+    "completed" or "failed" event carrying the final job state, after which the stream ends.
+    """
+    if jobs.get(job_id) is None:
+        raise HTTPException(404, f"Unknown analysis job: {job_id}")
+
+    async def events():
+        async for snapshot in jobs.subscribe(job_id, settings.ANALYSIS_SSE_KEEPALIVE_SECONDS):
+            if snapshot is None:
+                yield ": keepalive\n\n"
+                continue
+            event = snapshot['status'] if snapshot['status'] in ("completed", "failed") else "progress"
+            yield f"event: {event}\ndata: {json.dumps(snapshot)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop nginx from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -17,7 +17,7 @@ class VideoListResponse(BaseModel):
     broadcast_start_time: str
 
 @router.get("/list", response_model=List[VideoListResponse])
-async def get_video_list(db: Session = Depends(get_db)):
+def get_video_list(db: Session = Depends(get_db)):
     """
     Fetch all available videos from the database
     """
@@ -36,7 +36,7 @@ async def get_video_list(db: Session = Depends(get_db)):
     ]
 
 @router.get("/{video_id}/attributes", response_model=List[str])
-async def get_video_attributes(video_id: str, db: Session = Depends(get_db)):
+def get_video_attributes(video_id: str, db: Session = Depends(get_db)):
     """
     Fetch distinct event attributes for a specific video
     """
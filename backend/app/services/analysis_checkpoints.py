@@ -0,0 +1,220 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.models import AnalysisCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# Jobs a worker has taken on: waiting for a job slot, or analysing
+ACTIVE = ('queued', 'running')
+
+
+class CheckpointStore:
+    """
+    Analysis job checkpoints in the database. Every method opens a short session of
+    its own and blocks, so call them through asyncio.to_thread from the event loop.
+    owner names this worker process: a job is only updated by its owner, and
+    claim_orphans lets another worker (or this one, restarted) take over jobs whose
+    heartbeat stopped. Jobs are created 'queued' and heartbeat from then on, so a job
+    waiting for a slot is not taken for an orphan; start() marks it 'running'.
+    """
+    def __init__(self, session_factory: Callable[[], Session], owner: Optional[str] = None):
+        self.session_factory = session_factory
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def create(
+        self,
+        job_id: str,
+        video_path: str,
+        filename: str,
+        broadcast_start_time: str,
+        attributes: List[str],
+        video_family: Optional[str],
+        content_hash: str,
+        reanalyze: bool = False
+    ) -> AnalysisCheckpoint:
+        with self.session_factory() as db:
+            checkpoint = AnalysisCheckpoint(
+                job_id=job_id,
+                status='queued',
+                owner=self.owner,
+                heartbeat_at=time.time(),
+                video_path=video_path,
+                filename=filename,
+                broadcast_start_time=broadcast_start_time,
+                attributes=json.dumps(attributes),
+                video_family=video_family,
+                content_hash=content_hash,
+                reanalyze=reanalyze,
+                resume_from_seconds=0.0,
+                frames_done=0,
+                windows_done=0,
+                events_json="[]",
+                resumed_count=0
+            )
+            db.add(checkpoint)
+            db.commit()
+            db.refresh(checkpoint)
+            db.expunge(checkpoint)
+            return checkpoint
+
+    def get(self, job_id: str) -> Optional[AnalysisCheckpoint]:
+        with self.session_factory() as db:
+            checkpoint = db.query(AnalysisCheckpoint).filter(AnalysisCheckpoint.job_id == job_id).first()
+            if checkpoint is not None:
+                db.expunge(checkpoint)
+            return checkpoint
+
+    def save_progress(
+        self,
+        job_id: str,
+        analysis_key: str,
+        resume_from_seconds: float,
+        frames_done: int,
+        windows_done: int,
+        events: List[Dict]
+    ) -> bool:
+        """False if the job is no longer this worker's (or no longer running)."""
+        return self._update(
+            job_id,
+            analysis_key=analysis_key,
+            resume_from_seconds=resume_from_seconds,
+            frames_done=frames_done,
+            windows_done=windows_done,
+            events_json=json.dumps(events),
+            heartbeat_at=time.time()
+        )
+
+    def start(self, job_id: str) -> bool:
+        """Mark the job running. False if it is no longer this worker's."""
+        return self._update(job_id, status='running', heartbeat_at=time.time())
+
+    def heartbeat(self, job_id: str) -> bool:
+        return self._update(job_id, heartbeat_at=time.time())
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> bool:
+        return self._update(job_id, status=status, error=error, heartbeat_at=time.time())
+
+    def claim_orphans(self, stale_seconds: float, skip: Iterable[str] = ()) -> List[AnalysisCheckpoint]:
+        """
+        Take over queued or running jobs whose heartbeat is older than stale_seconds,
+        except those in skip (jobs this worker still holds). Each job is claimed with a
+        conditional update, so when several workers look at once only one of them gets
+        it; it is queued again on the claiming worker.
+        """
+        cutoff = time.time() - stale_seconds
+        skip = set(skip)
+        claimed = []
+        with self.session_factory() as db:
+            candidates = [job_id for (job_id,) in db.query(AnalysisCheckpoint.job_id).filter(
+                AnalysisCheckpoint.status.in_(ACTIVE),
+                AnalysisCheckpoint.heartbeat_at < cutoff
+            ) if job_id not in skip]
+            for job_id in candidates:
+                taken = db.query(AnalysisCheckpoint).filter(
+                    AnalysisCheckpoint.job_id == job_id,
+                    AnalysisCheckpoint.status.in_(ACTIVE),
+                    AnalysisCheckpoint.heartbeat_at < cutoff
+                ).update({
+                    AnalysisCheckpoint.status: 'queued',
+                    AnalysisCheckpoint.owner: self.owner,
+                    AnalysisCheckpoint.heartbeat_at: time.time(),
+                    AnalysisCheckpoint.resumed_count: AnalysisCheckpoint.resumed_count + 1
+                }, synchronize_session=False)
+                db.commit()
+                if taken:
+                    checkpoint = db.query(AnalysisCheckpoint).filter(AnalysisCheckpoint.job_id == job_id).first()
+                    db.expunge(checkpoint)
+                    claimed.append(checkpoint)
+        return claimed
+
+    async def keep_alive(self, job_id: str, interval_seconds: float):
+        """Heartbeat the job every interval_seconds until cancelled, or until it is no longer this worker's."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                if not await asyncio.to_thread(self.heartbeat, job_id):
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat of analysis job {job_id} failed: {e}")
+
+    def _update(self, job_id: str, **fields) -> bool:
+        with self.session_factory() as db:
+            updated = db.query(AnalysisCheckpoint).filter(
+                AnalysisCheckpoint.job_id == job_id,
+                AnalysisCheckpoint.owner == self.owner,
+                AnalysisCheckpoint.status.in_(ACTIVE)
+            ).update(fields, synchronize_session=False)
+            db.commit()
+            return bool(updated)
+
+
+class JobCheckpoint:
+    """
+    One job's checkpoint as AnalysisPipeline uses it: where its analysis resumes,
+    and the saving of progress as windows complete. save() is called on the event
+    loop, so writes run in order on a writer thread of their own; close() waits
+    for them. Database errors are logged, never raised: a lost checkpoint only
+    means more work after a restart.
+    """
+    def __init__(self, store: CheckpointStore, state: AnalysisCheckpoint):
+        self.store = store
+        self.job_id = state.job_id
+        self.analysis_key = state.analysis_key
+        self.resume_from_seconds = state.resume_from_seconds or 0.0
+        self.windows_done = state.windows_done or 0
+        self.frames_done = state.frames_done or 0
+        self.events: List[Dict] = json.loads(state.events_json or "[]")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+
+    def resume_point(self, analysis_key: str) -> Tuple[float, List[Dict]]:
+        """(resume_from_seconds, events found before it) for an analysis with this key."""
+        if analysis_key != self.analysis_key:
+            # Nothing saved yet, or saved under other settings: start over
+            self.analysis_key = analysis_key
+            self.resume_from_seconds = 0.0
+            self.windows_done = 0
+            self.frames_done = 0
+            self.events = []
+        return self.resume_from_seconds, list(self.events)
+
+    def progress_callback(self) -> Callable[[float, int, int, List[Dict]], None]:
+        """on_checkpoint for GeminiAnalyzer, whose counts start at the resume point."""
+        base_windows, base_frames, base_events = self.windows_done, self.frames_done, list(self.events)
+
+        def on_checkpoint(resume_from_seconds: float, windows_done: int, frames_done: int, events: List[Dict]):
+            self.save(
+                resume_from_seconds, base_windows + windows_done, base_frames + frames_done, base_events + events
+            )
+        return on_checkpoint
+
+    def save(self, resume_from_seconds: float, windows_done: int, frames_done: int, events: List[Dict]):
+        self.resume_from_seconds = resume_from_seconds
+        self.windows_done = windows_done
+        self.frames_done = frames_done
+        self.events = events
+        self._writer.submit(
+            self._write, self.analysis_key, resume_from_seconds, frames_done, windows_done, list(events)
+        )
+
+    def close(self):
+        """Wait for queued saves. Blocks."""
+        self._writer.shutdown(wait=True)
+
+    def _write(self, analysis_key: str, resume_from_seconds: float, frames_done: int, windows_done: int, events: List[Dict]):
+        try:
+            if not self.store.save_progress(
+                self.job_id, analysis_key, resume_from_seconds, frames_done, windows_done, events
+            ):
+                logger.warning(f"Checkpoint of analysis job {self.job_id} not saved: job taken over or finished")
+        except Exception as e:
+            logger.warning(f"Checkpoint of analysis job {self.job_id} not saved: {e}")
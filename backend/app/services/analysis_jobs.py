@@ -0,0 +1,185 @@
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# progress(stage, percent, message), as AnalysisPipeline reports it
+ProgressCallback = Callable[[str, float, str], None]
+
+FINISHED = ("completed", "failed")
+
+
+class AnalysisJob:
+    def __init__(self, job_id: str, filename: str):
+        self.id = job_id
+        self.filename = filename
+        self.status = "queued"
+        self.stage = "queued"
+        self.percent = 0.0
+        self.message = ""
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def snapshot(self, include_result: bool = True) -> Dict:
+        data = {
+            'job_id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'stage': self.stage,
+            'percent': self.percent,
+            'message': self.message,
+            'error': self.error,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+        }
+        if include_result and self.result is not None:
+            data['result'] = self.result
+        return data
+
+
+class AnalysisJobManager:
+    """
+    Runs analyses in the background of the app's event loop, so the request that
+    submits one returns at once. At most max_concurrent_jobs run together, the rest
+    wait in order. Progress updates may come from any thread and are fanned out to
+    subscribers (the SSE endpoint). Jobs live in this process only; the oldest
+    finished ones are forgotten beyond max_finished_jobs.
+    """
+    def __init__(self, max_concurrent_jobs: int = 1, max_finished_jobs: int = 100):
+        self.max_finished_jobs = max_finished_jobs
+        self._slots = asyncio.Semaphore(max(1, max_concurrent_jobs))
+        self._jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def submit(
+        self,
+        filename: str,
+        work: Callable[[ProgressCallback], Awaitable[Dict]],
+        job_id: Optional[str] = None
+    ) -> AnalysisJob:
+        """
+        Queue work(progress), whose result becomes the job's result. Must be called
+        from the event loop the jobs should run on. job_id defaults to a new id; pass
+        one to resume a job started elsewhere under its own id.
+        """
+        self._loop = asyncio.get_running_loop()
+        job = AnalysisJob(job_id or uuid.uuid4().hex, filename)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        task = asyncio.create_task(self._run(job, work))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def unfinished_ids(self) -> List[str]:
+        """Ids of the jobs queued or running here."""
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if not job.finished]
+
+    def update(self, job_id: str, **fields):
+        """Set job fields (stage, percent, message, ...) from any thread and notify subscribers."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+            snapshot = job.snapshot()
+
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._publish(job_id, snapshot)
+        elif self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._publish, job_id, snapshot)
+
+    async def subscribe(self, job_id: str, keepalive_seconds: float = 15.0) -> AsyncIterator[Optional[Dict]]:
+        """
+        The job's current state, then every update until it finishes. Yields None
+        after keepalive_seconds without an update, so callers can keep idle
+        connections open through proxies.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            self._subscribers.setdefault(job_id, []).append(queue)
+            snapshot = job.snapshot()
+        try:
+            while True:
+                yield snapshot
+                if snapshot['status'] in FINISHED:
+                    return
+                while True:
+                    try:
+                        snapshot = await asyncio.wait_for(queue.get(), keepalive_seconds)
+                        break
+                    except asyncio.TimeoutError:
+                        yield None
+        finally:
+            with self._lock:
+                queues = self._subscribers.get(job_id, [])
+                if queue in queues:
+                    queues.remove(queue)
+                if not queues:
+                    self._subscribers.pop(job_id, None)
+
+    async def shutdown(self):
+        """Cancel queued and running jobs (on app shutdown)."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, job: AnalysisJob, work: Callable[[ProgressCallback], Awaitable[Dict]]):
+        async with self._slots:
+            self.update(job.id, status="running", stage="starting", message="Analysis started")
+            progress = lambda stage, percent, message: self.update(
+                job.id, stage=stage, percent=percent, message=message
+            )
+            try:
+                result = await work(progress)
+            except asyncio.CancelledError:
+                self.update(job.id, status="failed", error="Cancelled", message="Analysis cancelled")
+                raise
+            except Exception as e:
+                logger.exception(f"Analysis job {job.id} failed")
+                self.update(job.id, status="failed", error=str(e), message="Analysis failed")
+            else:
+                self.update(
+                    job.id, status="completed", stage="completed", percent=100.0,
+                    message="Analysis complete", result=result
+                )
+
+    def _publish(self, job_id: str, snapshot: Dict):
+        with self._lock:
+            queues = list(self._subscribers.get(job_id, []))
+        for queue in queues:
+            queue.put_nowait(snapshot)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
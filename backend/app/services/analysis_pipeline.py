@@ -0,0 +1,712 @@
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait as wait_futures
+from pathlib import Path
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from app.config import settings
+from app.models import AnalysisResult, DraftEvent, Video, GroundTruthEvent
+from app.services.analysis_checkpoints import JobCheckpoint
+from app.services.analysis_jobs import ProgressCallback
+from app.services.call_guard import CallGuard
+from app.services.call_metrics import CallMetrics
+from app.services.event_recorder import EventRecorder
+from app.services.frame_cache import FrameCache
+from app.services.gemini_analyzer import PROMPT_VERSION, CheckpointCallback, GeminiAnalyzer
+from app.services.ground_truth_generator import GroundTruthGenerator
+from app.services.proxy_clip import ProxyClipEncoder
+from app.services.response_cache import ResponseCache
+from app.services.roi_profiles import group_attributes
+from app.services.temporal_refiner import TemporalRefiner
+from app.services.template_detector import TemplateDetector
+from app.services.video_probe import VideoProbe, remember_probe
+from app.services.video_processor import VideoProcessor
+from app.utils.contact_sheet import ContactSheetBuilder
+from app.utils.file_hash import sha256_file
+from app.utils.frame_deduplicator import FrameDeduplicator
+from app.utils.single_flight import SingleFlight
+from app.utils.temporal_nms import suppress_duplicate_events
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Share of overall progress each stage covers: (stage, start %, end %)
+STAGES = {
+    'probing': (0.0, 5.0),
+    'analyzing': (5.0, 85.0),
+    'refining': (85.0, 95.0),
+    'saving': (95.0, 100.0),
+}
+
+
+class UnreadableVideoError(Exception):
+    """No frames could be extracted from the uploaded file."""
+
+
+# Every setting that changes which frames (or clips) the model sees, what it is asked,
+# or how its answers become events. analysis_key covers all of them, so stored results
+# and job checkpoints from other settings are never reused; add new ones here.
+ANALYSIS_SETTINGS = (
+    "GEMINI_MODEL",
+    "GEMINI_INPUT_MODE",
+    "FRAME_INTERVAL_SECONDS",
+    "FRAME_SAMPLING_MODE",
+    "FRAME_DECODER",
+    "FRAME_KEYFRAMES_ONLY",
+    "FRAME_MAX_WIDTH",
+    "FRAME_JPEG_QUALITY",
+    "FRAME_SCENE_THRESHOLD",
+    "FRAME_SCENE_MAX_GAP_SECONDS",
+    "FRAME_DEDUP_ENABLED",
+    "FRAME_DEDUP_MAX_DISTANCE",
+    "ROI_CROPPING_ENABLED",
+    "ROI_PROFILES",
+    "ROI_TILE_MAX_WIDTH",
+    "CONTACT_SHEET_ENABLED",
+    "CONTACT_SHEET_COLUMNS",
+    "CONTACT_SHEET_ROWS",
+    "CONTACT_SHEET_CELL_WIDTH",
+    "REFINEMENT_ENABLED",
+    "REFINE_INTERVAL_SECONDS",
+    "TEMPLATE_LIBRARY_DIR",
+    "TEMPLATE_MATCH_THRESHOLD",
+    "TEMPLATE_REJECT_THRESHOLD",
+    "GEMINI_CLIP_WINDOW_SECONDS",
+    "GEMINI_CLIP_OVERLAP_SECONDS",
+    "PROXY_CLIP_FPS",
+    "PROXY_CLIP_MAX_WIDTH",
+    "PROXY_CLIP_CRF",
+    "GEMINI_WINDOW_FRAMES",
+    "GEMINI_WINDOW_OVERLAP_FRAMES",
+    "GEMINI_MERGE_SECONDS",
+)
+
+
+def analysis_key(content_hash: str, attributes: List[str], video_family: Optional[str] = None) -> str:
+    """
+    Identifies an analysis by everything that determines its events: the file's
+    content, the attribute set (order and duplicates ignored), the template family,
+    the prompt version and a snapshot of ANALYSIS_SETTINGS.
+    """
+    snapshot = {name: getattr(settings, name) for name in ANALYSIS_SETTINGS}
+    parts = [
+        content_hash,
+        ",".join(sorted(set(attributes))),
+        video_family or "",
+        f"prompt v{PROMPT_VERSION}",
+        json.dumps(snapshot, sort_keys=True),
+    ]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+class AnalysisPipeline:
+    """
+    Video file to saved ground truth: probe, frame (or proxy clip) extraction and
+    model analysis, refinement, and the database save. Shared by the blocking
+    POST /api/videos/analyze and analysis jobs (see AnalysisJobManager), which
+    follow it through the progress callback. Frame sampling reports progress, so
+    the callback is also called from the worker threads that decode frames.
+
+    Blocking steps (hashing, database work, sync model calls) run in the event
+    loop's default executor and frame decoding in decode_pool, so other requests
+    on the worker are served while a video is analysed.
+    """
+    def __init__(
+        self,
+        db: Session,
+        genai_client,
+        response_cache: Optional[ResponseCache] = None,
+        call_guard: Optional[CallGuard] = None,
+        call_metrics: Optional[CallMetrics] = None,
+        progress: Optional[ProgressCallback] = None,
+        decode_pool: Optional[Executor] = None,
+        flights: Optional[SingleFlight] = None
+    ):
+        self.db = db
+        self.genai_client = genai_client
+        self.response_cache = response_cache
+        self.call_guard = call_guard
+        self.call_metrics = call_metrics or CallMetrics()
+        self._progress = progress or (lambda stage, percent, message: None)
+        self.decode_pool = decode_pool
+        self.flights = flights
+
+    def report(self, stage: str, fraction: float = 0.0, message: str = ""):
+        """Progress within a stage (fraction 0..1) as overall percent."""
+        start, end = STAGES[stage]
+        self._progress(stage, round(start + (end - start) * min(1.0, max(0.0, fraction)), 1), message)
+
+    async def run(
+        self,
+        video_path: str,
+        filename: str,
+        broadcast_start_time: str,
+        attributes: List[str],
+        video_family: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        reuse: bool = True,
+        checkpoint: Optional[JobCheckpoint] = None,
+        run_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Analyze the file at video_path (uploaded as filename) and save its ground truth.
+        video_family selects a template library for local pre-detection (see TemplateDetector);
+        it is not used with ROI cropping.
+        content_hash (SHA-256 of the file, e.g. from UploadStore) saves hashing it again.
+        Identical content analysed for the same attributes before is answered from the
+        stored result unless reuse is False; with flights, a request arriving while an
+        identical analysis runs waits for that one instead of starting its own.
+        With a checkpoint (analysis jobs), model analysis resumes after the windows the
+        checkpoint has done and saves its progress there as windows complete.
+        With a run_id (the job id of analysis jobs), events are saved as drafts of the
+        run as they stream in, for the job status to show (see EventRecorder).
+        Raises UnreadableVideoError if no frames could be extracted.
+        """
+        start_time = time.time()
+        self.report('probing', 0.0, "Hashing and probing video")
+
+        # Content hash keys the frame cache and the stored probe metadata
+        if content_hash is None:
+            content_hash = await asyncio.to_thread(sha256_file, video_path)
+        known_video = await asyncio.to_thread(
+            lambda: self.db.query(Video).filter(Video.content_hash == content_hash).first()
+        )
+        known_probe = VideoProbe.from_video(known_video)
+        if known_probe:
+            remember_probe(content_hash, known_probe)
+
+        # Initialize services
+        # Note: frame_interval could be dynamic based on video length
+        processor = VideoProcessor(
+            frame_interval_seconds=settings.FRAME_INTERVAL_SECONDS,
+            sampling_mode=settings.FRAME_SAMPLING_MODE,
+            jpeg_quality=settings.FRAME_JPEG_QUALITY,
+            scene_threshold=settings.FRAME_SCENE_THRESHOLD,
+            scene_max_gap_seconds=settings.FRAME_SCENE_MAX_GAP_SECONDS,
+            max_width=settings.FRAME_MAX_WIDTH,
+            decoder=settings.FRAME_DECODER,
+            keyframes_only=settings.FRAME_KEYFRAMES_ONLY,
+            cache=FrameCache(
+                settings.FRAME_CACHE_DIR,
+                max_bytes=settings.FRAME_CACHE_MAX_MB * 1024 * 1024
+            ) if settings.FRAME_CACHE_ENABLED else None,
+            executor=self.decode_pool
+        )
+        analyzer = GeminiAnalyzer(
+            project_id=settings.GOOGLE_CLOUD_PROJECT,
+            location=settings.GOOGLE_CLOUD_LOCATION,
+            credentials_path=settings.GOOGLE_APPLICATION_CREDENTIALS,
+            model_id=settings.GEMINI_MODEL,
+            client=self.genai_client,
+            contact_sheet=ContactSheetBuilder(
+                columns=settings.CONTACT_SHEET_COLUMNS,
+                rows=settings.CONTACT_SHEET_ROWS,
+                cell_width=settings.CONTACT_SHEET_CELL_WIDTH
+            ) if settings.CONTACT_SHEET_ENABLED else None,
+            response_cache=self.response_cache,
+            call_guard=self.call_guard,
+            metrics=self.call_metrics
+        )
+
+        video_id = Path(filename).stem
+        probe = await asyncio.to_thread(processor.probe, video_path, content_hash)
+        self.report('probing', 1.0, f"{probe.duration_seconds:.0f}s video")
+
+        key = analysis_key(content_hash, attributes, video_family)
+        led = False
+
+        async def analysis():
+            nonlocal led
+            led = True
+            return await self._analysis(
+                key, reuse, processor, analyzer, video_path, video_id, filename, broadcast_start_time,
+                content_hash, probe, attributes, video_family, run_id, checkpoint
+            )
+
+        if self.flights is not None and self.flights.running(key):
+            self.report('analyzing', 0.0, "Waiting for an identical analysis in progress")
+            print(f"Identical analysis of {content_hash[:12]} already running, waiting for it")
+        if self.flights is not None:
+            events, frames_sampled, frames_sent, stored = await self.flights.run(key, analysis)
+        else:
+            events, frames_sampled, frames_sent, stored = await analysis()
+        # Answered by another request's analysis (this one runs its own if that request was cancelled)
+        attached = not led
+
+        self.report('saving', 0.0, f"Saving {len(events)} events")
+        ground_truth = await asyncio.to_thread(
+            self._save, video_id, filename, broadcast_start_time, content_hash, probe, events, key,
+            # Events from another request are already saved if that request was for this video
+            attached or stored, run_id
+        )
+
+        # Add metadata
+        ground_truth['analysis_status'] = 'completed'
+        ground_truth['processing_time_seconds'] = time.time() - start_time
+        # Frames sampled from the video, and those of them this analysis sent to the model
+        # (after dedup; none when the events came from another analysis)
+        ground_truth['frames_analyzed'] = frames_sampled
+        ground_truth['frames_sent'] = 0 if attached else frames_sent
+        ground_truth['content_hash'] = content_hash
+        if attached or stored:
+            ground_truth['deduplicated'] = 'in_flight' if attached else 'stored'
+        calls = ground_truth['model_calls'] = self.call_metrics.summary(include_calls=True)
+        print(f"Model calls: {calls['calls']} ({calls['cached']} cached, {calls['retries']} retries), "
+              f"{calls['total_tokens']} tokens, {calls['payload_bytes'] / 1e6:.1f} MB sent")
+        self.report('saving', 1.0, "Analysis complete")
+        return ground_truth
+
+    async def _analysis(
+        self,
+        key: str,
+        reuse: bool,
+        processor: VideoProcessor,
+        analyzer: GeminiAnalyzer,
+        video_path: str,
+        video_id: str,
+        filename: str,
+        broadcast_start_time: str,
+        content_hash: str,
+        probe: VideoProbe,
+        attributes: List[str],
+        video_family: Optional[str],
+        run_id: Optional[str],
+        checkpoint: Optional[JobCheckpoint] = None
+    ) -> Tuple[List[Dict], int, int, bool]:
+        """
+        Events for the analysis key: stored by an earlier run, or analysed and refined
+        now, then stored. Returns: (events, frames sampled, frames sent to the model,
+        whether they were stored)
+        """
+        if reuse:
+            stored = await asyncio.to_thread(self._stored_result, key)
+            if stored is not None:
+                print(f"Reusing stored analysis of {content_hash[:12]} (first run for {stored.video_id})")
+                self.report('analyzing', 1.0, "Reusing the analysis of identical content")
+                return json.loads(stored.events_json), stored.frames_analyzed, 0, True
+
+        # ROI mode windows regions separately and is not checkpointed
+        if settings.GEMINI_INPUT_MODE != "clip" and settings.ROI_CROPPING_ENABLED:
+            checkpoint = None
+        resume_from, prior_events, on_checkpoint = 0.0, [], None
+        if checkpoint is not None:
+            resume_from, prior_events = checkpoint.resume_point(key)
+            on_checkpoint = checkpoint.progress_callback()
+            if resume_from:
+                print(f"Resuming analysis of {content_hash[:12]} at {resume_from:.1f}s "
+                      f"({checkpoint.windows_done} windows, {len(prior_events)} events done)")
+
+        # A job's streamed events are saved as drafts of its run as they arrive, so its
+        # status shows what was found so far; the video's ground truth is only replaced
+        # once the analysis completes
+        recorder = None
+        if run_id:
+            recorder = EventRecorder(self.db, video_id, broadcast_start_time, run_id)
+            await asyncio.to_thread(recorder.start)
+            for event in prior_events:
+                recorder.add(event)
+
+        try:
+            events, frames_sampled, frames_sent = await self._analyze(
+                processor, analyzer, recorder.add if recorder else None, video_path, content_hash, probe,
+                attributes, video_family, resume_from, on_checkpoint
+            )
+        finally:
+            if recorder is not None:
+                # Queued event writes finish before the session is used again (or closed by the caller)
+                await asyncio.to_thread(recorder.close)
+        if prior_events:
+            events = suppress_duplicate_events(prior_events + events, settings.GEMINI_MERGE_SECONDS)
+        print(f"Extracted {frames_sampled} frames, sent {frames_sent}, Gemini found {len(events)} events"
+              + (f" ({recorder.saved} saved as drafts)" if recorder else ""))
+
+        if not frames_sampled:
+            raise UnreadableVideoError("Could not extract any frames from the video")
+
+        if settings.REFINEMENT_ENABLED and events:
+            events = await self._refine(processor, analyzer, video_path, events)
+
+        await asyncio.to_thread(
+            self._store_result, key, content_hash, attributes, video_family, video_id,
+            probe.duration_seconds, frames_sampled, events
+        )
+        return events, frames_sampled, frames_sent, False
+
+    async def _refine(
+        self,
+        processor: VideoProcessor,
+        analyzer: GeminiAnalyzer,
+        video_path: str,
+        events: List[Dict]
+    ) -> List[Dict]:
+        """
+        Refine the timestamps of events the model found on sampled frames, whose
+        transition lies in the sample interval before them (see TemporalRefiner), up to
+        GEMINI_MAX_CONCURRENCY at once. Template matches are left alone, and so are clip
+        mode's events: their timestamps are model estimates, which may fall after the
+        transition, not sample points.
+        """
+        if settings.GEMINI_INPUT_MODE == "clip":
+            print("Clip mode timestamps are not sample points, refinement skipped")
+            return events
+        pending = [i for i, event in enumerate(events) if event.get('source') != 'template']
+        if not pending:
+            return events
+        print(f"Refining {len(pending)} event timestamps...")
+        refiner = TemporalRefiner(
+            processor,
+            analyzer,
+            coarse_interval_seconds=settings.FRAME_INTERVAL_SECONDS,
+            fine_interval_seconds=settings.REFINE_INTERVAL_SECONDS
+        )
+        slots = asyncio.Semaphore(max(1, settings.GEMINI_MAX_CONCURRENCY))
+        done = 0
+
+        async def refine(event: Dict) -> Dict:
+            nonlocal done
+            async with slots:
+                refined = await asyncio.to_thread(refiner.refine_event, video_path, event)
+            done += 1
+            self.report('refining', done / len(pending), f"Refined {event['attribute']}")
+            return refined
+
+        refined = list(events)
+        for i, event in zip(pending, await asyncio.gather(*(refine(events[i]) for i in pending))):
+            refined[i] = event
+        return refined
+
+    async def _analyze(
+        self,
+        processor: VideoProcessor,
+        analyzer: GeminiAnalyzer,
+        on_event: Optional[Callable[[Dict], None]],
+        video_path: str,
+        content_hash: str,
+        probe: VideoProbe,
+        attributes: List[str],
+        video_family: Optional[str],
+        resume_from: float = 0.0,
+        on_checkpoint: Optional[CheckpointCallback] = None
+    ) -> Tuple[List[Dict], int, int]:
+        """
+        Model analysis in the configured input mode. Frames (or clip windows) before
+        resume_from are not sent to the model; on_checkpoint follows the windows done.
+        Returns: (events, frames sampled, frames sent to the model)
+        """
+        # Frames expected from the sampler, for progress only (scene mode keeps fewer)
+        expected_samples = max(1, int(probe.duration_seconds / settings.FRAME_INTERVAL_SECONDS))
+        sampled = [0]
+
+        if settings.GEMINI_INPUT_MODE == "clip":
+            # Each window goes up as one low-bitrate proxy clip instead of a list of JPEGs
+            encoder = ProxyClipEncoder(
+                max_width=settings.PROXY_CLIP_MAX_WIDTH,
+                fps=settings.PROXY_CLIP_FPS,
+                crf=settings.PROXY_CLIP_CRF
+            )
+            print(f"Sending proxy clips to Gemini... looking for {attributes}")
+            events, clip_count = await analyzer.analyze_video_clips(
+                video_path,
+                attributes,
+                probe.duration_seconds,
+                encoder,
+                window_seconds=settings.GEMINI_CLIP_WINDOW_SECONDS,
+                overlap_seconds=settings.GEMINI_CLIP_OVERLAP_SECONDS,
+                concurrency=settings.GEMINI_MAX_CONCURRENCY,
+                merge_seconds=settings.GEMINI_MERGE_SECONDS,
+                on_event=on_event,
+                on_progress=lambda done, total: self.report(
+                    'analyzing', done / total, f"{done}/{total} clips analysed"
+                ),
+                start_seconds=resume_from,
+                on_checkpoint=on_checkpoint
+            )
+            clip_frames = round(probe.duration_seconds * encoder.fps) if clip_count else 0
+            return events, clip_frames, clip_frames
+
+        print(f"Streaming frames to Gemini... looking for {attributes}")
+        if settings.ROI_CROPPING_ENABLED:
+            if video_family:
+                # The template detector screens full frames, not region tiles
+                logger.warning(
+                    f"Template library '{video_family}' is not used with ROI cropping; "
+                    "all attributes go to Gemini"
+                )
+            # One decode, one cropped tile stream per screen region
+            groups = group_attributes(attributes, settings.ROI_PROFILES)
+            tile_stream = processor.iter_region_frames(
+                video_path,
+                {key: region for key, (region, _) in groups.items()},
+                queue_depth=settings.FRAME_QUEUE_DEPTH,
+                tile_max_width=settings.ROI_TILE_MAX_WIDTH
+            )
+            deduplicators = {
+                key: FrameDeduplicator(max_distance=settings.FRAME_DEDUP_MAX_DISTANCE)
+                for key in groups
+            } if settings.FRAME_DEDUP_ENABLED else None
+            return await analyzer.analyze_region_stream(
+                self._counted(tile_stream, expected_samples, sampled),
+                {key: names for key, (_, names) in groups.items()},
+                window_size=settings.GEMINI_WINDOW_FRAMES,
+                deduplicators=deduplicators,
+                concurrency=settings.GEMINI_MAX_CONCURRENCY,
+                on_event=on_event
+            )
+
+        if settings.FRAME_EXTRACTION_WORKERS > 1:
+            # More shards than workers keeps only a few shards' frames in memory at once
+            frame_stream = processor.iter_frames_parallel(
+                video_path,
+                workers=settings.FRAME_EXTRACTION_WORKERS,
+                shards=settings.FRAME_EXTRACTION_WORKERS * 4,
+                content_hash=content_hash
+            )
+        else:
+            frame_stream = processor.iter_frames(
+                video_path,
+                queue_depth=settings.FRAME_QUEUE_DEPTH,
+                content_hash=content_hash
+            )
+        frame_stream = self._counted(frame_stream, expected_samples, sampled)
+
+        frame_spans = None
+        if settings.FRAME_DEDUP_ENABLED:
+            deduplicator = FrameDeduplicator(max_distance=settings.FRAME_DEDUP_MAX_DISTANCE)
+            frame_stream = deduplicator.deduplicate(frame_stream)
+            frame_spans = deduplicator.spans
+
+        # Attributes with templates are detected locally; only ambiguous frames go to Gemini,
+        # in windows sent while the video still streams (see analyze_ambiguous)
+        detector = None
+        ambiguous_calls: List[Future] = []
+        if video_family:
+            loop = asyncio.get_running_loop()
+
+            def analyze_ambiguous(frames: List[Tuple[float, bytes]], ambiguous_attributes: List[str]):
+                # Called from the thread consuming the frame stream, which waits here while
+                # GEMINI_MAX_CONCURRENCY ambiguous windows are in flight
+                pending = [call for call in ambiguous_calls if not call.done()]
+                if len(pending) >= settings.GEMINI_MAX_CONCURRENCY:
+                    wait_futures(pending, return_when=FIRST_COMPLETED)
+                ambiguous_calls.append(asyncio.run_coroutine_threadsafe(
+                    analyzer.analyze_frames_async(frames, ambiguous_attributes, frame_spans, on_event=on_event),
+                    loop
+                ))
+
+            # Reads and decodes the template images: off the event loop
+            detector = await asyncio.to_thread(
+                TemplateDetector.from_library,
+                settings.TEMPLATE_LIBRARY_DIR,
+                video_family,
+                attributes,
+                roi_profiles=settings.ROI_PROFILES,
+                match_threshold=settings.TEMPLATE_MATCH_THRESHOLD,
+                reject_threshold=settings.TEMPLATE_REJECT_THRESHOLD,
+                window_size=settings.GEMINI_WINDOW_FRAMES,
+                on_window=analyze_ambiguous
+            )
+        remote_attributes = attributes
+        if detector:
+            frame_stream = detector.screen(frame_stream)
+            remote_attributes = [a for a in attributes if a not in detector.templates]
+
+        try:
+            if remote_attributes:
+                # Skipped frames still pass dedup and the detector above, so windows line up
+                # with the checkpointed run and local detection covers the whole video
+                skipped = [0]
+                if resume_from:
+                    frame_stream = self._resumed(frame_stream, resume_from, skipped)
+                events, frame_count = await analyzer.analyze_frame_stream(
+                    frame_stream,
+                    remote_attributes,
+                    window_size=settings.GEMINI_WINDOW_FRAMES,
+                    frame_spans=frame_spans,
+                    overlap=settings.GEMINI_WINDOW_OVERLAP_FRAMES,
+                    concurrency=settings.GEMINI_MAX_CONCURRENCY,
+                    merge_seconds=settings.GEMINI_MERGE_SECONDS,
+                    on_event=on_event,
+                    on_checkpoint=on_checkpoint
+                )
+                # Frames before resume_from went to the model in the interrupted run
+                frames_sent = frame_count + skipped[0]
+            else:
+                events, frames_sent = [], 0
+                await asyncio.to_thread(lambda: sum(1 for _ in frame_stream))
+
+            if detector:
+                print(f"Template detector found {len(detector.events)} events, "
+                      f"{detector.ambiguous_count} frames of ambiguous stretches sent in {len(ambiguous_calls)} windows")
+                events.extend(detector.events)
+                frames_sent += detector.ambiguous_count
+                remote_events = []
+                for call in ambiguous_calls:
+                    remote_events.extend(await asyncio.wrap_future(call))
+                remote_events = suppress_duplicate_events(remote_events, settings.GEMINI_MERGE_SECONDS)
+                # Gemini may place a transition between samples: half an interval either side
+                events.extend(detector.keep_remote_events(
+                    remote_events, tolerance_seconds=settings.FRAME_INTERVAL_SECONDS / 2
+                ))
+        finally:
+            for call in ambiguous_calls:
+                call.cancel()
+        return events, sampled[0], frames_sent
+
+    def _counted(self, stream: Iterable[T], expected: int, sampled: List[int]) -> Iterator[T]:
+        """Pass samples through, counting them in sampled[0] and reporting analysis progress."""
+        reported = -1
+        for count, sample in enumerate(stream, 1):
+            sampled[0] = count
+            percent = min(99, count * 100 // expected)
+            if percent != reported:
+                reported = percent
+                self.report('analyzing', percent / 100, f"{count} frames sampled")
+            yield sample
+
+    @staticmethod
+    def _resumed(frames: Iterable[Tuple[float, bytes]], resume_from: float, skipped: List[int]) -> Iterator[Tuple[float, bytes]]:
+        """Frames from resume_from on, counting the ones dropped in skipped[0]."""
+        for frame in frames:
+            if frame[0] < resume_from:
+                skipped[0] += 1
+            else:
+                yield frame
+
+    def _save(
+        self,
+        video_id: str,
+        filename: str,
+        broadcast_start_time: str,
+        content_hash: str,
+        probe: VideoProbe,
+        events: List[Dict],
+        analysis_key: Optional[str] = None,
+        skip_if_current: bool = False,
+        run_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Ground truth JSON for the events, saved to the database (failures are reported in it).
+        The video's events and the drafts of run_id are replaced in one transaction, so
+        readers see either the old or the new ground truth.
+        With skip_if_current, a video whose saved events already come from analysis_key
+        (for the same content and broadcast start) is left as it is.
+        """
+        db = self.db
+        duration = probe.duration_seconds
+
+        # Generate ground truth JSON
+        ground_truth = GroundTruthGenerator().generate_json(
+            video_id=video_id,
+            broadcast_start_time=broadcast_start_time,
+            events=events,
+            duration_seconds=duration
+        )
+
+        try:
+            # 1. Check if video already exists, if not create it
+            video_record = db.query(Video).filter(Video.video_id == video_id).first()
+            if not video_record:
+                # Created with its events, so a video is never listed without them
+                video_record = Video(
+                    video_id=video_id,
+                    title=filename,
+                    file_path=filename,
+                    duration_seconds=duration,
+                    broadcast_start_time=broadcast_start_time
+                )
+                db.add(video_record)
+                db.flush()
+                print(f"✅ Creating Video record: {video_id}")
+            elif (skip_if_current
+                    and video_record.analysis_key == analysis_key
+                    and video_record.content_hash == content_hash
+                    and video_record.broadcast_start_time == broadcast_start_time):
+                print(f"✅ Ground truth of {video_id} is already saved for this analysis")
+                ground_truth['database_saved'] = True
+                ground_truth['events_saved'] = len(ground_truth['events'])
+                return ground_truth
+            else:
+                print(f"✅ Video record already exists: {video_id}")
+
+            video_record.content_hash = content_hash
+            probe.apply_to(video_record)
+
+            # 2. Delete existing ground truth events for this video (re-analysis), in the
+            #    transaction that saves the new ones
+            existing_count = db.query(GroundTruthEvent).filter(
+                GroundTruthEvent.video_id == video_id
+            ).delete()
+            if run_id:
+                db.query(DraftEvent).filter(DraftEvent.run_id == run_id).delete()
+
+            # 3. Save new ground truth events
+            for event_data in ground_truth['events']:
+                gt_event = GroundTruthEvent(
+                    video_id=video_id,
+                    attribute=event_data['attribute'],
+                    timestamp_seconds=event_data['timestamp_seconds'],
+                    live_clock_time=event_data['live_clock_time'],
+                    clue_description=event_data['clue_description']
+                )
+                db.add(gt_event)
+
+            # Committed with the events, so it never names events that failed to save
+            video_record.analysis_key = analysis_key
+            db.commit()
+            if existing_count > 0:
+                print(f"🗑️  Replaced {existing_count} existing ground truth events")
+            print(f"✅ Saved {len(ground_truth['events'])} ground truth events to database")
+
+            ground_truth['database_saved'] = True
+            ground_truth['events_saved'] = len(ground_truth['events'])
+
+        except Exception as db_error:
+            print(f"⚠️  Database save failed: {db_error}")
+            db.rollback()
+            ground_truth['database_saved'] = False
+            ground_truth['database_error'] = str(db_error)
+
+        return ground_truth
+
+    def _stored_result(self, key: str) -> Optional[AnalysisResult]:
+        try:
+            return self.db.query(AnalysisResult).filter(AnalysisResult.analysis_key == key).first()
+        except Exception as e:
+            # e.g. a database created before the table existed (run python -m app.init_db)
+            logger.warning(f"Stored analysis lookup failed: {e}")
+            self.db.rollback()
+            return None
+
+    def _store_result(
+        self,
+        key: str,
+        content_hash: str,
+        attributes: List[str],
+        video_family: Optional[str],
+        video_id: str,
+        duration_seconds: float,
+        frame_count: int,
+        events: List[Dict]
+    ):
+        """Keep the events for later requests with the same key (replacing an older run)."""
+        try:
+            result = self.db.query(AnalysisResult).filter(AnalysisResult.analysis_key == key).first()
+            if result is None:
+                result = AnalysisResult(analysis_key=key)
+                self.db.add(result)
+            result.content_hash = content_hash
+            result.attributes = ",".join(sorted(set(attributes)))
+            result.video_family = video_family
+            result.video_id = video_id
+            result.duration_seconds = duration_seconds
+            result.frames_analyzed = frame_count
+            result.events_json = json.dumps(events)
+            self.db.commit()
+        except Exception as e:
+            logger.warning(f"Could not store analysis result for {video_id}: {e}")
+            self.db.rollback()
@@ -0,0 +1,214 @@
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import threading
+import time
+import logging
+
+import httpx
+from google.genai import errors
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+logger = logging.getLogger(__name__)
+
+# Quota, timeout and server-side failures; anything else (bad request, auth) fails immediately
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Vertex AI bills an image part as a fixed number of input tokens
+IMAGE_TOKENS = 258
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the model while the circuit breaker is open."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+def estimate_tokens(contents) -> int:
+    """Rough input size of a request: ~4 characters per text token, fixed cost per image."""
+    if isinstance(contents, str):
+        return max(1, len(contents) // 4)
+    return sum(estimate_tokens(part) if isinstance(part, str) else IMAGE_TOKENS for part in contents)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute, holding at
+    most one minute's worth. acquire() reserves immediately and then sleeps off any
+    deficit, so waiting callers are served in arrival order. rate_per_minute <= 0
+    disables the limit.
+    """
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self._tokens = rate_per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take `amount` tokens and return how many seconds to wait before using them."""
+        if self.rate_per_second <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate_per_second)
+
+    def acquire(self, amount: float = 1.0):
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1.0):
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive retryable failures and rejects calls
+    for reset_seconds. After that one trial call is let through (half-open): success
+    closes the circuit, failure opens it again.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half-open"
+
+    def reject_if_open(self):
+        """Fail fast without claiming the half-open trial (before waiting on rate limits)."""
+        if self.state == "open":
+            raise CircuitOpenError("Vertex AI circuit breaker is open; failing fast")
+
+    def before_call(self):
+        """Right before the call; in half-open state, claims the one trial call."""
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self._trial_in_flight):
+                raise CircuitOpenError("Vertex AI circuit breaker is open; failing fast")
+            if state == "half-open":
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """The trial call ended without an answer (cancelled): let the next call try."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self.failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Opening Vertex AI circuit breaker after {self.failures} failures")
+                self._opened_at = time.monotonic()
+
+
+class CallGuard:
+    """
+    Wraps every model call: waits for request and token budget, fails fast while
+    the circuit is open, and retries retryable errors with jittered exponential
+    backoff. Each attempt goes through the buckets and the breaker again.
+    """
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_attempts: int = 5,
+        max_wait_seconds: float = 30.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_attempts = max_attempts
+        self.max_wait_seconds = max_wait_seconds
+        self.breaker = breaker or CircuitBreaker()
+
+    def call(self, fn: Callable[[], T], estimated_tokens: int = 1) -> T:
+        for attempt in Retrying(**self._retry_policy()):
+            with attempt:
+                self.breaker.reject_if_open()
+                self.requests.acquire()
+                self.tokens.acquire(estimated_tokens)
+                # Claimed only once the call goes out, and always given back
+                self.breaker.before_call()
+                try:
+                    result = fn()
+                except Exception as e:
+                    self._record(e)
+                    raise
+                except BaseException:
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_success()
+                return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]], estimated_tokens: int = 1) -> T:
+        async for attempt in AsyncRetrying(**self._retry_policy()):
+            with attempt:
+                self.breaker.reject_if_open()
+                await self.requests.acquire_async()
+                await self.tokens.acquire_async(estimated_tokens)
+                # Claimed only once the call goes out, and always given back
+                self.breaker.before_call()
+                try:
+                    result = await fn()
+                except Exception as e:
+                    self._record(e)
+                    raise
+                except BaseException:
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_success()
+                return result
+
+    def _record(self, error: Exception):
+        if is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            # The backend answered; a bad request says nothing about its health
+            self.breaker.record_success()
+
+    def _retry_policy(self) -> dict:
+        return dict(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_random_exponential(multiplier=0.5, max=self.max_wait_seconds),
+            retry=retry_if_exception(is_retryable),
+            before_sleep=lambda state: logger.warning(
+                f"Vertex AI call failed ({state.outcome.exception()}); "
+                f"retry {state.attempt_number}/{self.max_attempts - 1}"
+            ),
+            reraise=True
+        )
+
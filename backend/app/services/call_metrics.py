@@ -0,0 +1,123 @@
+from collections import deque
+from typing import Callable, Dict, List, Optional, TypeVar
+import threading
+import time
+
+T = TypeVar("T")
+
+
+def payload_size(contents) -> tuple[int, int]:
+    """(image count, bytes of prompt text plus image data) of a request."""
+    images = 0
+    size = 0
+    for part in [contents] if isinstance(contents, str) else contents:
+        if isinstance(part, str):
+            size += len(part.encode())
+        else:
+            images += 1
+            size += len(part.inline_data.data)
+    return images, size
+
+
+class CallTrace:
+    """
+    Measures one model call. Wrap the request with counting() so every attempt the
+    call guard makes is counted, mark first_chunk() when a streamed answer starts
+    arriving, then finish() with the response's usage_metadata (or the error).
+    """
+    def __init__(self, kind: str, contents, streamed: bool = False, cached: bool = False):
+        self.kind = kind
+        self.streamed = streamed
+        self.cached = cached
+        self.images, self.payload_bytes = payload_size(contents)
+        self.attempts = 0
+        self._started = time.perf_counter()
+        self._first_byte: Optional[float] = None
+
+    def counting(self, fn: Callable[[], T]) -> Callable[[], T]:
+        def attempt():
+            self.attempts += 1
+            return fn()
+        return attempt
+
+    def first_chunk(self):
+        if self._first_byte is None:
+            self._first_byte = time.perf_counter()
+
+    def finish(self, usage=None, error: Optional[Exception] = None) -> Dict:
+        """
+        Wall time covers rate-limit waits and retry backoff. Time to first byte is
+        only known for streamed calls; a plain call's answer arrives all at once.
+        """
+        now = time.perf_counter()
+        return {
+            'kind': self.kind,
+            'streamed': self.streamed,
+            'cached': self.cached,
+            'ok': error is None,
+            'error': str(error) if error else None,
+            'wall_seconds': round(now - self._started, 4),
+            'ttfb_seconds': round(self._first_byte - self._started, 4) if self._first_byte else None,
+            'retries': max(0, self.attempts - 1),
+            'images': self.images,
+            'payload_bytes': self.payload_bytes,
+            'prompt_tokens': getattr(usage, 'prompt_token_count', None) or 0,
+            'output_tokens': getattr(usage, 'candidates_token_count', None) or 0,
+            'total_tokens': getattr(usage, 'total_token_count', None) or 0,
+        }
+
+
+class CallMetrics:
+    """
+    Collects CallTrace records. Keeps running totals plus the last max_recent calls
+    (all of them when max_recent is None); with a parent, every record is also
+    passed up, so a per-analysis collector feeds the process-wide one.
+    """
+    TOTALS = ('retries', 'images', 'payload_bytes', 'prompt_tokens', 'output_tokens', 'total_tokens')
+
+    def __init__(self, parent: Optional["CallMetrics"] = None, max_recent: Optional[int] = None):
+        self.parent = parent
+        self.calls = deque(maxlen=max_recent)
+        self._lock = threading.Lock()
+        self._counts = {'calls': 0, 'cached': 0, 'errors': 0}
+        self._totals = dict.fromkeys(self.TOTALS, 0)
+
+    def record(self, call: Dict):
+        with self._lock:
+            self.calls.append(call)
+            self._counts['calls'] += 1
+            self._counts['cached'] += call['cached']
+            self._counts['errors'] += not call['ok']
+            for field in self.TOTALS:
+                self._totals[field] += call[field]
+        if self.parent:
+            self.parent.record(call)
+
+    def summary(self, include_calls: bool = False) -> Dict:
+        """
+        Totals over every call; latency percentiles (and call_details, if asked for)
+        over the calls still kept.
+        """
+        with self._lock:
+            calls = list(self.calls)
+            summary = {**self._counts, **self._totals}
+        remote = [c for c in calls if not c['cached'] and c['ok']]
+        summary['wall_seconds'] = self._percentiles([c['wall_seconds'] for c in remote])
+        summary['ttfb_seconds'] = self._percentiles([c['ttfb_seconds'] for c in remote if c['ttfb_seconds'] is not None])
+        if include_calls:
+            summary['call_details'] = calls
+        return summary
+
+    @staticmethod
+    def _percentiles(values: List[float]) -> Dict:
+        if not values:
+            return {'count': 0}
+        values = sorted(values)
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+        return {
+            'count': len(values),
+            'mean': round(sum(values) / len(values), 4),
+            'p50': pick(0.5),
+            'p95': pick(0.95),
+            'max': values[-1]
+        }
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import Session
+from typing import Dict, List
+import logging
+
+from app.models import DraftEvent
+from app.services.ground_truth_generator import GroundTruthGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class EventRecorder:
+    """
+    Writes DraftEvent rows for run_id (an analysis job's id) while its analysis is
+    still running, one commit per event, so the job status can show the events found
+    so far, and a failed or truncated analysis keeps them. The video's GroundTruthEvent
+    rows are left alone until the analysis completes and AnalysisPipeline saves the
+    final, merged list (clearing the run's drafts).
+    Database errors disable the recorder instead of failing the analysis.
+    add() is called on the event loop as events stream in, so the commits run in
+    order on a writer thread of their own; close() waits for them.
+    """
+    def __init__(self, db: Session, video_id: str, broadcast_start_time: str, run_id: str):
+        self.db = db
+        self.video_id = video_id
+        self.run_id = run_id
+        self.start_time = GroundTruthGenerator.parse_start_time(broadcast_start_time)
+        self.broadcast_start_time = broadcast_start_time
+        self.saved = 0
+        self.enabled = True
+        self._closed = False
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-recorder")
+
+    def start(self):
+        """
+        Clear drafts this run saved before it was interrupted: a resumed run adds the
+        events of its checkpoint again. Drafts of other runs are theirs to replace.
+        """
+        try:
+            self.db.query(DraftEvent).filter(DraftEvent.run_id == self.run_id).delete(synchronize_session=False)
+            self.db.commit()
+        except Exception as e:
+            self._disable(e)
+
+    @staticmethod
+    def drafts(db: Session, run_id: str) -> List[Dict]:
+        """The events saved so far by run_id, in video order."""
+        rows = db.query(DraftEvent).filter(DraftEvent.run_id == run_id).order_by(DraftEvent.timestamp_seconds)
+        return [
+            {
+                'attribute': row.attribute,
+                'timestamp_seconds': row.timestamp_seconds,
+                'live_clock_time': row.live_clock_time,
+                'clue_description': row.clue_description
+            }
+            for row in rows
+        ]
+
+    def add(self, event: Dict):
+        """Queue the event for saving; returns at once. Ignored once closed."""
+        if self.enabled and not self._closed:
+            self._writer.submit(self._write, event)
+
+    def close(self):
+        """Wait for queued events to be committed. Blocks."""
+        self._closed = True
+        self._writer.shutdown(wait=True)
+
+    def _write(self, event: Dict):
+        if not self.enabled:
+            return
+        try:
+            self.db.add(DraftEvent(
+                run_id=self.run_id,
+                video_id=self.video_id,
+                attribute=event['attribute'],
+                timestamp_seconds=event['timestamp_seconds'],
+                live_clock_time=GroundTruthGenerator.live_clock_time(self.start_time, event['timestamp_seconds']),
+                clue_description=event.get('clue_description')
+            ))
+            self.db.commit()
+            self.saved += 1
+        except Exception as e:
+            self._disable(e)
+
+    def _disable(self, error: Exception):
+        logger.warning(f"Incremental event saving disabled for {self.video_id}: {error}")
+        self.db.rollback()
+        self.enabled = False
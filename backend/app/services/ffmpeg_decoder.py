@@ -0,0 +1,144 @@
+import ffmpeg
+import numpy as np
+from typing import BinaryIO, Iterator, Optional, Tuple
+import math
+import shutil
+import logging
+
+from app.services.video_probe import VideoProbe
+
+logger = logging.getLogger(__name__)
+
+
+class FfmpegDecoder:
+    """
+    Decodes sample frames through an ffmpeg rawvideo pipe instead of cv2.VideoCapture.
+    Sampling (framestep, or fps in keyframes-only mode) and downscaling (scale) run
+    inside ffmpeg, so only kept frames are converted to BGR, and only at output size.
+
+    Frames are read with readinto() into a single preallocated buffer: each yielded
+    array is only valid until the next frame is requested, so consumers must encode
+    or copy it first (the VideoProcessor pipeline always does).
+    """
+    def __init__(self, keyframes_only: bool = False):
+        """
+        keyframes_only decodes I-frames only (-skip_frame nokey); each sample is then
+        the latest keyframe at or before its sample point, so content can lag the
+        timestamp by up to one GOP in exchange for a much cheaper decode. Sample points
+        after the last keyframe repeat it up to the end of the video (or stop_index),
+        as the OpenCV decoders' sample points would reach.
+        """
+        self.keyframes_only = keyframes_only
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("ffmpeg") is not None
+
+    @staticmethod
+    def output_size(probe: VideoProbe, max_width: int = 0) -> Tuple[int, int]:
+        """Same target size as VideoProcessor._encode so both backends produce matching frames."""
+        if max_width and probe.width > max_width:
+            return max_width, max(1, round(probe.height * max_width / probe.width))
+        return probe.width, probe.height
+
+    def iter_frames(
+        self,
+        video_path: str,
+        probe: VideoProbe,
+        frame_step: int,
+        start_index: int = 0,
+        stop_index: Optional[int] = None,
+        max_width: int = 0
+    ) -> Iterator[Tuple[float, np.ndarray]]:
+        """
+        Decode sample frames in [start_index, stop_index) every frame_step frames.
+        start_index must be a sample point, as for VideoProcessor._iter_decoded.
+        """
+        fps = probe.fps or 30.0
+        width, height = self.output_size(probe, max_width)
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Could not determine frame size of {video_path}")
+
+        max_frames = None
+        if stop_index is not None:
+            max_frames = max(0, math.ceil((stop_index - start_index) / frame_step))
+            if max_frames == 0:
+                return
+        elif self.keyframes_only and probe.frame_count:
+            # Bounds the padded keyframe stream (see _command)
+            max_frames = max(0, math.ceil((probe.frame_count - start_index) / frame_step))
+
+        process = self._command(video_path, fps, frame_step, start_index, width, height, max_frames).run_async(
+            pipe_stdout=True
+        )
+        buffer = np.empty((height, width, 3), dtype=np.uint8)
+        view = memoryview(buffer).cast('B')
+        sample = 0
+        try:
+            while self._read_frame(process.stdout, view):
+                yield (start_index + sample * frame_step) / fps, buffer
+                sample += 1
+        finally:
+            # Consumer may stop early; don't leave ffmpeg blocked on a full pipe
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            return_code = process.wait()
+
+        if return_code != 0:
+            logger.warning(f"ffmpeg exited with {return_code} after {sample} frames of {video_path}")
+
+    def _command(
+        self,
+        video_path: str,
+        fps: float,
+        frame_step: int,
+        start_index: int,
+        width: int,
+        height: int,
+        max_frames: Optional[int]
+    ):
+        input_args = {}
+        if self.keyframes_only:
+            input_args['skip_frame'] = 'nokey'
+            if start_index > 0:
+                # Inexact seek starts at the keyframe at or before start_index, which holds
+                # the first sample; timestamps then count from start_index
+                input_args['noaccurate_seek'] = None
+                input_args['ss'] = start_index / fps
+        elif start_index > 0:
+            # Accurate seek drops frames before -ss; half a frame early keeps start_index itself
+            input_args['ss'] = (start_index - 0.5) / fps
+
+        stream = ffmpeg.input(video_path, **input_args)
+        if self.keyframes_only:
+            if max_frames is not None:
+                # The fps filter drops sample points past the last keyframe; cloning it up to
+                # the end of the range fills them (from up to a GOP before start_index, so
+                # clone for the range's end time; vframes stops there)
+                stream = stream.filter(
+                    'tpad', stop_mode='clone', stop_duration=(start_index + max_frames * frame_step) / fps
+                )
+            # Resample the sparse keyframes onto the sample grid anchored at start_index:
+            # rounding keyframe times up gives each sample point the latest keyframe at or before it
+            stream = stream.filter('fps', fps=fps / frame_step, start_time=0, round='up')
+        else:
+            # Frame-count based, so sample points match the OpenCV loops exactly
+            stream = stream.filter('framestep', frame_step)
+        stream = stream.filter('scale', width, height, flags='area')
+
+        output_args = {'format': 'rawvideo', 'pix_fmt': 'bgr24', 'vsync': 'passthrough', 'an': None}
+        if max_frames is not None:
+            output_args['vframes'] = max_frames
+        return stream.output('pipe:', **output_args).global_args('-nostdin', '-loglevel', 'error')
+
+    @staticmethod
+    def _read_frame(pipe: BinaryIO, view: memoryview) -> bool:
+        filled = 0
+        while filled < len(view):
+            read = pipe.readinto(view[filled:])
+            if not read:
+                # EOF - a trailing partial frame is dropped
+                return False
+            filled += read
+        return True
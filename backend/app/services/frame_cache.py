@@ -0,0 +1,148 @@
+import mmap
+import os
+import tempfile
+import logging
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One record per frame in the .idx file; the .frames file is the JPEGs back to back
+INDEX_DTYPE = np.dtype([("timestamp", "<f8"), ("offset", "<u8"), ("length", "<u8")])
+
+
+class CachedFrames:
+    """
+    Read side of a cache entry. The packed file is memory-mapped, so frame(i)
+    is a zero-copy view; iterating copies one frame at a time into bytes.
+    """
+    def __init__(self, pack_path: str, index: np.ndarray):
+        self.index = index
+        self._file = open(pack_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def frame(self, i: int) -> memoryview:
+        record = self.index[i]
+        start = int(record["offset"])
+        return memoryview(self._map)[start:start + int(record["length"])]
+
+    def __iter__(self) -> Iterator[Tuple[float, bytes]]:
+        try:
+            for i in range(len(self.index)):
+                yield float(self.index[i]["timestamp"]), bytes(self.frame(i))
+        finally:
+            self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class FrameCacheWriter:
+    """Streams frames into temp files; nothing becomes visible until commit()."""
+    def __init__(self, cache: "FrameCache", key: str):
+        self.cache = cache
+        self.key = key
+        fd, self._pack_tmp = tempfile.mkstemp(dir=cache.cache_dir, suffix=".frames.tmp")
+        self._pack = os.fdopen(fd, "wb")
+        self._records = []
+        self._offset = 0
+        self._done = False
+
+    def append(self, timestamp: float, frame_bytes: bytes):
+        self._pack.write(frame_bytes)
+        self._records.append((timestamp, self._offset, len(frame_bytes)))
+        self._offset += len(frame_bytes)
+
+    def commit(self):
+        self._pack.close()
+        pack_path, index_path = self.cache._paths(self.key)
+
+        fd, index_tmp = tempfile.mkstemp(dir=self.cache.cache_dir, suffix=".idx.tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.array(self._records, dtype=INDEX_DTYPE).tofile(f)
+
+        # Pack first: an index on disk always has its pack next to it
+        os.replace(self._pack_tmp, pack_path)
+        os.replace(index_tmp, index_path)
+        self._done = True
+        self.cache.evict()
+
+    def abort(self):
+        if self._done:
+            return
+        self._done = True
+        self._pack.close()
+        if os.path.exists(self._pack_tmp):
+            os.remove(self._pack_tmp)
+
+
+class FrameCache:
+    """
+    Content-addressed on-disk cache of extracted frames.
+    Keys are derived from the video content hash and every parameter that changes
+    the extracted frames. Entries are evicted least-recently-used (by mtime, which
+    reads refresh) once the cache grows past max_bytes.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[CachedFrames]:
+        pack_path, index_path = self._paths(key)
+        try:
+            index = np.fromfile(index_path, dtype=INDEX_DTYPE)
+            cached = CachedFrames(pack_path, index)
+        except FileNotFoundError:
+            return None
+
+        # Touch both files so eviction treats this entry as recently used
+        for path in (pack_path, index_path):
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+        return cached
+
+    def writer(self, key: str) -> FrameCacheWriter:
+        return FrameCacheWriter(self, key)
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".frames"):
+                continue
+            key = name[:-len(".frames")]
+            pack_path, index_path = self._paths(key)
+            try:
+                size = os.path.getsize(pack_path) + os.path.getsize(index_path)
+                last_used = os.path.getmtime(pack_path)
+            except FileNotFoundError:
+                continue
+            entries.append((last_used, key, size))
+            total += size
+
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.info(f"Evicting frame cache entry {key} ({size} bytes)")
+            pack_path, index_path = self._paths(key)
+            for path in (index_path, pack_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return base + ".frames", base + ".idx"
@@ -1,71 +1,690 @@
 from google import genai
 from google.genai import types
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+import asyncio
 import json
 import logging
 import re
 import os
 
+from app.services.call_guard import CallGuard, IMAGE_TOKENS, estimate_tokens
+from app.services.call_metrics import CallMetrics, CallTrace
+from app.services.model_backends import request_digest
+from app.services.proxy_clip import ProxyClipEncoder
+from app.services.response_cache import ResponseCache
+from app.services.roi_profiles import FULL_FRAME
+from app.utils.contact_sheet import ContactSheetBuilder
+from app.utils.event_stream_parser import EventStreamParser
+from app.utils.frame_deduplicator import FrameDeduplicator
+from app.utils.temporal_nms import suppress_duplicate_events
+
 logger = logging.getLogger(__name__)
 
+# Part of every response cache key; bump to invalidate cached responses when a
+# request changes in a way the prompt text does not show (e.g. generation config)
+PROMPT_VERSION = 1
+
+T = TypeVar("T")
+
+# on_checkpoint(resume_from_seconds, windows_done, frames_done, events) of the windowed analyses
+CheckpointCallback = Callable[[float, int, int, List[Dict]], None]
+
 class GeminiAnalyzer:
-    def __init__(self, project_id: str, location: str = "us-central1", credentials_path: str = None, model_id: str = "gemini-2.0-flash-001"):
-        if not project_id:
-            raise ValueError("Google Cloud Project ID is required")
-        
-        # Set service account credentials if provided
-        if credentials_path:
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
-            logger.info(f"Using service account credentials from: {credentials_path}")
-        
-        # Initialize Vertex AI client
-        self.client = genai.Client(
-            vertexai=True,
-            project=project_id,
-            location=location
-        )
-        self.model_id = model_id 
+    def __init__(
+        self,
+        project_id: str,
+        location: str = "us-central1",
+        credentials_path: str = None,
+        model_id: str = "gemini-2.0-flash-001",
+        contact_sheet: Optional[ContactSheetBuilder] = None,
+        client: Optional[genai.Client] = None,
+        response_cache: Optional[ResponseCache] = None,
+        call_guard: Optional[CallGuard] = None,
+        metrics: Optional[CallMetrics] = None
+    ):
+        """
+        client: an existing (app-scoped) genai client to reuse; without one a new
+        client is built from project_id / location / credentials_path.
+        With a contact_sheet builder, frames are tiled into grid images with their
+        frame numbers burned in instead of being sent one image per frame.
+        With a response_cache, identical requests (same model, prompt and image
+        bytes) are answered from the cache instead of calling the model.
+        call_guard rate-limits and retries model calls; share one across analyzers
+        (see app.dependencies.get_call_guard) so they draw on the same quota.
+        With metrics, every model call (and cache hit) is recorded as a CallTrace.
+        """
+        if client is None:
+            if not project_id:
+                raise ValueError("Google Cloud Project ID is required")
+            
+            # Set service account credentials if provided
+            if credentials_path:
+                os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
+                logger.info(f"Using service account credentials from: {credentials_path}")
+            
+            # Initialize Vertex AI client
+            client = genai.Client(
+                vertexai=True,
+                project=project_id,
+                location=location
+            )
+        self.client = client
+        self.model_id = model_id
+        self.contact_sheet = contact_sheet
+        self.response_cache = response_cache
+        self.call_guard = call_guard or CallGuard()
+        self.metrics = metrics
     
     def analyze_frames(
         self, 
         frames: List[tuple[float, bytes]],
-        attribute_types: List[str]
+        attribute_types: List[str],
+        frame_spans: Optional[Dict[float, float]] = None,
+        region: Optional[str] = None
     ) -> List[Dict]:
-        
-        prompt = self._build_analysis_prompt(attribute_types, frames)
+        """
+        frame_spans optionally maps a frame's timestamp to the end of the static
+        stretch it represents (see FrameDeduplicator).
+        region describes the crop the images show (see roi_profiles), None for full frames.
+        """
+        contents = self._build_contents(frames, attribute_types, frame_spans, region)
+        try:
+            return self._generate(contents, lambda text: self._parse_gemini_response(text, frames))
+        except Exception as e:
+            logger.error(f"Gemini analysis failed: {e}")
+            raise
+
+    async def analyze_frames_async(
+        self,
+        frames: List[tuple[float, bytes]],
+        attribute_types: List[str],
+        frame_spans: Optional[Dict[float, float]] = None,
+        region: Optional[str] = None,
+        on_event: Optional[Callable[[Dict], None]] = None
+    ) -> List[Dict]:
+        """
+        analyze_frames through the async client, so several windows can be in flight.
+        The response is streamed and parsed incrementally: on_event is called with each
+        event as soon as it is complete, and a response that breaks off part way still
+        returns the events parsed before the break.
+        """
+        # Contact sheets are composed and resized here: CPU work, kept off the event loop
+        contents = await asyncio.to_thread(self._build_contents, frames, attribute_types, frame_spans, region)
+        try:
+            return await self._generate_events_stream(
+                contents, lambda event: self._to_event(event, frames), on_event
+            )
+        except Exception as e:
+            logger.error(f"Gemini analysis failed: {e}")
+            raise
+
+    async def _generate_events_stream(
+        self,
+        contents: List,
+        to_event: Callable[[Dict], Optional[Dict]],
+        on_event: Optional[Callable[[Dict], None]],
+        estimated_tokens: Optional[int] = None
+    ) -> List[Dict]:
+        """to_event validates one raw event and maps it to an event dict (see _to_event)."""
+        on_event = on_event or (lambda event: None)
+        # Hashing every image and the SQLite lookup block, so both run in a worker thread
+        key = await asyncio.to_thread(self._cache_key, contents) if self.response_cache else None
+        if key:
+            cached = await asyncio.to_thread(self.response_cache.get, key)
+            if cached is not None:
+                logger.info("Gemini response cache hit")
+                self._record(CallTrace("analysis", contents, streamed=True, cached=True))
+                events = self._parse_events(cached, to_event)
+                for event in events:
+                    on_event(event)
+                return events
+
+        trace = CallTrace("analysis", contents, streamed=True)
+        parser = EventStreamParser()
+        events = []
+        usage = None
+        try:
+            stream = await self.call_guard.call_async(
+                trace.counting(lambda: self.client.aio.models.generate_content_stream(
+                    model=self.model_id,
+                    contents=contents
+                )),
+                estimated_tokens or estimate_tokens(contents)
+            )
+            async for chunk in stream:
+                trace.first_chunk()
+                usage = chunk.usage_metadata or usage
+                for raw_event in parser.feed(chunk.text or ""):
+                    event = to_event(raw_event)
+                    if event:
+                        events.append(event)
+                        on_event(event)
+        except Exception as e:
+            self._record(trace, usage, e)
+            if not events:
+                raise
+            logger.warning(f"Gemini stream broke off after {len(events)} events: {e}")
+            return events
+        self._record(trace, usage)
+
+        if not parser.done:
+            # No complete events array: either truncated, or an answer in another shape
+            try:
+                parsed = self._parse_events(parser.text, to_event)
+            except ValueError:
+                if not events:
+                    raise
+                logger.warning(f"Gemini response was truncated; keeping {len(events)} events parsed so far")
+                return events
+            if not events:
+                for event in parsed:
+                    on_event(event)
+                events = parsed
+
+        if key:
+            await asyncio.to_thread(self.response_cache.put, key, parser.text)
+        return events
+
+    def _generate(
+        self,
+        contents: List,
+        parse: Callable[[str], T],
+        kind: str = "analysis",
+        estimated_tokens: Optional[int] = None
+    ) -> T:
+        """
+        Call the model, or answer from the response cache. Only responses that
+        parse are stored, so a malformed answer is retried next time.
+        """
+        key = self._cache_key(contents) if self.response_cache else None
+        if key:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                logger.info("Gemini response cache hit")
+                self._record(CallTrace(kind, contents, cached=True))
+                return parse(cached)
+
+        trace = CallTrace(kind, contents)
+        try:
+            response = self.call_guard.call(
+                trace.counting(lambda: self.client.models.generate_content(
+                    model=self.model_id,
+                    contents=contents
+                )),
+                estimated_tokens or estimate_tokens(contents)
+            )
+        except Exception as e:
+            self._record(trace, error=e)
+            raise
+        self._record(trace, response.usage_metadata)
+        result = parse(response.text)
+        if key:
+            self.response_cache.put(key, response.text)
+        return result
+
+    def _record(self, trace: CallTrace, usage=None, error: Optional[Exception] = None):
+        if self.metrics:
+            self.metrics.record(trace.finish(usage, error))
+
+    def _cache_key(self, contents: List) -> str:
+        """Digest of the model id, prompt version, prompt text and every image part."""
+        return request_digest(f"v{PROMPT_VERSION}:{self.model_id}", contents)
+
+    def _build_contents(
+        self,
+        frames: List[tuple[float, bytes]],
+        attribute_types: List[str],
+        frame_spans: Optional[Dict[float, float]],
+        region: Optional[str]
+    ) -> List:
+        prompt = self._build_analysis_prompt(attribute_types, frames, frame_spans, region)
         
         # Build contents list beginning with the prompt
         contents = [prompt]
         
-        # Add frames as separate parts
-        for timestamp, frame_bytes in frames:
+        # Add frames (or contact sheets of frames) as separate parts
+        if self.contact_sheet:
+            images = self.contact_sheet.build_sheets(frames)
+        else:
+            images = [frame_bytes for _, frame_bytes in frames]
+        for image_bytes in images:
             contents.append(
                 types.Part.from_bytes(
-                    data=frame_bytes,
+                    data=image_bytes,
                     mime_type="image/jpeg"
                 )
             )
-            
+        logger.info(f"Sending {len(frames)} frames in {len(images)} images to Gemini for analysis...")
+        return contents
+
+    async def analyze_frame_stream(
+        self,
+        frames: Iterable[tuple[float, bytes]],
+        attribute_types: List[str],
+        window_size: int = 300,
+        frame_spans: Optional[Dict[float, float]] = None,
+        overlap: int = 0,
+        concurrency: int = 1,
+        merge_seconds: float = 0.0,
+        on_event: Optional[Callable[[Dict], None]] = None,
+        on_checkpoint: Optional[CheckpointCallback] = None
+    ) -> Tuple[List[Dict], int]:
+        """
+        Analyze frames as they arrive in windows of window_size frames, each window
+        repeating the last `overlap` frames of the previous one so transitions at a
+        window edge are seen with context. Up to `concurrency` windows are in flight
+        at once; reading pauses while all slots are busy, so memory stays bounded.
+        Frames are pulled in a worker thread so decoding never blocks the event loop.
+        Events seen by two overlapping windows are merged with temporal NMS
+        (see suppress_duplicate_events) using merge_seconds; on_event sees every
+        event as it streams in, before merging.
+        on_checkpoint(resume_from_seconds, windows_done, frames_done, events) follows the
+        completed prefix of windows: analysing the frames from resume_from_seconds on and
+        merging with these (unmerged) events gives the same result as carrying on.
+        Returns: (events, total_frames_seen)
+        """
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1")
+        if not 0 <= overlap < window_size:
+            raise ValueError("overlap must be between 0 and window_size - 1")
+
+        frame_iterator = iter(frames)
+        in_flight = set()
+        results: Dict[int, List[Dict]] = {}
+        # First timestamp and number of frames not in the previous window, per window
+        window_starts: Dict[int, float] = {}
+        new_frames: Dict[int, int] = {}
+        window = []
+        window_count = 0
+        frame_count = 0
+        prefix = 0
+
+        def checkpoint():
+            nonlocal prefix
+            before = prefix
+            while prefix in results:
+                prefix += 1
+            if prefix == before:
+                return
+            # Unfinished work starts at the first window outside the prefix, or at the
+            # window being filled (which opens with the overlap frames)
+            if prefix in window_starts:
+                resume_from = window_starts[prefix]
+            elif window:
+                resume_from = window[0][0]
+            else:
+                return
+            on_checkpoint(
+                resume_from,
+                prefix,
+                sum(new_frames[index] for index in range(prefix)),
+                [event for index in range(prefix) for event in results[index]]
+            )
+
+        async def run(index: int, window_frames: List):
+            results[index] = await self.analyze_frames_async(
+                window_frames, attribute_types, frame_spans, on_event=on_event
+            )
+            if on_checkpoint:
+                checkpoint()
+
+        async def submit(window_frames: List):
+            nonlocal window_count
+            while len(in_flight) >= max(1, concurrency):
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                in_flight.difference_update(done)
+                for task in done:
+                    task.result()
+            window_starts[window_count] = window_frames[0][0]
+            new_frames[window_count] = len(window_frames) - (overlap if window_count else 0)
+            in_flight.add(asyncio.create_task(run(window_count, window_frames)))
+            window_count += 1
+
+        try:
+            while True:
+                frame = await asyncio.to_thread(next, frame_iterator, None)
+                if frame is None:
+                    break
+                window.append(frame)
+                frame_count += 1
+                if len(window) >= window_size:
+                    await submit(window)
+                    window = window[window_size - overlap:]
+
+            # The tail only holds frames already sent unless it grew past the overlap
+            tail, window = window, []
+            if len(tail) > (overlap if window_count else 0):
+                await submit(tail)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        events = [event for index in sorted(results) for event in results[index]]
+        merged = suppress_duplicate_events(events, merge_seconds)
+        if len(merged) < len(events):
+            logger.info(f"Merged {len(events) - len(merged)} duplicate events from overlapping windows")
+        return merged, frame_count
+
+    async def analyze_region_stream(
+        self,
+        tiles: Iterable[Tuple[float, Dict[str, bytes]]],
+        attribute_groups: Dict[str, List[str]],
+        window_size: int = 300,
+        deduplicators: Optional[Dict[str, FrameDeduplicator]] = None,
+        concurrency: int = 1,
+        on_event: Optional[Callable[[Dict], None]] = None
+    ) -> Tuple[List[Dict], int, int]:
+        """
+        ROI variant of analyze_frame_stream. Each tile set holds one crop per region;
+        every region keeps its own window (and optional deduplicator) and is sent
+        with only the attributes that live in that region. Windows of all regions
+        share up to `concurrency` slots, and tiles are pulled (and deduplicated) in a
+        worker thread while earlier windows are in flight.
+        Returns: (events, total_samples_seen, samples with a tile sent to the model)
+        """
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1")
+
+        deduplicators = deduplicators or {}
+        windows: Dict[str, List] = {key: [] for key in attribute_groups}
+        in_flight = set()
+        results: List[List[Dict]] = []
+        sample_count = 0
+        sent_timestamps = set()
+
+        def region_frames() -> Iterator[Tuple[str, Tuple[float, bytes]]]:
+            # Runs in the worker thread: the deduplicators hash every tile
+            nonlocal sample_count
+            for timestamp, region_tiles in tiles:
+                sample_count += 1
+                for key in attribute_groups:
+                    frame = (timestamp, region_tiles[key])
+                    if key in deduplicators:
+                        frame = deduplicators[key].push(*frame)
+                    if frame is not None:
+                        yield key, frame
+            for key in attribute_groups:
+                frame = deduplicators[key].flush() if key in deduplicators else None
+                if frame is not None:
+                    yield key, frame
+
+        async def run(index: int, key: str, window_frames: List):
+            names = attribute_groups[key]
+            dedup = deduplicators.get(key)
+
+            def region_event(event: Dict):
+                if on_event and event['attribute'] in names:
+                    on_event(event)
+
+            found = await self.analyze_frames_async(
+                window_frames, names, dedup.spans if dedup else None,
+                region=key, on_event=region_event
+            )
+            # A crop can only vouch for the attributes that live in its region
+            results[index] = [e for e in found if e['attribute'] in names]
+
+        async def submit(key: str):
+            while len(in_flight) >= max(1, concurrency):
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                in_flight.difference_update(done)
+                for task in done:
+                    task.result()
+            window_frames, windows[key] = windows[key], []
+            sent_timestamps.update(timestamp for timestamp, _ in window_frames)
+            results.append([])
+            in_flight.add(asyncio.create_task(run(len(results) - 1, key, window_frames)))
+
+        frame_iterator = region_frames()
+        try:
+            while True:
+                item = await asyncio.to_thread(next, frame_iterator, None)
+                if item is None:
+                    break
+                key, frame = item
+                windows[key].append(frame)
+                if len(windows[key]) >= window_size:
+                    await submit(key)
+
+            for key in attribute_groups:
+                if windows[key]:
+                    await submit(key)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        events = [event for found in results for event in found]
+        return events, sample_count, len(sent_timestamps)
+
+    def analyze_clip(
+        self,
+        clip: bytes,
+        attribute_types: List[str],
+        start_seconds: float,
+        duration_seconds: float,
+        fps: float
+    ) -> List[Dict]:
+        """
+        Clip mode counterpart of analyze_frames: one proxy clip (see ProxyClipEncoder)
+        covering [start_seconds, start_seconds + duration_seconds) of the broadcast,
+        sent as a single video part. The model answers with offsets into the clip,
+        which are anchored back to broadcast time.
+        """
+        contents = self._build_clip_contents(clip, attribute_types, start_seconds, duration_seconds, fps)
         try:
-            logger.info(f"Sending {len(frames)} frames to Gemini for analysis...")
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=contents
+            return self._generate(
+                contents,
+                lambda text: self._parse_events(
+                    text, lambda event: self._to_clip_event(event, start_seconds, duration_seconds)
+                ),
+                estimated_tokens=self._clip_tokens(contents, duration_seconds, fps)
             )
-            return self._parse_gemini_response(response.text, frames)
         except Exception as e:
-            logger.error(f"Gemini analysis failed: {e}")
+            logger.error(f"Gemini clip analysis failed: {e}")
             raise
 
-    def _build_analysis_prompt(self, attribute_types: List[str], frames: List) -> str:
+    async def analyze_clip_async(
+        self,
+        clip: bytes,
+        attribute_types: List[str],
+        start_seconds: float,
+        duration_seconds: float,
+        fps: float,
+        on_event: Optional[Callable[[Dict], None]] = None
+    ) -> List[Dict]:
+        """analyze_clip through the async client, streamed like analyze_frames_async."""
+        contents = self._build_clip_contents(clip, attribute_types, start_seconds, duration_seconds, fps)
+        try:
+            return await self._generate_events_stream(
+                contents,
+                lambda event: self._to_clip_event(event, start_seconds, duration_seconds),
+                on_event,
+                self._clip_tokens(contents, duration_seconds, fps)
+            )
+        except Exception as e:
+            logger.error(f"Gemini clip analysis failed: {e}")
+            raise
+
+    async def analyze_video_clips(
+        self,
+        video_path: str,
+        attribute_types: List[str],
+        duration_seconds: float,
+        encoder: ProxyClipEncoder,
+        window_seconds: float = 600.0,
+        overlap_seconds: float = 0.0,
+        concurrency: int = 1,
+        merge_seconds: float = 0.0,
+        on_event: Optional[Callable[[Dict], None]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        start_seconds: float = 0.0,
+        on_checkpoint: Optional[CheckpointCallback] = None
+    ) -> Tuple[List[Dict], int]:
+        """
+        Clip mode counterpart of analyze_frame_stream: the video is cut into windows of
+        window_seconds (each repeating the last overlap_seconds of the previous one),
+        every window is transcoded to a proxy clip in a worker thread and analysed.
+        Up to `concurrency` windows are encoded or in flight at once; events from
+        overlapping windows are merged with temporal NMS.
+        on_progress is called with (windows done, window count) as windows finish.
+        Windows starting before start_seconds are skipped (resuming a checkpoint, see
+        analyze_frame_stream for on_checkpoint; frames_done counts proxy clip frames).
+        Returns: (events, window_count)
+        """
+        if window_seconds <= 0:
+            raise ValueError("window_seconds must be positive")
+        if not 0 <= overlap_seconds < window_seconds:
+            raise ValueError("overlap_seconds must be between 0 and window_seconds")
+
+        windows = []
+        start = 0.0
+        while start < duration_seconds:
+            windows.append((start, min(window_seconds, duration_seconds - start)))
+            start += window_seconds - overlap_seconds
+        # The grid always starts at 0, so a resumed analysis cuts the same windows
+        windows = [(start, length) for start, length in windows if start >= start_seconds - 1e-6]
+        slots = asyncio.Semaphore(max(1, concurrency))
+        results: Dict[int, List[Dict]] = {}
+        prefix = 0
+
+        def checkpoint():
+            nonlocal prefix
+            before = prefix
+            while prefix in results:
+                prefix += 1
+            if before < prefix < len(windows):
+                resume_from = windows[prefix][0]
+                on_checkpoint(
+                    resume_from,
+                    prefix,
+                    round((resume_from - start_seconds) * encoder.fps),
+                    [event for index in range(prefix) for event in results[index]]
+                )
+
+        async def run(index: int, start: float, length: float):
+            async with slots:
+                clip = await asyncio.to_thread(encoder.encode, video_path, start, length)
+                results[index] = await self.analyze_clip_async(
+                    clip, attribute_types, start, length, encoder.fps, on_event
+                )
+            if on_progress:
+                on_progress(len(results), len(windows))
+            if on_checkpoint:
+                checkpoint()
+
+        await asyncio.gather(*(run(index, start, length) for index, (start, length) in enumerate(windows)))
+        events = [event for index in range(len(windows)) for event in results[index]]
+        merged = suppress_duplicate_events(events, merge_seconds)
+        if len(merged) < len(events):
+            logger.info(f"Merged {len(events) - len(merged)} duplicate events from overlapping clips")
+        return merged, len(windows)
+
+    def _build_clip_contents(
+        self,
+        clip: bytes,
+        attribute_types: List[str],
+        start_seconds: float,
+        duration_seconds: float,
+        fps: float
+    ) -> List:
+        prompt = f"""
+You are an expert EPG analyst for sports broadcasts.
+
+This video is a {duration_seconds:.1f}-second excerpt of the broadcast, starting {start_seconds:.2f}s into the broadcast.
+It plays at {fps:g} frames per second, and its own timeline starts at 0:00.
+
+Identify these event types:
+{', '.join(attribute_types)}
+
+For each event detected:
+1. Give offset_seconds: when the event first becomes visible, in seconds from the start of this video (0 to {duration_seconds:.1f})
+2. Provide a detailed visual clue description
+3. Rate confidence (0.0 to 1.0)
+
+Focus on TRANSITIONS: new elements appearing, graphics changing, or scene shifts.
+
+Output ONLY valid JSON in this exact format:
+{{
+  "events": [
+    {{
+      "attribute": "Main Logo",
+      "offset_seconds": 12.0,
+      "clue_description": "Broadcaster watermark appears in top-right",
+      "confidence": 0.92
+    }}
+  ]
+}}
+"""
+        logger.info(f"Sending {len(clip) / 1024:.0f} KB clip of {duration_seconds:.0f}s to Gemini for analysis...")
+        return [
+            prompt,
+            types.Part(
+                inline_data=types.Blob(data=clip, mime_type=ProxyClipEncoder.MIME_TYPE),
+                # Sample every proxy frame rather than the default one per second
+                video_metadata=types.VideoMetadata(fps=fps)
+            )
+        ]
+
+    @staticmethod
+    def _clip_tokens(contents: List, duration_seconds: float, fps: float) -> int:
+        """Rate-limit estimate: a sampled video frame costs about as much as an image."""
+        return estimate_tokens(contents[0]) + max(1, round(duration_seconds * fps)) * IMAGE_TOKENS
+
+    @staticmethod
+    def _clip_offset(value) -> Optional[float]:
+        """Seconds from a number, or from an "M:SS(.s)" / "H:MM:SS" string."""
+        if isinstance(value, str) and ':' in value:
+            seconds = 0.0
+            for field in value.split(':'):
+                seconds = seconds * 60 + float(field)
+            return seconds
+        return float(value)
+
+    def _to_clip_event(self, event: Dict, start_seconds: float, duration_seconds: float) -> Optional[Dict]:
+        """Validate one raw clip event and anchor its clip offset to broadcast time; None if unusable."""
+        try:
+            offset = self._clip_offset(event.get('offset_seconds'))
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= offset <= duration_seconds or not event.get('attribute'):
+            return None
+        return {
+            'attribute': event.get('attribute'),
+            'timestamp_seconds': round(start_seconds + offset, 3),
+            'clue_description': event.get('clue_description'),
+            'confidence_score': event.get('confidence', 0.0)
+        }
+
+    def _build_analysis_prompt(
+        self,
+        attribute_types: List[str],
+        frames: List,
+        frame_spans: Optional[Dict[float, float]] = None,
+        region: Optional[str] = None
+    ) -> str:
+        frame_spans = frame_spans or {}
         frame_info = "\n".join([
-            f"Frame {i}: {ts:.2f}s" 
+            self._describe_frame(i, ts, frame_spans.get(ts, ts))
             for i, (ts, _) in enumerate(frames)
         ])
+        region_info = ""
+        if region and region != FULL_FRAME:
+            region_info = f"\nEach image is a crop of the '{region}' region of the broadcast frame, where these elements appear.\n"
+        if self.contact_sheet:
+            sheet = self.contact_sheet
+            region_info += (
+                f"\nFrames are packed into contact sheets: each image is a {sheet.columns}x{sheet.rows} grid "
+                f"of up to {sheet.cells_per_sheet} frames, read left-to-right, top-to-bottom. "
+                f"Every cell shows its frame number in the top-left corner; image k holds frames "
+                f"{sheet.cells_per_sheet}*k to {sheet.cells_per_sheet}*k+{sheet.cells_per_sheet - 1}.\n"
+            )
         
         return f"""
 You are an expert EPG analyst for sports broadcasts.
-
+{region_info}
 Analyze these {len(frames)} frames and identify these event types:
 {', '.join(attribute_types)}
 
@@ -78,6 +697,7 @@ For each event detected:
 3. Rate confidence (0.0 to 1.0)
 
 Focus on TRANSITIONS: new elements appearing, graphics changing, or scene shifts.
+Frames marked "unchanged until" stand for a static stretch; the frame's own timestamp is when it first appeared.
 
 Output ONLY valid JSON in this exact format:
 {{
@@ -92,33 +712,108 @@ Output ONLY valid JSON in this exact format:
 }}
 """
     
-    def _parse_gemini_response(self, text: str, frames: List) -> List[Dict]:
+    @staticmethod
+    def _describe_frame(index: int, timestamp: float, span_end: float) -> str:
+        if span_end > timestamp:
+            return f"Frame {index}: {timestamp:.2f}s (unchanged until {span_end:.2f}s)"
+        return f"Frame {index}: {timestamp:.2f}s"
+
+    def refine_timestamp(
+        self,
+        attribute: str,
+        clue_description: str,
+        frames: List[tuple[float, bytes]]
+    ) -> Optional[float]:
+        """
+        Fine pass of coarse-to-fine analysis: given densely sampled frames around a
+        coarse detection, ask which frame first shows the event.
+        Returns the refined timestamp, or None if the model could not place it.
+        """
+        if not frames:
+            return None
+
+        frame_info = "\n".join(f"Frame {i}: {ts:.2f}s" for i, (ts, _) in enumerate(frames))
+        prompt = f"""
+You are an expert EPG analyst for sports broadcasts.
+
+The event "{attribute}" ({clue_description}) happens somewhere in these {len(frames)} consecutive frames.
+
+Frame timestamps (in seconds):
+{frame_info}
+
+Identify the FIRST frame in which the event is visible (the exact transition frame).
+
+Output ONLY valid JSON in this exact format:
+{{"frame_number": 3}}
+"""
+        contents = [prompt] + [
+            types.Part.from_bytes(data=frame_bytes, mime_type="image/jpeg")
+            for _, frame_bytes in frames
+        ]
+
         try:
-            # Clean markdown code blocks if present
-            clean_text = re.sub(r'```json\s*', '', text)
-            clean_text = re.sub(r'```\s*$', '', clean_text)
-            
-            # Extract JSON substring
-            json_start = clean_text.find('{')
-            json_end = clean_text.rfind('}') + 1
-            if json_start == -1 or json_end == 0:
-                raise ValueError("No JSON found in response")
-                
-            json_str = clean_text[json_start:json_end]
+            frame_num = self._generate(
+                contents,
+                lambda text: self._extract_json(text).get('frame_number'),
+                kind="refinement"
+            )
+        except ValueError as e:
+            logger.warning(f"Could not parse refinement response for {attribute}: {e}")
+            return None
+        if frame_num is None or not 0 <= int(frame_num) < len(frames):
+            return None
+        return frames[int(frame_num)][0]
+
+    @staticmethod
+    def _extract_json(text: str) -> Dict:
+        # Clean markdown code blocks if present
+        clean_text = re.sub(r'```json\s*', '', text)
+        clean_text = re.sub(r'```\s*$', '', clean_text)
+        
+        # Extract JSON substring
+        json_start = clean_text.find('{')
+        json_end = clean_text.rfind('}') + 1
+        if json_start == -1 or json_end == 0:
+            raise ValueError("No JSON found in response")
             
-            data = json.loads(json_str)
+        return json.loads(clean_text[json_start:json_end])
+
+    def _frame_number(self, event: Dict) -> Optional[int]:
+        """Frame index from an event; contact sheet answers may give sheet/cell instead."""
+        frame_num = event.get('frame_number')
+        if frame_num is None and self.contact_sheet:
+            sheet_num, cell_num = event.get('sheet_number'), event.get('cell_number')
+            if sheet_num is not None and cell_num is not None:
+                frame_num = int(sheet_num) * self.contact_sheet.cells_per_sheet + int(cell_num)
+        return int(frame_num) if frame_num is not None else None
+
+    def _to_event(self, event: Dict, frames: List) -> Optional[Dict]:
+        """Validate one raw event and map its frame number to a timestamp; None if unusable."""
+        try:
+            frame_num = self._frame_number(event)
+        except (TypeError, ValueError):
+            return None
+        if frame_num is None or not 0 <= frame_num < len(frames) or not event.get('attribute'):
+            return None
+        return {
+            'attribute': event.get('attribute'),
+            'timestamp_seconds': frames[frame_num][0],
+            'clue_description': event.get('clue_description'),
+            'confidence_score': event.get('confidence', 0.0)
+        }
+
+    def _parse_gemini_response(self, text: str, frames: List) -> List[Dict]:
+        return self._parse_events(text, lambda event: self._to_event(event, frames))
+
+    def _parse_events(self, text: str, to_event: Callable[[Dict], Optional[Dict]]) -> List[Dict]:
+        try:
+            data = self._extract_json(text)
             events = []
             
             for event in data.get('events', []):
-                frame_num = event.get('frame_number')
-                if frame_num is not None and 0 <= frame_num < len(frames):
-                    timestamp = frames[frame_num][0]
-                    events.append({
-                        'attribute': event.get('attribute'),
-                        'timestamp_seconds': timestamp,
-                        'clue_description': event.get('clue_description'),
-                        'confidence_score': event.get('confidence', 0.0)
-                    })
+                parsed = to_event(event)
+                if parsed:
+                    events.append(parsed)
             
             return events
         except Exception as e:
@@ -12,22 +12,16 @@ class GroundTruthGenerator:
         """
         Generate ground truth JSON from detected events
         """
-        try:
-            start_time = datetime.fromisoformat(broadcast_start_time)
-        except ValueError:
-            # Fallback if isoformat parsing fails (try without T or other formats?)
-            # Usually FastAPI ensures ISO format string
-            start_time = datetime.now() # Should not happen with valid input
+        start_time = self.parse_start_time(broadcast_start_time)
         
         formatted_events = []
         for event in events:
             timestamp_sec = event['timestamp_seconds']
-            live_time = start_time + timedelta(seconds=timestamp_sec)
             
             formatted_events.append({
                 'attribute': event['attribute'],
                 'timestamp_seconds': timestamp_sec,
-                'live_clock_time': live_time.strftime('%H:%M:%S.%f')[:-3],
+                'live_clock_time': self.live_clock_time(start_time, timestamp_sec),
                 'clue_description': event['clue_description'],
                 'confidence_score': event.get('confidence_score', 0.0)
             })
@@ -41,3 +35,17 @@ class GroundTruthGenerator:
             'broadcast_start_time': broadcast_start_time,
             'events': formatted_events
         }
+
+    @staticmethod
+    def parse_start_time(broadcast_start_time: str) -> datetime:
+        try:
+            return datetime.fromisoformat(broadcast_start_time)
+        except ValueError:
+            # Fallback if isoformat parsing fails (try without T or other formats?)
+            # Usually FastAPI ensures ISO format string
+            return datetime.now() # Should not happen with valid input
+
+    @staticmethod
+    def live_clock_time(start_time: datetime, timestamp_seconds: float) -> str:
+        live_time = start_time + timedelta(seconds=timestamp_seconds)
+        return live_time.strftime('%H:%M:%S.%f')[:-3]
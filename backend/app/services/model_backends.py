@@ -0,0 +1,205 @@
+from google import genai
+from google.genai import types
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Model backends (MODEL_BACKEND):
+# - vertex: the real Vertex AI client
+# - stub:   the genai SDK pointed at a local Gemini API stub (see model_stub), no credentials
+# - record: Vertex AI, with every exchange appended to a JSONL recording
+# - replay: answers from a recording only; no network at all
+MODEL_BACKENDS = ("vertex", "stub", "record", "replay")
+
+
+def request_digest(model: str, contents) -> str:
+    """Digest of the model name, text parts and image bytes of a request."""
+    digest = hashlib.sha256(model.encode())
+    for part in [contents] if isinstance(contents, str) else contents:
+        data = part.encode() if isinstance(part, str) else part.inline_data.data
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+def create_model_client(
+    backend: str,
+    project: Optional[str] = None,
+    location: str = "us-central1",
+    stub_url: str = "http://127.0.0.1:8090",
+    recording_path: str = "data/model_recording.jsonl"
+):
+    """
+    Client for the given backend. All of them offer the genai.Client surface this app
+    uses (models / aio.models generate_content(_stream), close, aio.aclose), so
+    GeminiAnalyzer and VertexAIService work unchanged on any of them.
+    """
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend}. Expected one of {MODEL_BACKENDS}")
+
+    if backend == "stub":
+        return genai.Client(api_key="stub", http_options=types.HttpOptions(base_url=stub_url))
+    if backend == "replay":
+        return ReplayClient(recording_path)
+
+    client = genai.Client(vertexai=True, project=project, location=location)
+    if backend == "record":
+        return RecordingClient(client, recording_path)
+    return client
+
+
+class _Recording:
+    """Append-only JSONL file of {key, model, chunks} records, one per model call."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        base_dir = os.path.dirname(path)
+        if base_dir:
+            os.makedirs(base_dir, exist_ok=True)
+
+    def write(self, model: str, contents, responses: List[types.GenerateContentResponse]):
+        record = {
+            'key': request_digest(model, contents),
+            'model': model,
+            'chunks': [r.model_dump(mode="json", exclude_none=True) for r in responses]
+        }
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def load(self) -> Dict[str, List[types.GenerateContentResponse]]:
+        recorded = {}
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    # Later recordings of the same request win
+                    recorded[record['key']] = [
+                        types.GenerateContentResponse.model_validate(chunk) for chunk in record['chunks']
+                    ]
+        return recorded
+
+
+class _RecordingModels:
+    def __init__(self, models, recording: _Recording):
+        self._models = models
+        self._recording = recording
+
+    def generate_content(self, model: str, contents, config=None):
+        response = self._models.generate_content(model=model, contents=contents, config=config)
+        self._recording.write(model, contents, [response])
+        return response
+
+
+class _AsyncRecordingModels:
+    def __init__(self, models, recording: _Recording):
+        self._models = models
+        self._recording = recording
+
+    async def generate_content(self, model: str, contents, config=None):
+        response = await self._models.generate_content(model=model, contents=contents, config=config)
+        self._recording.write(model, contents, [response])
+        return response
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        stream = await self._models.generate_content_stream(model=model, contents=contents, config=config)
+
+        async def chunks():
+            seen = []
+            async for chunk in stream:
+                seen.append(chunk)
+                yield chunk
+            # Only complete streams are recorded
+            self._recording.write(model, contents, seen)
+
+        return chunks()
+
+
+class _AsyncClient:
+    def __init__(self, models, close=None):
+        self.models = models
+        self._close = close
+
+    async def aclose(self):
+        if self._close:
+            await self._close()
+
+
+class RecordingClient:
+    """Forwards to a real client and appends every completed exchange to a JSONL recording."""
+    def __init__(self, client: genai.Client, path: str):
+        recording = _Recording(path)
+        self._client = client
+        self.models = _RecordingModels(client.models, recording)
+        self.aio = _AsyncClient(_AsyncRecordingModels(client.aio.models, recording), client.aio.aclose)
+
+    def close(self):
+        self._client.close()
+
+
+class _ReplayModels:
+    def __init__(self, recorded: Dict[str, List[types.GenerateContentResponse]], latency_seconds: float):
+        self._recorded = recorded
+        self.latency_seconds = latency_seconds
+
+    def lookup(self, model: str, contents) -> List[types.GenerateContentResponse]:
+        key = request_digest(model, contents)
+        if key not in self._recorded:
+            raise LookupError(f"No recorded response for request {key[:12]}; record it first with MODEL_BACKEND=record")
+        return self._recorded[key]
+
+    def generate_content(self, model: str, contents, config=None):
+        chunks = self.lookup(model, contents)
+        time.sleep(self.latency_seconds)
+        return _merge(chunks)
+
+
+class _AsyncReplayModels:
+    def __init__(self, models: _ReplayModels):
+        self._models = models
+
+    async def generate_content(self, model: str, contents, config=None):
+        chunks = self._models.lookup(model, contents)
+        await asyncio.sleep(self._models.latency_seconds)
+        return _merge(chunks)
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        chunks = self._models.lookup(model, contents)
+        await asyncio.sleep(self._models.latency_seconds)
+
+        async def replay():
+            for chunk in chunks:
+                yield chunk
+
+        return replay()
+
+
+class ReplayClient:
+    """Serves recorded responses by request digest; unknown requests raise LookupError."""
+    def __init__(self, path: str, latency_seconds: float = 0.0):
+        recorded = _Recording(path).load()
+        logger.info(f"Replaying {len(recorded)} recorded model responses from {path}")
+        self.models = _ReplayModels(recorded, latency_seconds)
+        self.aio = _AsyncClient(_AsyncReplayModels(self.models))
+
+    def close(self):
+        pass
+
+
+def _merge(chunks: List[types.GenerateContentResponse]) -> types.GenerateContentResponse:
+    """A streamed recording answered as one response (text joined, last usage kept)."""
+    if len(chunks) == 1:
+        return chunks[0]
+    text = "".join(chunk.text or "" for chunk in chunks)
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            finish_reason=types.FinishReason.STOP
+        )],
+        usage_metadata=next((c.usage_metadata for c in reversed(chunks) if c.usage_metadata), None)
+    )
@@ -0,0 +1,174 @@
+"""
+Local stand-in for the Gemini REST API, for load tests and benchmarks without
+quota or network. It speaks the generateContent / streamGenerateContent protocol,
+so the real genai SDK talks to it unchanged (see model_backends, MODEL_BACKEND=stub).
+
+Run it with:
+    python -m app.services.model_stub --port 8090 --latency 1.5 --error-rate 0.05
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Callable, Dict, List, Optional
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+
+from app.services.call_guard import IMAGE_TOKENS
+
+_ANALYSIS_PROMPT = re.compile(r"Analyze these (\d+) frames and identify these event types:\n(.+)\n")
+_REFINE_PROMPT = re.compile(r"happens somewhere in these (\d+) consecutive frames")
+_CLIP_PROMPT = re.compile(
+    r"This video is a ([\d.]+)-second excerpt.*?It plays at ([\d.]+) frames per second.*?"
+    r"Identify these event types:\n(.+?)\n",
+    re.DOTALL
+)
+
+
+def _attribute_position(attribute: str, positions: int) -> int:
+    return int(hashlib.sha256(attribute.encode()).hexdigest(), 16) % max(1, positions)
+
+
+def _events_json(attributes: str, position_key: str, position: Callable[[str], float]) -> str:
+    events = [
+        {
+            "attribute": attribute,
+            position_key: position(attribute),
+            "clue_description": f"Stub detection of {attribute}",
+            "confidence": 0.9
+        }
+        for attribute in [a.strip() for a in attributes.split(',') if a.strip()]
+    ]
+    return "```json\n" + json.dumps({"events": events}) + "\n```"
+
+
+def synthesize_response(prompt: str) -> str:
+    """
+    Plausible answer for the prompts this app sends: one event per requested
+    attribute for frame or clip analysis (at a frame or second derived from the
+    attribute name, so runs are repeatable), the middle frame for refinement,
+    short text otherwise.
+    """
+    analysis = _ANALYSIS_PROMPT.search(prompt)
+    if analysis:
+        frame_count = int(analysis.group(1))
+        return _events_json(
+            analysis.group(2), "frame_number", lambda attribute: _attribute_position(attribute, frame_count)
+        )
+
+    clip = _CLIP_PROMPT.search(prompt)
+    if clip:
+        seconds = int(float(clip.group(1)))
+        return _events_json(
+            clip.group(3), "offset_seconds", lambda attribute: float(_attribute_position(attribute, seconds))
+        )
+
+    refine = _REFINE_PROMPT.search(prompt)
+    if refine:
+        return json.dumps({"frame_number": int(refine.group(1)) // 2})
+
+    return "Stub feedback: watch for the visual cue and react as soon as it appears."
+
+
+def create_stub_app(
+    latency_seconds: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    response_text: Optional[str] = None,
+    chunks: int = 4,
+    seed: Optional[int] = None
+) -> FastAPI:
+    """
+    latency_seconds delays every answer (the first chunk when streaming);
+    error_rate is the share of requests answered with error_status instead;
+    response_text, if given, is returned for every request instead of a synthesized one.
+    """
+    app = FastAPI(title="Gemini stub")
+    rng = random.Random(seed)
+    app.state.requests = 0
+
+    def answer(body: Dict) -> tuple[str, Dict]:
+        parts = [part for content in body.get("contents", []) for part in content.get("parts", [])]
+        prompt = "\n".join(part["text"] for part in parts if "text" in part)
+        images = sum(1 for part in parts if "inlineData" in part or "inline_data" in part)
+        clip = _CLIP_PROMPT.search(prompt)
+        if clip:
+            # Video is billed per sampled frame
+            images = max(1, round(float(clip.group(1)) * float(clip.group(2))))
+        text = response_text if response_text is not None else synthesize_response(prompt)
+        usage = {
+            "promptTokenCount": len(prompt) // 4 + images * IMAGE_TOKENS,
+            "candidatesTokenCount": max(1, len(text) // 4),
+        }
+        usage["totalTokenCount"] = usage["promptTokenCount"] + usage["candidatesTokenCount"]
+        return text, usage
+
+    def response_json(text: str, usage: Optional[Dict], finished: bool = True) -> Dict:
+        candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+        if finished:
+            candidate["finishReason"] = "STOP"
+        body = {"candidates": [candidate]}
+        if usage:
+            body["usageMetadata"] = usage
+        return body
+
+    def error_response() -> JSONResponse:
+        return JSONResponse(
+            {"error": {"code": error_status, "message": "Stub injected error", "status": "UNAVAILABLE"}},
+            status_code=error_status
+        )
+
+    @app.post("/{api_version}/models/{model_action:path}")
+    async def generate(api_version: str, model_action: str, request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        await asyncio.sleep(latency_seconds)
+        if rng.random() < error_rate:
+            return error_response()
+
+        text, usage = answer(body)
+        if not model_action.endswith(":streamGenerateContent"):
+            return JSONResponse(response_json(text, usage))
+
+        size = max(1, -(-len(text) // max(1, chunks)))
+        pieces: List[str] = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+        async def events():
+            for i, piece in enumerate(pieces):
+                last = i == len(pieces) - 1
+                yield f"data: {json.dumps(response_json(piece, usage if last else None, last))}\r\n\r\n"
+                await asyncio.sleep(0)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Gemini API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--response-file", help="Return this file's text for every request")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    response_text = None
+    if args.response_file:
+        with open(args.response_file) as f:
+            response_text = f.read()
+    uvicorn.run(
+        create_stub_app(args.latency, args.error_rate, args.error_status, response_text, seed=args.seed),
+        host=args.host,
+        port=args.port
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import ffmpeg
+from typing import Optional
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ProxyClipEncoder:
+    """
+    Transcodes a time range of a video into a small proxy clip for the model: a
+    low-frame-rate, downscaled, silent H.264 MP4. At the low rates the model samples
+    video anyway, this is usually far smaller than the same coverage sent as JPEGs,
+    since unchanged picture areas cost almost nothing between frames.
+    """
+    MIME_TYPE = "video/mp4"
+
+    def __init__(self, max_width: int = 480, fps: float = 1.0, crf: int = 35, preset: str = "veryfast"):
+        """
+        fps is the proxy's frame rate; the model is asked to sample every proxy frame.
+        crf trades size for detail (x264 scale, higher is smaller); small on-screen
+        text such as copyright lines needs a lower crf or a larger max_width.
+        """
+        if fps <= 0:
+            raise ValueError("Proxy clip fps must be positive")
+        self.max_width = max_width
+        self.fps = fps
+        self.crf = crf
+        self.preset = preset
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("ffmpeg") is not None
+
+    def encode(self, video_path: str, start_seconds: float = 0.0, duration_seconds: Optional[float] = None) -> bytes:
+        """
+        Proxy of [start_seconds, start_seconds + duration_seconds) (to the end without
+        a duration). The clip's own timeline starts at 0 at start_seconds.
+        """
+        input_args = {}
+        if start_seconds > 0:
+            input_args['ss'] = start_seconds
+        if duration_seconds is not None:
+            input_args['t'] = duration_seconds
+
+        stream = ffmpeg.input(video_path, **input_args).filter('fps', fps=self.fps)
+        if self.max_width:
+            # Only ever shrink; -2 keeps the height even, as yuv420p requires
+            stream = stream.filter('scale', f"min(iw,{self.max_width})", -2, flags='area')
+        command = stream.output(
+            'pipe:',
+            format='mp4',
+            vcodec='libx264',
+            preset=self.preset,
+            crf=self.crf,
+            pix_fmt='yuv420p',
+            an=None,
+            # Fragmented MP4 needs no seekable output, so it can be written to a pipe
+            movflags='frag_keyframe+empty_moov'
+        ).global_args('-nostdin', '-loglevel', 'error')
+
+        try:
+            clip, _ = command.run(capture_stdout=True, capture_stderr=True)
+        except ffmpeg.Error as e:
+            raise RuntimeError(f"Could not encode proxy clip of {video_path}: {e.stderr.decode(errors='replace').strip()}")
+        logger.info(f"Encoded {len(clip) / 1024:.0f} KB proxy clip of {video_path} from {start_seconds:.0f}s")
+        return clip
@@ -0,0 +1,86 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+FULL_FRAME = "full"
+
+
+@dataclass(frozen=True)
+class RoiRegion:
+    """A rectangle in fractions of the frame size (0.0 - 1.0)."""
+    x: float
+    y: float
+    width: float
+    height: float
+    description: str = FULL_FRAME
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        frame_height, frame_width = frame.shape[:2]
+        left = int(round(self.x * frame_width))
+        top = int(round(self.y * frame_height))
+        right = max(left + 1, int(round((self.x + self.width) * frame_width)))
+        bottom = max(top + 1, int(round((self.y + self.height) * frame_height)))
+        return frame[top:bottom, left:right]
+
+
+def parse_region(spec: str) -> RoiRegion:
+    """
+    Parse a region spec such as "top-right 20%", "bottom 15%", "full",
+    or explicit fractions "x,y,width,height" (e.g. "0.8,0,0.2,0.2").
+    Corners take the percentage of both width and height; edges span the other axis.
+    """
+    spec = spec.strip().lower()
+    if spec in ("", FULL_FRAME):
+        return RoiRegion(0.0, 0.0, 1.0, 1.0)
+
+    if "," in spec:
+        x, y, width, height = (float(v) for v in spec.split(","))
+        return _checked(RoiRegion(x, y, width, height, spec))
+
+    anchor, _, size = spec.partition(" ")
+    try:
+        fraction = float(size.strip().rstrip("%")) / 100.0
+    except ValueError:
+        raise ValueError(f"Invalid ROI size in '{spec}'")
+
+    far = 1.0 - fraction
+    anchors = {
+        "top-left": (0.0, 0.0, fraction, fraction),
+        "top-right": (far, 0.0, fraction, fraction),
+        "bottom-left": (0.0, far, fraction, fraction),
+        "bottom-right": (far, far, fraction, fraction),
+        "top": (0.0, 0.0, 1.0, fraction),
+        "bottom": (0.0, far, 1.0, fraction),
+        "left": (0.0, 0.0, fraction, 1.0),
+        "right": (far, 0.0, fraction, 1.0),
+        "center": ((1.0 - fraction) / 2, (1.0 - fraction) / 2, fraction, fraction),
+    }
+    if anchor not in anchors:
+        raise ValueError(f"Unknown ROI anchor '{anchor}'. Expected one of {sorted(anchors)}")
+    return _checked(RoiRegion(*anchors[anchor], description=spec))
+
+
+def group_attributes(
+    attribute_types: List[str],
+    profiles: Dict[str, str]
+) -> Dict[str, Tuple[RoiRegion, List[str]]]:
+    """
+    Group attributes that share a region, so each region is cropped and sent once.
+    Attributes without a profile fall into the full-frame group.
+    Returns: {region_spec: (region, [attributes])}
+    """
+    groups: Dict[str, Tuple[RoiRegion, List[str]]] = {}
+    for attribute in attribute_types:
+        region = parse_region(profiles.get(attribute, FULL_FRAME))
+        key = region.description
+        if key not in groups:
+            groups[key] = (region, [])
+        groups[key][1].append(attribute)
+    return groups
+
+
+def _checked(region: RoiRegion) -> RoiRegion:
+    if not (0.0 <= region.x < 1.0 and 0.0 <= region.y < 1.0 and
+            0.0 < region.width <= 1.0 - region.x + 1e-9 and 0.0 < region.height <= 1.0 - region.y + 1e-9):
+        raise ValueError(f"ROI '{region.description}' falls outside the frame")
+    return region
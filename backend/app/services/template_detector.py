@@ -0,0 +1,193 @@
+import cv2
+import numpy as np
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import os
+import logging
+
+from app.services.roi_profiles import RoiRegion, parse_region
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# on_window(frames, attributes): a window of ambiguous frames and the attributes undecided in it
+AmbiguousWindowCallback = Callable[[List[Tuple[float, bytes]], List[str]], None]
+
+
+class TemplateDetector:
+    """
+    Local pre-detector for visually repetitive events (network logos, final slates).
+    Templates live in {library_dir}/{video_family}/{attribute}/*.png and are
+    captured at the same resolution as the analysed frames.
+
+    Each frame gets a normalised cross-correlation score per attribute (best over
+    its templates, searched inside the attribute's ROI if it has one):
+    - score >= match_threshold: present; an absent -> present change emits an event
+    - score <= reject_threshold: absent
+    - in between: ambiguous; the frame (plus the frame before it, for context) is
+      kept for Gemini and no local event is emitted across the ambiguous stretch
+
+    With on_window, ambiguous frames are handed over in windows of window_size as
+    they accumulate (and the rest when screen() ends), so memory stays bounded on
+    long videos; without it they collect in ambiguous_frames.
+    """
+    def __init__(
+        self,
+        templates: Dict[str, List[Tuple[str, np.ndarray]]],
+        regions: Optional[Dict[str, RoiRegion]] = None,
+        match_threshold: float = 0.85,
+        reject_threshold: float = 0.5,
+        window_size: int = 300,
+        on_window: Optional[AmbiguousWindowCallback] = None
+    ):
+        self.templates = templates
+        self.regions = regions or {}
+        self.match_threshold = match_threshold
+        self.reject_threshold = reject_threshold
+        self.window_size = max(1, window_size)
+        self.on_window = on_window
+
+        self.events: List[Dict] = []
+        self.ambiguous_frames: List[Tuple[float, bytes]] = []
+        self.ambiguous_count = 0 # Frames kept for Gemini (a context frame again at a window start)
+        # Per attribute, [start, end] of each ambiguous stretch, from its context frame on
+        self.ambiguous_spans: Dict[str, List[List[float]]] = {a: [] for a in templates}
+        self._window_attributes = set()
+        self._present = {a: False for a in templates}
+        self._uncertain = {a: False for a in templates}
+        self._previous: Optional[Tuple[float, bytes]] = None
+
+    @classmethod
+    def from_library(
+        cls,
+        library_dir: str,
+        video_family: str,
+        attribute_types: List[str],
+        roi_profiles: Optional[Dict[str, str]] = None,
+        **kwargs
+    ) -> Optional["TemplateDetector"]:
+        """Load templates for the requested attributes; None if the family has none."""
+        family_dir = os.path.join(library_dir, video_family)
+        templates = {}
+        for attribute in attribute_types:
+            attribute_dir = os.path.join(family_dir, attribute)
+            if not os.path.isdir(attribute_dir):
+                continue
+            loaded = []
+            for name in sorted(os.listdir(attribute_dir)):
+                if not name.lower().endswith(TEMPLATE_EXTENSIONS):
+                    continue
+                image = cv2.imread(os.path.join(attribute_dir, name), cv2.IMREAD_GRAYSCALE)
+                if image is None:
+                    logger.warning(f"Skipping unreadable template {attribute_dir}/{name}")
+                    continue
+                loaded.append((name, image))
+            if loaded:
+                templates[attribute] = loaded
+
+        if not templates:
+            return None
+
+        roi_profiles = roi_profiles or {}
+        regions = {a: parse_region(roi_profiles[a]) for a in templates if a in roi_profiles}
+        logger.info(f"Loaded templates for {sorted(templates)} from {family_dir}")
+        return cls(templates, regions, **kwargs)
+
+    @property
+    def attributes(self) -> List[str]:
+        return list(self.templates)
+
+    def screen(self, frames: Iterable[Tuple[float, bytes]]) -> Iterator[Tuple[float, bytes]]:
+        """Score frames as they stream past, passing them through unchanged."""
+        for frame in frames:
+            self.process(*frame)
+            yield frame
+        self.flush()
+
+    def flush(self):
+        """Hand the ambiguous frames collected so far to on_window, if set."""
+        if self.on_window is None or not self.ambiguous_frames:
+            return
+        frames, self.ambiguous_frames = self.ambiguous_frames, []
+        attributes, self._window_attributes = sorted(self._window_attributes), set()
+        self.on_window(frames, attributes)
+
+    def process(self, timestamp: float, frame_bytes: bytes):
+        image = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError(f"Could not decode frame at {timestamp:.2f}s")
+
+        ambiguous_attributes = []
+        for attribute, (score, template_name) in self.score(image).items():
+            if score >= self.match_threshold:
+                if not self._present[attribute] and not self._uncertain[attribute]:
+                    self.events.append({
+                        'attribute': attribute,
+                        'timestamp_seconds': timestamp,
+                        'clue_description': f"Matched template '{template_name}' locally",
+                        'confidence_score': round(score, 3),
+                        'source': 'template'
+                    })
+                elif self._uncertain[attribute]:
+                    # The transition sits in the ambiguous stretch; let Gemini see where it settles
+                    ambiguous_attributes.append(attribute)
+                self._present[attribute] = True
+                self._uncertain[attribute] = False
+            elif score <= self.reject_threshold:
+                self._present[attribute] = False
+                self._uncertain[attribute] = False
+            else:
+                ambiguous_attributes.append(attribute)
+                self._uncertain[attribute] = True
+
+        previous_timestamp = self._previous[0] if self._previous is not None else None
+        for attribute in ambiguous_attributes:
+            spans = self.ambiguous_spans[attribute]
+            if spans and spans[-1][1] == previous_timestamp:
+                spans[-1][1] = timestamp
+            else:
+                spans.append([timestamp if previous_timestamp is None else previous_timestamp, timestamp])
+
+        if ambiguous_attributes:
+            self._window_attributes.update(ambiguous_attributes)
+            known = {ts for ts, _ in self.ambiguous_frames[-2:]}
+            if self._previous is not None and self._previous[0] not in known:
+                self.ambiguous_frames.append(self._previous)
+                self.ambiguous_count += 1
+            if timestamp not in known:
+                self.ambiguous_frames.append((timestamp, frame_bytes))
+                self.ambiguous_count += 1
+            if len(self.ambiguous_frames) >= self.window_size:
+                self.flush()
+        self._previous = (timestamp, frame_bytes)
+
+    def score(self, image: np.ndarray) -> Dict[str, Tuple[float, str]]:
+        """Best normalised correlation per attribute. Returns: {attribute: (score, template_name)}"""
+        scores = {}
+        for attribute, templates in self.templates.items():
+            region = self.regions.get(attribute)
+            search = region.crop(image) if region else image
+
+            results = np.full(len(templates), -1.0)
+            for i, (_, template) in enumerate(templates):
+                if template.shape[0] > search.shape[0] or template.shape[1] > search.shape[1]:
+                    continue
+                results[i] = cv2.matchTemplate(search, template, cv2.TM_CCOEFF_NORMED).max()
+
+            best = int(np.argmax(results))
+            scores[attribute] = (float(results[best]), templates[best][0])
+        return scores
+
+    def keep_remote_events(self, events: List[Dict], tolerance_seconds: float = 0.0) -> List[Dict]:
+        """
+        Keep Gemini events only where the local detector could not decide: inside an
+        ambiguous stretch of their attribute (context frame included), give or take
+        tolerance_seconds.
+        """
+        return [
+            e for e in events
+            if any(
+                start - tolerance_seconds <= e['timestamp_seconds'] <= end + tolerance_seconds
+                for start, end in self.ambiguous_spans.get(e['attribute'], [])
+            )
+        ]
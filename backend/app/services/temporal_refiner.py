@@ -0,0 +1,47 @@
+from typing import Dict
+import logging
+
+from app.services.gemini_analyzer import GeminiAnalyzer
+from app.services.video_processor import VideoProcessor
+
+logger = logging.getLogger(__name__)
+
+class TemporalRefiner:
+    """
+    Second stage of coarse-to-fine analysis.
+    A coarse detection at t means the transition happened after the previous
+    coarse sample, i.e. within (t - coarse_interval, t]. Only that window is
+    re-extracted at fine_interval and the model picks the exact transition frame,
+    so timestamps get sub-second precision without dense sampling of the whole video.
+    """
+    def __init__(
+        self,
+        processor: VideoProcessor,
+        analyzer: GeminiAnalyzer,
+        coarse_interval_seconds: float,
+        fine_interval_seconds: float = 0.25
+    ):
+        self.processor = processor
+        self.analyzer = analyzer
+        self.coarse_interval = coarse_interval_seconds
+        self.fine_interval = fine_interval_seconds
+
+    def refine_event(self, video_path: str, event: Dict) -> Dict:
+        coarse_timestamp = event['timestamp_seconds']
+        window_start = max(0.0, coarse_timestamp - self.coarse_interval)
+
+        try:
+            frames = self.processor.extract_range(
+                video_path, window_start, coarse_timestamp, self.fine_interval
+            )
+            timestamp = self.analyzer.refine_timestamp(
+                event['attribute'], event.get('clue_description') or "", frames
+            )
+        except Exception as e:
+            # Refinement is best effort - the coarse timestamp is still valid
+            logger.warning(f"Refinement failed for {event['attribute']} at {coarse_timestamp:.2f}s: {e}")
+            timestamp = None
+
+        if timestamp is None:
+            return event
+        return {**event, 'timestamp_seconds': timestamp, 'coarse_timestamp_seconds': coarse_timestamp}
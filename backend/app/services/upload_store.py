@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Allowance on top of the video size for multipart boundaries, part headers and the
+# small form fields sent with it
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Content types accepted for uploads whose filename has no usable extension
+_CONTENT_TYPES = {
+    "mp4": "video/mp4",
+    "webm": "video/webm",
+    "mov": "video/quicktime",
+    "mkv": "video/x-matroska",
+}
+
+
+class UnsupportedVideoFormatError(Exception):
+    """The upload's extension / content type is not in ALLOWED_VIDEO_FORMATS."""
+
+
+class UploadTooLargeError(Exception):
+    """The upload exceeds MAX_VIDEO_SIZE_MB."""
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    """An upload written to UPLOAD_DIR, with the SHA-256 computed on the way in."""
+    path: str
+    filename: str
+    size_bytes: int
+    content_hash: str
+
+
+class UploadStore:
+    """
+    Writes uploaded videos to uniquely named files under upload_dir, chunk by chunk:
+    each chunk is hashed and written in a worker thread, and the copy stops (and the
+    partial file is removed) as soon as the upload passes max_bytes.
+    """
+    def __init__(
+        self,
+        upload_dir: str,
+        max_bytes: int,
+        allowed_formats: List[str],
+        chunk_size: int = 1024 * 1024
+    ):
+        self.upload_dir = upload_dir
+        self.max_bytes = max_bytes
+        self.allowed_formats = [fmt.lower().lstrip('.') for fmt in allowed_formats]
+        self.chunk_size = chunk_size
+
+    def video_format(self, filename: Optional[str], content_type: Optional[str]) -> str:
+        """The upload's format, by extension or else by content type. Raises UnsupportedVideoFormatError."""
+        ext = Path(filename or "").suffix.lower().lstrip('.')
+        if ext in self.allowed_formats:
+            return ext
+        for fmt in self.allowed_formats:
+            if content_type == _CONTENT_TYPES.get(fmt, f"video/{fmt}"):
+                return fmt
+        raise UnsupportedVideoFormatError(
+            f"Invalid video format: {filename} ({content_type}). "
+            f"Allowed formats: {', '.join(self.allowed_formats)}"
+        )
+
+    async def save(self, upload: UploadFile) -> StoredUpload:
+        """
+        Copy the upload to a new file under upload_dir. Raises UnsupportedVideoFormatError
+        or UploadTooLargeError; nothing is left on disk in either case.
+        """
+        fmt = self.video_format(upload.filename, upload.content_type)
+        os.makedirs(self.upload_dir, exist_ok=True)
+        # Unique per upload, so concurrent uploads of the same filename never share a file;
+        # the extension stays so decoders can tell the container
+        fd, path = tempfile.mkstemp(prefix="upload_", suffix=f".{fmt}", dir=self.upload_dir)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while chunk := await upload.read(self.chunk_size):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLargeError(
+                            f"Video is larger than the {self.max_bytes // (1024 * 1024)} MB limit"
+                        )
+                    await asyncio.to_thread(self._write_chunk, f, digest, chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        logger.info(f"Stored upload {upload.filename} ({size} bytes) as {path}")
+        return StoredUpload(path, upload.filename, size, digest.hexdigest())
+
+    @staticmethod
+    def _write_chunk(f, digest, chunk: bytes):
+        digest.update(chunk)
+        f.write(chunk)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects upload requests with 413 before their body is spooled to disk: at once when
+    Content-Length is over the limit, otherwise as soon as the streamed body passes it.
+    max_bytes covers the whole multipart body (the video plus its form fields).
+    """
+    def __init__(self, app: ASGIApp, max_bytes: int, path_prefix: str = "/"):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            # The body is never read; don't let the client reuse the connection
+            response = JSONResponse({"detail": self._detail()}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing, which passes HTTPExceptions through as responses
+                    raise HTTPException(413, self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _detail(self) -> str:
+        return f"Request body is larger than {self.max_bytes // (1024 * 1024)} MB"
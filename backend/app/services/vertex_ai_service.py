@@ -1,27 +1,18 @@
-from google import genai
 from app.config import settings
+from app.dependencies import create_genai_client, get_call_guard, get_call_metrics
+from app.services.call_guard import estimate_tokens
+from app.services.call_metrics import CallTrace
 import logging
-import os
 
 logger = logging.getLogger(__name__)
 
 class VertexAIService:
-    def __init__(self):
-        if not settings.GOOGLE_CLOUD_PROJECT:
-            logger.warning("GOOGLE_CLOUD_PROJECT not set. Feedback generation will fail.")
-            self.client = None
-        else:
-            # Set service account credentials if provided
-            if settings.GOOGLE_APPLICATION_CREDENTIALS:
-                os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = settings.GOOGLE_APPLICATION_CREDENTIALS
-                logger.info(f"Using service account credentials from: {settings.GOOGLE_APPLICATION_CREDENTIALS}")
-            
-            # Initialize Vertex AI client
-            self.client = genai.Client(
-                vertexai=True,
-                project=settings.GOOGLE_CLOUD_PROJECT,
-                location=settings.GOOGLE_CLOUD_LOCATION
-            )
+    def __init__(self, client=None):
+        """
+        client: the app-scoped model client (app.dependencies.get_genai_client) to reuse;
+        without one a client for the configured MODEL_BACKEND is built.
+        """
+        self.client = client if client is not None else create_genai_client()
         
         # Use model from settings
         self.model_id = settings.GEMINI_MODEL
@@ -52,12 +43,18 @@ Scenario:
 
 Keep the feedback concise (max 2 sentences) and encouraging. Focus on the visual cue.
 """
+        trace = CallTrace("feedback", prompt)
         try:
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt
+            response = get_call_guard().call(
+                trace.counting(lambda: self.client.models.generate_content(
+                    model=self.model_id,
+                    contents=prompt
+                )),
+                estimate_tokens(prompt)
             )
+            get_call_metrics().record(trace.finish(response.usage_metadata))
             return response.text
         except Exception as e:
+            get_call_metrics().record(trace.finish(error=e))
             logger.error(f"Feedback generation failed: {e}")
             return "Great job spotting that! Keep watching for the visual cues."
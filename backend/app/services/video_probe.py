@@ -0,0 +1,133 @@
+import cv2
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Probes memoized per process by content hash (bounded LRU)
+_PROBE_CACHE_SIZE = 256
+_probe_cache: "OrderedDict[str, VideoProbe]" = OrderedDict()
+_probe_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class VideoProbe:
+    """Container metadata read once per video file."""
+    fps: float
+    frame_count: int
+    duration_seconds: float
+    width: int
+    height: int
+    codec: str
+
+    @classmethod
+    def from_video(cls, video) -> Optional["VideoProbe"]:
+        """Rebuild a probe from a Video row, if it was probed before."""
+        if not video or not video.fps or video.frame_count is None:
+            return None
+        return cls(
+            fps=video.fps,
+            frame_count=video.frame_count,
+            duration_seconds=video.duration_seconds,
+            width=video.width,
+            height=video.height,
+            codec=video.codec
+        )
+
+    def apply_to(self, video) -> None:
+        video.fps = self.fps
+        video.frame_count = self.frame_count
+        video.duration_seconds = self.duration_seconds
+        video.width = self.width
+        video.height = self.height
+        video.codec = self.codec
+
+
+def probe_video(video_path: str, content_hash: Optional[str] = None) -> VideoProbe:
+    """
+    Open the container once and read its metadata.
+    With a content hash the result is memoized, so repeated calls for the same
+    content (e.g. from VideoProcessor and the analysis route) never reopen it.
+    """
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+
+    if content_hash is None:
+        return _read_probe(video_path)
+
+    with _probe_lock:
+        if content_hash in _probe_cache:
+            _probe_cache.move_to_end(content_hash)
+            return _probe_cache[content_hash]
+
+    probe = _read_probe(video_path)
+    remember_probe(content_hash, probe)
+    return probe
+
+
+def remember_probe(content_hash: str, probe: VideoProbe) -> None:
+    """Seed the memo, e.g. with a probe loaded from the database."""
+    with _probe_lock:
+        _probe_cache[content_hash] = probe
+        _probe_cache.move_to_end(content_hash)
+        while len(_probe_cache) > _PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+
+
+def _read_probe(video_path: str) -> VideoProbe:
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    finally:
+        cap.release()
+
+    codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ") if fourcc else ""
+    duration = frame_count / fps if fps > 0 else 0.0
+    if fps <= 0:
+        logger.warning(f"Could not determine FPS for {video_path}")
+
+    return VideoProbe(
+        fps=fps,
+        frame_count=frame_count,
+        duration_seconds=duration,
+        width=width,
+        height=height,
+        codec=codec
+    )
+
+
+def keyframe_interval(video_path: str, max_packets: int = 3000, keyframes: int = 4) -> Optional[int]:
+    """
+    Longest distance, in frames, between the first few keyframes, read by demuxing
+    packets only (no decoding, a few milliseconds). None if the container cannot be
+    read this way or no second keyframe turns up in the first max_packets packets.
+    """
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    try:
+        if not cap.isOpened():
+            return None
+        positions = []
+        for index in range(max_packets):
+            if not cap.grab():
+                break
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                positions.append(index)
+                if len(positions) > keyframes:
+                    break
+    except cv2.error as e:
+        logger.warning(f"Could not read keyframes of {video_path}: {e}")
+        return None
+    finally:
+        cap.release()
+
+    if len(positions) < 2:
+        return None
+    return max(later - earlier for earlier, later in zip(positions, positions[1:]))
@@ -1,55 +1,560 @@
 import cv2
-from typing import List, Tuple
+import numpy as np
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import math
+import multiprocessing
 import os
 import logging
+import queue
+import threading
+
+from app.services.ffmpeg_decoder import FfmpegDecoder
+from app.services.frame_cache import FrameCache
+from app.services.roi_profiles import RoiRegion
+from app.utils.file_hash import sha256_file
+from app.services.video_probe import VideoProbe, keyframe_interval, probe_video
+from app.utils.scene_change_detector import SceneChangeDetector
 
 logger = logging.getLogger(__name__)
 
+# Frame sampling strategies:
+# - sequential: decode every frame with read() and keep one per interval (original behaviour)
+# - grab: grab() every frame but only retrieve() (convert + copy) the ones we keep
+# - seek: jump straight to each sample point via CAP_PROP_POS_FRAMES (nearest keyframe + decode forward)
+# - auto: seek when sample points are further apart than keyframes, grab otherwise (see _sampling_strategy)
+SAMPLING_MODES = ("sequential", "grab", "seek", "auto")
+
+# Decoding backends: OpenCV VideoCapture (uses SAMPLING_MODES) or an ffmpeg
+# rawvideo pipe that samples and downscales inside ffmpeg
+DECODERS = ("opencv", "ffmpeg")
+
+# Sentinel marking the end of the iter_frames queue
+_END_OF_STREAM = object()
+
 class VideoProcessor:
-    def __init__(self, frame_interval_seconds: float = 2.0):
+    def __init__(
+        self,
+        frame_interval_seconds: float = 2.0,
+        sampling_mode: str = "auto",
+        jpeg_quality: int = 85,
+        scene_threshold: float = 0.0,
+        scene_max_gap_seconds: float = 30.0,
+        max_width: int = 0,
+        cache: Optional[FrameCache] = None,
+        decoder: str = "opencv",
+        keyframes_only: bool = False,
+        executor: Optional[Executor] = None
+    ):
+        """
+        scene_threshold > 0 keeps only sampled frames at scene changes (plus one
+        every scene_max_gap_seconds); 0 keeps every sample.
+        max_width > 0 downscales wider frames before JPEG encoding.
+        With a cache, extraction results are reused for identical video content.
+        decoder="ffmpeg" decodes through an ffmpeg pipe (sampling_mode is ignored);
+        keyframes_only then decodes I-frames only (see FfmpegDecoder).
+        executor is a long-lived process pool for iter_frames_parallel; without one,
+        each call starts (and tears down) its own.
+        """
+        if sampling_mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {sampling_mode}. Expected one of {SAMPLING_MODES}")
+        if decoder not in DECODERS:
+            raise ValueError(f"Unknown decoder: {decoder}. Expected one of {DECODERS}")
+        if decoder == "ffmpeg" and not FfmpegDecoder.available():
+            raise RuntimeError("ffmpeg decoder selected but no ffmpeg binary was found on PATH")
+
         self.frame_interval = frame_interval_seconds
-    
-    def extract_frames(self, video_path: str) -> List[Tuple[float, bytes]]:
+        self.sampling_mode = sampling_mode
+        self.jpeg_quality = jpeg_quality
+        self.scene_threshold = scene_threshold
+        self.scene_max_gap_seconds = scene_max_gap_seconds
+        self.max_width = max_width
+        self.cache = cache
+        self.decoder = decoder
+        self.keyframes_only = keyframes_only
+        self.executor = executor
+        self._ffmpeg = FfmpegDecoder(keyframes_only) if decoder == "ffmpeg" else None
+
+    def extract_frames(self, video_path: str, content_hash: Optional[str] = None) -> List[Tuple[float, bytes]]:
+        """
+        Extract one JPEG frame per frame_interval seconds.
+        content_hash (SHA-256 of the file) avoids re-hashing when a cache is set.
+        Returns: [(timestamp_seconds, jpeg_bytes), ...] in timestamp order
+        """
+        return list(self._through_cache(
+            video_path, content_hash, "serial", lambda: self._iter_encoded(video_path)
+        ))
+
+    def iter_frames(
+        self,
+        video_path: str,
+        queue_depth: int = 16,
+        content_hash: Optional[str] = None
+    ) -> Iterator[Tuple[float, bytes]]:
+        """
+        Streaming variant of extract_frames.
+        A background thread decodes and encodes up to queue_depth frames ahead of
+        the consumer, so memory stays bounded and downstream work (e.g. Gemini
+        calls) overlaps with decoding. queue_depth=0 decodes inline instead.
+        """
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+
+        yield from self._through_cache(
+            video_path, content_hash, "serial",
+            lambda: self._iter_threaded(lambda: self._iter_encoded(video_path), queue_depth)
+        )
+
+    def iter_region_frames(
+        self,
+        video_path: str,
+        regions: Dict[str, RoiRegion],
+        queue_depth: int = 16,
+        tile_max_width: Optional[int] = None
+    ) -> Iterator[Tuple[float, Dict[str, bytes]]]:
+        """
+        Decode each sample once and emit one cropped, downscaled JPEG tile per region.
+        Tiles are downscaled to tile_max_width (default: max_width) after cropping,
+        so small regions keep their native detail. Not cached: tiles depend on the profiles.
+        Returns: iterator of (timestamp_seconds, {region_key: jpeg_bytes})
+        """
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+
+        def produce():
+            detector = None
+            if self.scene_threshold > 0:
+                detector = SceneChangeDetector(self.scene_threshold, self.scene_max_gap_seconds)
+
+            for timestamp, frame in self._iter_decoded(video_path):
+                if detector and not detector.should_keep(timestamp, frame):
+                    continue
+                tiles = {}
+                for key, region in regions.items():
+                    encoded = self._encode(region.crop(frame), tile_max_width)
+                    if encoded is not None:
+                        tiles[key] = encoded
+                if len(tiles) == len(regions):
+                    yield timestamp, tiles
+
+        yield from self._iter_threaded(produce, queue_depth)
+
+    def _iter_threaded(self, produce_items: Callable[[], Iterator], queue_depth: int) -> Iterator:
+        if queue_depth <= 0:
+            yield from produce_items()
+            return
+
+        frame_queue = queue.Queue(maxsize=queue_depth)
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for item in produce_items():
+                    if not self._put(frame_queue, item, stop):
+                        return
+                self._put(frame_queue, _END_OF_STREAM, stop)
+            except Exception as e:
+                self._put(frame_queue, e, stop)
+
+        producer = threading.Thread(target=produce, name="frame-decoder", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = frame_queue.get()
+                if item is _END_OF_STREAM:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Consumer finished or bailed out early - let the decoder thread exit
+            stop.set()
+            producer.join()
+
+    @staticmethod
+    def _put(frame_queue: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                frame_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def extract_frames_parallel(
+        self,
+        video_path: str,
+        workers: Optional[int] = None,
+        shards: Optional[int] = None,
+        content_hash: Optional[str] = None
+    ) -> List[Tuple[float, bytes]]:
+        """
+        Same result as extract_frames, but the video is split into time ranges
+        that are decoded in separate processes and merged back in timestamp order.
+        """
+        return list(self.iter_frames_parallel(
+            video_path, workers=workers, shards=shards, content_hash=content_hash
+        ))
+
+    def iter_frames_parallel(
+        self,
+        video_path: str,
+        workers: Optional[int] = None,
+        shards: Optional[int] = None,
+        content_hash: Optional[str] = None
+    ) -> Iterator[Tuple[float, bytes]]:
+        """
+        Decode `shards` time ranges (default: one per worker) across a process pool,
+        each with its own cv2.VideoCapture, and yield frames in timestamp order.
+        At most `workers` shards are in flight ahead of the consumer.
+        """
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+
+        workers = workers or os.cpu_count() or 1
+        ranges = self._plan_shards(self.probe(video_path, content_hash), shards or workers)
+        # Scene filtering restarts at every shard boundary, so the output depends on the sharding
+        sharded = self.scene_threshold > 0 and workers > 1 and len(ranges) > 1
+        variant = f"shards={len(ranges)}" if sharded else "serial"
+        yield from self._through_cache(
+            video_path, content_hash, variant, lambda: self._iter_sharded(video_path, workers, ranges)
+        )
+
+    def _iter_sharded(
+        self,
+        video_path: str,
+        workers: int,
+        ranges: List[Tuple[int, Optional[int]]]
+    ) -> Iterator[Tuple[float, bytes]]:
+        if workers <= 1 or len(ranges) <= 1:
+            yield from self._iter_encoded(video_path)
+            return
+
+        if self.executor is not None:
+            pool = nullcontext(self.executor)
+        else:
+            # spawn: forking a process that already holds decoder threads is not safe
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        with pool as executor:
+            pending = deque()
+            next_range = 0
+            try:
+                while next_range < len(ranges) or pending:
+                    while next_range < len(ranges) and len(pending) < workers:
+                        start_index, stop_index = ranges[next_range]
+                        pending.append(executor.submit(
+                            _extract_shard,
+                            video_path,
+                            start_index,
+                            stop_index,
+                            self.frame_interval,
+                            self.sampling_mode,
+                            self.jpeg_quality,
+                            self.scene_threshold,
+                            self.scene_max_gap_seconds,
+                            self.max_width,
+                            self.decoder,
+                            self.keyframes_only
+                        ))
+                        next_range += 1
+                    yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def extract_range(
+        self,
+        video_path: str,
+        start_seconds: float,
+        end_seconds: float,
+        interval_seconds: float
+    ) -> List[Tuple[float, bytes]]:
+        """
+        Dense extraction of a short time range (e.g. around a detected event):
+        seek to start_seconds and keep one frame every interval_seconds up to end_seconds.
+        Ignores frame_interval, scene filtering and the cache.
+        """
         if not os.path.exists(video_path):
             raise FileNotFoundError(f"Video file not found: {video_path}")
-            
+
         cap = cv2.VideoCapture(video_path)
+        try:
+            fps = self._fps(cap)
+            start_index = max(0, int(math.floor(start_seconds * fps)))
+            stop_index = int(math.floor(end_seconds * fps))
+            step = max(1, int(round(interval_seconds * fps)))
+
+            if start_index > 0 and not cap.set(cv2.CAP_PROP_POS_FRAMES, start_index):
+                logger.warning(f"Could not seek to frame {start_index} in {video_path}")
+                return []
+
+            frames = []
+            frame_index = start_index
+            while frame_index <= stop_index and cap.grab():
+                if (frame_index - start_index) % step == 0:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    encoded = self._encode(frame)
+                    if encoded is not None:
+                        frames.append((frame_index / fps, encoded))
+                frame_index += 1
+            return frames
+        finally:
+            cap.release()
+
+    def cache_key(self, content_hash: str, variant: str = "serial") -> str:
+        """Cache key covering the video content and every parameter that changes the output frames."""
+        params = (
+            f"v1:{content_hash}:interval={self.frame_interval}:width={self.max_width}:"
+            f"quality={self.jpeg_quality}:scene={self.scene_threshold}/{self.scene_max_gap_seconds}:"
+            f"decoder={self.decoder}{'/keyframes' if self._ffmpeg and self.keyframes_only else ''}:{variant}"
+        )
+        return hashlib.sha256(params.encode()).hexdigest()
+
+    def _through_cache(
+        self,
+        video_path: str,
+        content_hash: Optional[str],
+        variant: str,
+        produce: Callable[[], Iterator[Tuple[float, bytes]]]
+    ) -> Iterator[Tuple[float, bytes]]:
+        if self.cache is None:
+            yield from produce()
+            return
+
+        key = self.cache_key(content_hash or sha256_file(video_path), variant)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Frame cache hit for {video_path} ({len(cached)} frames)")
+            yield from cached
+            return
+
+        # Only a fully consumed stream is committed; abandoned streams leave no entry
+        writer = self.cache.writer(key)
+        try:
+            for timestamp, frame_bytes in produce():
+                writer.append(timestamp, frame_bytes)
+                yield timestamp, frame_bytes
+            writer.commit()
+        finally:
+            writer.abort()
+
+    def _plan_shards(self, probe: VideoProbe, shards: int) -> List[Tuple[int, Optional[int]]]:
+        """
+        Split the sample points into contiguous [start_frame, stop_frame) ranges.
+        Boundaries always fall on a sample point and the last range runs to EOF,
+        so no sample is dropped or duplicated even if the container's frame count is off.
+        """
+        frame_interval = self._frame_step(probe.fps or 30.0)
+        frame_count = probe.frame_count
+        total_samples = math.ceil(frame_count / frame_interval) if frame_count > 0 else 0
+        shards = max(1, min(shards, total_samples))
+
+        boundaries = [
+            (total_samples * i // shards) * frame_interval
+            for i in range(shards)
+        ]
+        return [
+            (start, boundaries[i + 1] if i + 1 < shards else None)
+            for i, start in enumerate(boundaries)
+        ]
+
+    def _iter_encoded(
+        self,
+        video_path: str,
+        start_index: int = 0,
+        stop_index: Optional[int] = None
+    ) -> Iterator[Tuple[float, bytes]]:
+        detector = None
+        if self.scene_threshold > 0:
+            detector = SceneChangeDetector(self.scene_threshold, self.scene_max_gap_seconds)
+
+        for timestamp, frame in self._iter_decoded(video_path, start_index, stop_index, downscale=True):
+            # Drop near-identical samples before paying for the JPEG encode
+            if detector and not detector.should_keep(timestamp, frame):
+                continue
+            encoded = self._encode(frame)
+            if encoded is not None:
+                yield timestamp, encoded
+
+    def _iter_decoded(
+        self,
+        video_path: str,
+        start_index: int = 0,
+        stop_index: Optional[int] = None,
+        downscale: bool = False
+    ) -> Iterator[Tuple[float, np.ndarray]]:
+        """
+        Decode sample frames in [start_index, stop_index) (frame numbers, stop None = EOF).
+        start_index must be a sample point, i.e. a multiple of the frame step.
+        downscale lets the ffmpeg backend apply max_width at decode time; OpenCV
+        frames are always full size and get downscaled in _encode.
+        """
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+
+        if self._ffmpeg is not None:
+            probe = self.probe(video_path)
+            yield from self._ffmpeg.iter_frames(
+                video_path,
+                probe,
+                self._frame_step(probe.fps or 30.0),
+                start_index,
+                stop_index,
+                self.max_width if downscale else 0
+            )
+            return
+
+        cap = cv2.VideoCapture(video_path)
+        try:
+            fps = self._fps(cap)
+            frame_interval = self._frame_step(fps)
+
+            if start_index > 0 and not cap.set(cv2.CAP_PROP_POS_FRAMES, start_index):
+                logger.warning(f"Could not seek to frame {start_index} in {video_path}")
+                return
+
+            sampling_mode = self._sampling_strategy(video_path, frame_interval)
+            if sampling_mode == "seek":
+                yield from self._decode_by_seek(cap, fps, frame_interval, start_index, stop_index)
+            elif sampling_mode == "grab":
+                yield from self._decode_by_grab(cap, fps, frame_interval, start_index, stop_index)
+            else:
+                yield from self._decode_sequential(cap, fps, frame_interval, start_index, stop_index)
+        finally:
+            cap.release()
+
+    @staticmethod
+    def _fps(cap) -> float:
         fps = cap.get(cv2.CAP_PROP_FPS)
-        
+
         if fps == 0:
             # Fallback or error
             logger.warning("Could not determine FPS, assuming 30")
             fps = 30.0
-            
+        return fps
+
+    def _frame_step(self, fps: float) -> int:
         frame_interval = int(fps * self.frame_interval)
         if frame_interval < 1: frame_interval = 1
-        
-        frames = []
-        frame_count = 0
-        
-        while True:
+        return frame_interval
+
+    def _sampling_strategy(self, video_path: str, frame_step: int) -> str:
+        """
+        The sampling mode for this video: sampling_mode, or for "auto" seek when the
+        frame step is longer than the keyframe interval and grab otherwise. A seek
+        decodes from the keyframe before the sample point, so it only saves work once
+        keyframes are closer together than samples. Speedup over sequential on 720p
+        H.264 (120s, 30fps):
+
+            keyframe interval   sample interval   grab    seek
+            8.3s                2s                1.72x   0.76x
+            8.3s                10s               1.35x   2.92x
+            8.3s                20s               1.49x   7.37x
+            1s                  2s                1.53x   2.93x
+            1s                  10s               1.39x  12.56x
+        """
+        if self.sampling_mode != "auto":
+            return self.sampling_mode
+        gop = keyframe_interval(video_path)
+        return "seek" if gop and frame_step > gop else "grab"
+
+    def _decode_sequential(
+        self, cap, fps: float, frame_interval: int, start_index: int, stop_index: Optional[int]
+    ) -> Iterator[Tuple[float, np.ndarray]]:
+        frame_count = start_index
+
+        while stop_index is None or frame_count < stop_index:
             ret, frame = cap.read()
             if not ret:
                 break
-            
+
             # Extract keyframe
             if frame_count % frame_interval == 0:
-                timestamp = frame_count / fps
-                # Encode to JPEG with optimization
-                success, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-                if success:
-                    frames.append((timestamp, buffer.tobytes()))
-            
+                yield frame_count / fps, frame
+
             frame_count += 1
-        
-        cap.release()
-        return frames
 
-    def get_video_duration(self, video_path: str) -> float:
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-        if fps == 0: return 0.0
-        duration = frame_count / fps
-        cap.release()
-        return duration
+    def _decode_by_grab(
+        self, cap, fps: float, frame_interval: int, start_index: int, stop_index: Optional[int]
+    ) -> Iterator[Tuple[float, np.ndarray]]:
+        # grab() still demuxes/decodes, but skipping retrieve() avoids the
+        # colour conversion and numpy copy for every frame we throw away
+        frame_count = start_index
+
+        while (stop_index is None or frame_count < stop_index) and cap.grab():
+            if frame_count % frame_interval == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                yield frame_count / fps, frame
+
+            frame_count += 1
+
+    def _decode_by_seek(
+        self, cap, fps: float, frame_interval: int, start_index: int, stop_index: Optional[int]
+    ) -> Iterator[Tuple[float, np.ndarray]]:
+        # Only pays off when the interval is longer than the GOP; the sample
+        # points are identical to the sequential loop
+        frame_index = start_index
+
+        while stop_index is None or frame_index < stop_index:
+            if not cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index):
+                break
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame_index / fps, frame
+            frame_index += frame_interval
+
+    def _encode(self, frame: np.ndarray, max_width: Optional[int] = None) -> Optional[bytes]:
+        max_width = self.max_width if max_width is None else max_width
+        if max_width and frame.shape[1] > max_width:
+            height = max(1, round(frame.shape[0] * max_width / frame.shape[1]))
+            frame = cv2.resize(frame, (max_width, height), interpolation=cv2.INTER_AREA)
+
+        # Encode to JPEG with optimization
+        success, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if not success:
+            return None
+        return buffer.tobytes()
+
+    def probe(self, video_path: str, content_hash: Optional[str] = None) -> VideoProbe:
+        return probe_video(video_path, content_hash)
+
+    def get_video_duration(self, video_path: str, content_hash: Optional[str] = None) -> float:
+        return self.probe(video_path, content_hash).duration_seconds
+
+
+def _extract_shard(
+    video_path: str,
+    start_index: int,
+    stop_index: Optional[int],
+    frame_interval_seconds: float,
+    sampling_mode: str,
+    jpeg_quality: int,
+    scene_threshold: float,
+    scene_max_gap_seconds: float,
+    max_width: int,
+    decoder: str = "opencv",
+    keyframes_only: bool = False
+) -> List[Tuple[float, bytes]]:
+    """
+    Process pool entry point: decode one time range with its own capture.
+    With scene filtering on, each shard always keeps its first sample.
+    """
+    processor = VideoProcessor(
+        frame_interval_seconds=frame_interval_seconds,
+        sampling_mode=sampling_mode,
+        jpeg_quality=jpeg_quality,
+        scene_threshold=scene_threshold,
+        scene_max_gap_seconds=scene_max_gap_seconds,
+        max_width=max_width,
+        decoder=decoder,
+        keyframes_only=keyframes_only
+    )
+    return list(processor._iter_encoded(video_path, start_index, stop_index))
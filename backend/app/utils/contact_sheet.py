@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+from typing import List, Tuple
+
+
+class ContactSheetBuilder:
+    """
+    Packs many frames into one JPEG grid ("contact sheet") so a long video needs
+    far fewer image parts. Cells are filled left-to-right, top-to-bottom and each
+    carries its frame number burned into the top-left corner.
+    """
+    LABEL_HEIGHT_RATIO = 0.14
+
+    def __init__(self, columns: int = 4, rows: int = 4, cell_width: int = 320, jpeg_quality: int = 80):
+        if columns < 1 or rows < 1:
+            raise ValueError("Contact sheet needs at least one row and one column")
+        self.columns = columns
+        self.rows = rows
+        self.cell_width = cell_width
+        self.jpeg_quality = jpeg_quality
+
+    @property
+    def cells_per_sheet(self) -> int:
+        return self.columns * self.rows
+
+    def build_sheets(self, frames: List[Tuple[float, bytes]]) -> List[bytes]:
+        """Returns one JPEG per cells_per_sheet frames; labels are indices into `frames`."""
+        return [
+            self.build(frames[start:start + self.cells_per_sheet], first_index=start)
+            for start in range(0, len(frames), self.cells_per_sheet)
+        ]
+
+    def build(self, frames: List[Tuple[float, bytes]], first_index: int = 0) -> bytes:
+        images = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for _, data in frames]
+        if not images or any(image is None for image in images):
+            raise ValueError("Could not decode frames for contact sheet")
+
+        # Cell aspect follows the first frame; other frames are letterboxed into it
+        first_height, first_width = images[0].shape[:2]
+        cell_height = max(1, round(self.cell_width * first_height / first_width))
+        sheet = np.zeros((cell_height * self.rows, self.cell_width * self.columns, 3), dtype=np.uint8)
+
+        for i, image in enumerate(images):
+            row, column = divmod(i, self.columns)
+            cell = self._fit(image, self.cell_width, cell_height)
+            top = row * cell_height + (cell_height - cell.shape[0]) // 2
+            left = column * self.cell_width + (self.cell_width - cell.shape[1]) // 2
+            sheet[top:top + cell.shape[0], left:left + cell.shape[1]] = cell
+            self._label(sheet, str(first_index + i), column * self.cell_width, row * cell_height, cell_height)
+
+        success, buffer = cv2.imencode('.jpg', sheet, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if not success:
+            raise ValueError("Could not encode contact sheet")
+        return buffer.tobytes()
+
+    @staticmethod
+    def _fit(image: np.ndarray, width: int, height: int) -> np.ndarray:
+        scale = min(width / image.shape[1], height / image.shape[0])
+        size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    def _label(self, sheet: np.ndarray, text: str, left: int, top: int, cell_height: int):
+        label_height = max(12, round(cell_height * self.LABEL_HEIGHT_RATIO))
+        scale = label_height / 30.0
+        thickness = max(1, round(scale * 2))
+        (text_width, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+        # Black box behind white text stays legible on any content
+        cv2.rectangle(sheet, (left, top), (left + text_width + 8, top + label_height + 6), (0, 0, 0), -1)
+        cv2.putText(sheet, text, (left + 4, top + label_height), cv2.FONT_HERSHEY_SIMPLEX,
+                    scale, (255, 255, 255), thickness, cv2.LINE_AA)
@@ -0,0 +1,72 @@
+from typing import Dict, List, Optional
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+class EventStreamParser:
+    """
+    Incremental parser for streamed model output of the form {"events": [{...}, ...]},
+    possibly wrapped in a markdown code fence. feed() returns each object of the
+    events array as soon as its closing brace arrives, so a response that is cut
+    off still yields every event completed before the cut.
+    """
+    def __init__(self, array_key: str = "events"):
+        self._array_start = re.compile(r'"' + re.escape(array_key) + r'"\s*:\s*\[')
+        self.text = ""
+        self.done = False
+        self._pos: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = 0
+
+    def feed(self, chunk: str) -> List[Dict]:
+        self.text += chunk
+        if self.done:
+            return []
+        if self._pos is None:
+            match = self._array_start.search(self.text)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        events = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    event = self._decode(text[self._object_start:i + 1])
+                    if event is not None:
+                        events.append(event)
+            elif ch == ']' and self._depth == 0:
+                self.done = True
+                break
+        self._pos = len(text)
+        return events
+
+    @staticmethod
+    def _decode(raw: str) -> Optional[Dict]:
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed event in streamed response: {e}")
+            return None
+        return value if isinstance(value, dict) else None
@@ -0,0 +1,10 @@
+import hashlib
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hex SHA-256 of a file, read in chunks so large videos are never loaded whole."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+
+class FrameDeduplicator:
+    """
+    Collapses runs of near-identical JPEG frames (studio shots, slates) into one
+    representative using a 64-bit difference hash (dHash).
+    The representative is the first frame of the run, so its timestamp is still
+    the moment the content appeared; spans maps it to the last timestamp of the run.
+    """
+    HASH_SIZE = 8
+    # dHash only encodes gradients, so flat frames (black vs white slate) hash the
+    # same; a coarse brightness check keeps those apart
+    MAX_BRIGHTNESS_DELTA = 16
+
+    def __init__(self, max_distance: int = 4):
+        self.max_distance = max_distance
+        self.spans: Dict[float, float] = {}
+        self._representative: Optional[Tuple[float, bytes]] = None
+        self._representative_hash = (0, 0.0)
+        self._run_end = 0.0
+
+    def deduplicate(self, frames: Iterable[Tuple[float, bytes]]) -> Iterator[Tuple[float, bytes]]:
+        """
+        Yield one (timestamp, jpeg_bytes) per run. A representative is yielded once
+        its run has ended, so spans already holds its end timestamp.
+        """
+        for timestamp, frame_bytes in frames:
+            closed = self.push(timestamp, frame_bytes)
+            if closed is not None:
+                yield closed
+
+        closed = self.flush()
+        if closed is not None:
+            yield closed
+
+    def push(self, timestamp: float, frame_bytes: bytes) -> Optional[Tuple[float, bytes]]:
+        """Feed one frame; returns the previous run's representative if this frame ends it."""
+        frame_hash = self.fingerprint(frame_bytes)
+        if self._representative is not None and self.is_duplicate(frame_hash, self._representative_hash):
+            self._run_end = timestamp
+            return None
+
+        closed = self.flush()
+        self._representative = (timestamp, frame_bytes)
+        self._representative_hash = frame_hash
+        self._run_end = timestamp
+        return closed
+
+    def flush(self) -> Optional[Tuple[float, bytes]]:
+        """Close the current run and return its representative, if any."""
+        closed = self._representative
+        if closed is not None:
+            self.spans[closed[0]] = self._run_end
+            self._representative = None
+        return closed
+
+    def fingerprint(self, frame_bytes: bytes) -> Tuple[int, float]:
+        """Returns: (64-bit dHash, mean brightness)"""
+        # Decoding at 1/8 scale is much cheaper and plenty for a 9x8 thumbnail
+        image = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if image is None:
+            raise ValueError("Could not decode frame for hashing")
+
+        small = cv2.resize(image, (self.HASH_SIZE + 1, self.HASH_SIZE), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).ravel()
+        return int.from_bytes(np.packbits(bits).tobytes(), "big"), float(small.mean())
+
+    def is_duplicate(self, a: Tuple[int, float], b: Tuple[int, float]) -> bool:
+        return (
+            self.hamming(a[0], b[0]) <= self.max_distance
+            and abs(a[1] - b[1]) <= self.MAX_BRIGHTNESS_DELTA
+        )
+
+    @staticmethod
+    def hamming(a: int, b: int) -> int:
+        return bin(a ^ b).count("1")
@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+from typing import Optional
+
+
+class SceneChangeDetector:
+    """
+    Decides which sampled frames are worth sending to Gemini.
+    Frames are compared on a small grayscale thumbnail; a frame is kept when it
+    differs enough from the previous sample (a transition) or when max_gap_seconds
+    have passed since the last kept frame (safety net for slow fades).
+    """
+    THUMBNAIL_SIZE = (64, 36)   # (width, height)
+    HISTOGRAM_BINS = 32
+
+    def __init__(self, threshold: float = 0.15, max_gap_seconds: float = 30.0):
+        self.threshold = threshold
+        self.max_gap_seconds = max_gap_seconds
+        self._previous: Optional[np.ndarray] = None
+        self._last_kept_timestamp: Optional[float] = None
+
+    def should_keep(self, timestamp: float, frame: np.ndarray) -> bool:
+        thumbnail = self.thumbnail(frame)
+        previous, self._previous = self._previous, thumbnail
+
+        if previous is None or self._last_kept_timestamp is None:
+            keep = True
+        elif timestamp - self._last_kept_timestamp >= self.max_gap_seconds:
+            keep = True
+        else:
+            keep = self.score(previous, thumbnail) >= self.threshold
+
+        if keep:
+            self._last_kept_timestamp = timestamp
+        return keep
+
+    def thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def score(self, previous: np.ndarray, current: np.ndarray) -> float:
+        """
+        Change score in [0, 1]: the larger of the mean absolute pixel difference
+        and the histogram distance, so both cuts and graphics overlays register.
+        """
+        pixel_diff = np.abs(current.astype(np.int16) - previous.astype(np.int16)).mean() / 255.0
+
+        bin_width = 256 // self.HISTOGRAM_BINS
+        prev_hist = np.bincount((previous // bin_width).ravel(), minlength=self.HISTOGRAM_BINS)
+        curr_hist = np.bincount((current // bin_width).ravel(), minlength=self.HISTOGRAM_BINS)
+        hist_diff = np.abs(prev_hist - curr_hist).sum() / (2.0 * previous.size)
+
+        return float(max(pixel_diff, hist_diff))
@@ -0,0 +1,57 @@
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """Set on a flight whose running caller was cancelled, for a waiter to take over."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls by key: the first caller runs fn, callers arriving
+    while it runs wait for and share its result (or exception) instead of running
+    fn again. Once the call finishes the key is free. If the caller running fn is
+    cancelled (e.g. its client went away), the first waiter runs its own fn instead
+    and the others wait for that one. Use from one event loop.
+    Coalescing only spans this process: with several uvicorn workers, identical
+    calls arriving at different workers each run.
+    """
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    def running(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            try:
+                # A waiter that is cancelled must not cancel the call others share
+                return await asyncio.shield(flight)
+            except _LeaderCancelled:
+                # The key was freed first, so the first waiter back here runs fn
+                continue
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # Only this caller is cancelled; its waiters are not
+            flight.set_exception(_LeaderCancelled())
+            flight.exception()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            # Retrieved here, so an error nobody else waited for is not logged twice
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
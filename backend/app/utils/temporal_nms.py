@@ -0,0 +1,24 @@
+from typing import Dict, List
+
+
+def suppress_duplicate_events(events: List[Dict], window_seconds: float = 0.0) -> List[Dict]:
+    """
+    Temporal non-maximum suppression for events reported by overlapping windows.
+    Per attribute, events are taken in descending confidence and an event is dropped
+    when a kept event of the same attribute lies within window_seconds of it
+    (0 = only exact timestamp duplicates). Returns the kept events in timestamp order.
+    """
+    ranked = sorted(
+        events,
+        key=lambda e: (-(e.get('confidence_score') or 0.0), e['timestamp_seconds'])
+    )
+    kept: Dict[str, List[float]] = {}
+    result = []
+    for event in ranked:
+        timestamps = kept.setdefault(event['attribute'], [])
+        if any(abs(event['timestamp_seconds'] - ts) <= window_seconds for ts in timestamps):
+            continue
+        timestamps.append(event['timestamp_seconds'])
+        result.append(event)
+
+    return sorted(result, key=lambda e: e['timestamp_seconds'])
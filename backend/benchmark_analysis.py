@@ -0,0 +1,149 @@
+"""
+End-to-end throughput benchmark of POST /api/videos/analyze with no network or quota.
+
+Starts the Gemini API stub (app/services/model_stub.py) in-process, points the app at it
+with MODEL_BACKEND=stub and posts concurrent analyses of one video. Meanwhile a trainee
+clicks POST /api/events/log every --click-interval seconds; its latency while analyses
+run, against an idle baseline, shows whether analysis work is stalling the event loop:
+
+    python benchmark_analysis.py --requests 20 --concurrency 4 --latency 1.5 --error-rate 0.05
+    python benchmark_analysis.py --video path/to/real.mp4
+
+To replay real model answers instead, record a run once with MODEL_BACKEND=record and
+then run the server with MODEL_BACKEND=replay.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(latency: float, error_rate: float, seed: int):
+    import uvicorn
+    from app.services.model_stub import create_stub_app
+
+    port = free_port()
+    stub_app = create_stub_app(latency_seconds=latency, error_rate=error_rate, seed=seed)
+    server = uvicorn.Server(uvicorn.Config(stub_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="gemini-stub", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, stub_app, f"http://127.0.0.1:{port}"
+
+
+def percentiles(values) -> str:
+    values = sorted(values)
+    return (f"p50 {statistics.median(values) * 1000:.0f}ms  "
+            f"p95 {values[int(0.95 * (len(values) - 1))] * 1000:.0f}ms  max {values[-1] * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub seconds per model call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub calls answered with 503")
+    parser.add_argument("--video", help="Video to analyse (default: a synthetic 60s clip)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--click-interval", type=float, default=0.05, help="Seconds between event-log clicks")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="analysis_bench_")
+    server, thread, stub_app, stub_url = start_stub(args.latency, args.error_rate, args.seed)
+
+    # Settings are read at import time, so configure before importing the app
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "benchmark")
+    os.environ.update({
+        "MODEL_BACKEND": "stub",
+        "MODEL_STUB_URL": stub_url,
+        "DATABASE_URL": f"sqlite:///{work_dir}/benchmark.db",
+        "UPLOAD_DIR": os.path.join(work_dir, "uploads"),
+        "FRAME_CACHE_DIR": os.path.join(work_dir, "frame_cache"),
+        # Every request must reach the stub
+        "GEMINI_CACHE_ENABLED": "false",
+        "ANALYSIS_DEDUP_ENABLED": "false",
+        "GEMINI_REQUESTS_PER_MINUTE": "0",
+    })
+    from fastapi.testclient import TestClient
+    from app.init_db import init
+    from app.main import app
+    from test_frame_extraction import make_test_video
+
+    init()
+    video_path = args.video or make_test_video(os.path.join(work_dir, "sample.mp4"), seconds=60)
+    with open(video_path, "rb") as f:
+        video_bytes = f.read()
+
+    def analyze(client: TestClient, i: int):
+        start = time.perf_counter()
+        response = client.post(
+            "/api/videos/analyze",
+            files={"video_file": (f"bench_{i}.mp4", video_bytes, "video/mp4")},
+            data={"broadcast_start_time": "2026-01-01T19:00:00"}
+        )
+        return time.perf_counter() - start, response.status_code
+
+    def click(client: TestClient, session_id: int) -> float:
+        start = time.perf_counter()
+        client.post("/api/events/log", json={
+            "session_id": session_id,
+            "attribute": "Main Logo",
+            "user_timestamp_seconds": 10.0,
+            "user_live_clock_time": "19:00:10",
+            "video_timestamp_seconds": 10.0
+        }).raise_for_status()
+        return time.perf_counter() - start
+
+    def clicks_until(client: TestClient, session_id: int, done: threading.Event, latencies: list):
+        while not done.is_set():
+            latencies.append(click(client, session_id))
+            time.sleep(args.click_interval)
+
+    print(f"Benchmarking {args.requests} analyses of {video_path}, concurrency {args.concurrency}, "
+          f"stub latency {args.latency}s, error rate {args.error_rate:.0%}")
+    with TestClient(app) as client:
+        session_id = client.post("/api/sessions/start", json={}).json()["session_id"]
+        idle_clicks = [click(client, session_id) for _ in range(20)]
+
+        busy_clicks = []
+        done = threading.Event()
+        clicker = threading.Thread(target=clicks_until, args=(client, session_id, done, busy_clicks))
+        clicker.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda i: analyze(client, i), range(args.requests)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        clicker.join()
+        metrics = client.get("/api/videos/analyze/metrics").json()
+
+    latencies = sorted(latency for latency, _ in results)
+    ok = sum(1 for _, status in results if status == 200)
+    print(f"  completed   {ok}/{len(results)} OK in {elapsed:.2f}s ({len(results) / elapsed:.2f} analyses/s)")
+    print(f"  latency     p50 {statistics.median(latencies):.2f}s  "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:.2f}s  max {latencies[-1]:.2f}s")
+    print(f"  event log   idle {percentiles(idle_clicks)}")
+    print(f"              busy {percentiles(busy_clicks)} ({len(busy_clicks)} clicks)")
+    print(f"  model calls {stub_app.state.requests} to the stub, {metrics['retries']} retries, "
+          f"p50 {metrics['wall_seconds'].get('p50', 0):.2f}s, {metrics['total_tokens']} tokens, "
+          f"{metrics['payload_bytes'] / 1e6:.1f} MB sent")
+
+    server.should_exit = True
+    thread.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
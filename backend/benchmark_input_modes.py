@@ -0,0 +1,155 @@
+"""
+Side-by-side comparison of the two GeminiAnalyzer input modes on one video:
+sampled JPEG frames (analyze_frame_stream) versus low-bitrate proxy clips
+(analyze_video_clips). Reports bytes sent, tokens, end-to-end and per-call
+latency and, given a ground truth file, timestamp accuracy.
+
+    # Plumbing and payload sizes against the local stub (no network, no quota)
+    python benchmark_input_modes.py --video path/to/match.mp4
+    # Real answers and accuracy against a ground truth JSON (as returned by /api/videos/analyze)
+    GOOGLE_CLOUD_PROJECT=my-project python benchmark_input_modes.py --backend vertex \\
+        --video path/to/match.mp4 --ground-truth path/to/match.json
+
+The stub's answers are synthetic, so accuracy is only meaningful with a real backend.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from app.services.call_guard import CallGuard
+from app.services.call_metrics import CallMetrics
+from app.services.gemini_analyzer import GeminiAnalyzer
+from app.services.model_backends import MODEL_BACKENDS, create_model_client
+from app.services.proxy_clip import ProxyClipEncoder
+from app.services.video_processor import VideoProcessor
+from benchmark_analysis import start_stub
+
+ATTRIBUTES = "Main Logo,Copyright,Post-Game Start,Scoreboard,Replay Graphic"
+
+
+def timestamp_accuracy(events: List[Dict], truth: List[Dict], tolerance: float) -> Dict:
+    """Each true event is matched to the nearest detection of the same attribute."""
+    errors = []
+    for expected in truth:
+        candidates = [e['timestamp_seconds'] for e in events if e['attribute'] == expected['attribute']]
+        if candidates:
+            errors.append(min(abs(ts - expected['timestamp_seconds']) for ts in candidates))
+    hits = [error for error in errors if error <= tolerance]
+    return {
+        'recall': len(hits) / len(truth) if truth else 0.0,
+        'mean_error': sum(hits) / len(hits) if hits else None
+    }
+
+
+async def run_mode(mode: str, analyzer: GeminiAnalyzer, args, attributes: List[str], duration: float):
+    if mode == "frames":
+        processor = VideoProcessor(frame_interval_seconds=args.interval, max_width=args.frame_max_width)
+        events, _ = await analyzer.analyze_frame_stream(
+            processor.iter_frames(args.video),
+            attributes,
+            window_size=args.window_frames,
+            concurrency=args.concurrency
+        )
+        return events
+    encoder = ProxyClipEncoder(max_width=args.clip_max_width, fps=1.0 / args.interval, crf=args.clip_crf)
+    events, _ = await analyzer.analyze_video_clips(
+        args.video,
+        attributes,
+        duration,
+        encoder,
+        window_seconds=args.window_frames * args.interval,
+        concurrency=args.concurrency
+    )
+    return events
+
+
+async def compare(client, args, attributes: List[str], duration: float, truth: Optional[List[Dict]]):
+    header = f"{'mode':<8} {'calls':>5} {'MB sent':>8} {'tokens':>9} {'total s':>8} {'call p50':>9} {'ttfb p50':>9} {'events':>7}"
+    if truth is not None:
+        header += f" {'recall':>7} {'mean err':>9}"
+    print(header)
+    for mode in ("frames", "clip"):
+        metrics = CallMetrics()
+        analyzer = GeminiAnalyzer(
+            project_id=os.environ.get("GOOGLE_CLOUD_PROJECT", "benchmark"),
+            model_id=args.model,
+            client=client,
+            call_guard=CallGuard(),
+            metrics=metrics
+        )
+        start = time.perf_counter()
+        events = await run_mode(mode, analyzer, args, attributes, duration)
+        elapsed = time.perf_counter() - start
+
+        summary = metrics.summary()
+        line = (f"{mode:<8} {summary['calls']:>5} {summary['payload_bytes'] / 1e6:>8.2f} {summary['total_tokens']:>9} "
+                f"{elapsed:>8.2f} {summary['wall_seconds'].get('p50', 0):>9.2f} "
+                f"{summary['ttfb_seconds'].get('p50', 0):>9.2f} {len(events):>7}")
+        if truth is not None:
+            accuracy = timestamp_accuracy(events, truth, args.tolerance)
+            mean_error = accuracy['mean_error']
+            line += f" {accuracy['recall']:>7.0%} {f'{mean_error:.2f}s' if mean_error is not None else '-':>9}"
+        print(line)
+    # The async client belongs to this event loop
+    await client.aio.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="Video to analyse (default: a synthetic 120s clip)")
+    parser.add_argument("--ground-truth", help="JSON with an events list of attribute / timestamp_seconds")
+    parser.add_argument("--backend", choices=MODEL_BACKENDS, default="stub")
+    parser.add_argument("--model", default="gemini-2.0-flash-001")
+    parser.add_argument("--attributes", default=ATTRIBUTES)
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between frames (and proxy clip frames)")
+    parser.add_argument("--window-frames", type=int, default=300, help="Frames per request; clips cover the same time")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--frame-max-width", type=int, default=0)
+    parser.add_argument("--clip-max-width", type=int, default=480)
+    parser.add_argument("--clip-crf", type=int, default=35)
+    parser.add_argument("--tolerance", type=float, default=4.0, help="Seconds within which a detection counts")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub seconds per model call")
+    args = parser.parse_args()
+
+    if not ProxyClipEncoder.available():
+        print("ffmpeg is required for clip mode")
+        return 1
+    if not args.video:
+        from test_frame_extraction import make_test_video
+        args.video = make_test_video(os.path.join(tempfile.mkdtemp(), "sample.mp4"), seconds=120)
+    truth: Optional[List[Dict]] = None
+    if args.ground_truth:
+        with open(args.ground_truth) as f:
+            truth = json.load(f)['events']
+
+    server = None
+    stub_url = None
+    if args.backend == "stub":
+        server, thread, _, stub_url = start_stub(args.latency, 0.0, seed=0)
+    client = create_model_client(
+        args.backend,
+        project=os.environ.get("GOOGLE_CLOUD_PROJECT"),
+        location=os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1"),
+        **({"stub_url": stub_url} if stub_url else {})
+    )
+    attributes = [a.strip() for a in args.attributes.split(',') if a.strip()]
+    duration = VideoProcessor().probe(args.video).duration_seconds
+
+    print(f"Comparing input modes on {args.video} ({duration:.0f}s) via {args.backend}, "
+          f"one frame every {args.interval}s, {args.window_frames} frames per request")
+    asyncio.run(compare(client, args, attributes, duration, truth))
+
+    client.close()
+    if server:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Offline checks for analysis job checkpoints: owner-guarded progress, takeover of
+jobs whose heartbeat stopped (and only those), and resume points that only hold for
+the same analysis.
+Uses a throwaway SQLite database.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+# Settings are read at import time (app.models pulls in app.database)
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "test-project")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models import AnalysisCheckpoint
+from app.routes.video_analysis import _submit_job
+from app.services.analysis_checkpoints import CheckpointStore, JobCheckpoint
+from app.services.analysis_jobs import AnalysisJobManager
+
+
+def make_session_factory(tmp_dir: str):
+    engine = create_engine(f"sqlite:///{tmp_dir}/checkpoints.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def create_job(store: CheckpointStore, job_id: str = "job-1"):
+    return store.create(job_id, "/uploads/upload_x.mp4", "match.mp4", "2026-01-01T19:00:00",
+                        ["Main Logo", "Scoreboard"], None, "abc123")
+
+
+def test_progress_is_saved_only_by_the_owner():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sessions = make_session_factory(tmp_dir)
+        store, other = CheckpointStore(sessions, owner="worker-a"), CheckpointStore(sessions, owner="worker-b")
+        create_job(store)
+
+        checkpoint = JobCheckpoint(store, store.get("job-1"))
+        assert checkpoint.resume_point("key-1") == (0.0, [])
+        checkpoint.progress_callback()(40.0, 2, 20, [{"attribute": "Main Logo", "timestamp_seconds": 12.0}])
+        checkpoint.close()
+
+        assert not other.save_progress("job-1", "key-1", 80.0, 40, 4, [])
+        saved = store.get("job-1")
+        assert (saved.analysis_key, saved.resume_from_seconds, saved.windows_done, saved.frames_done) == (
+            "key-1", 40.0, 2, 20
+        )
+
+        assert store.finish("job-1", "completed")
+        assert not store.heartbeat("job-1")  # finished jobs are left alone
+
+
+def test_stale_jobs_are_claimed_once_and_resume_where_they_stopped():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sessions = make_session_factory(tmp_dir)
+        crashed = CheckpointStore(sessions, owner="worker-a")
+        create_job(crashed, "stale")
+        create_job(crashed, "alive")
+        crashed.save_progress("stale", "key-1", 40.0, 20, 2, [{"attribute": "Main Logo", "timestamp_seconds": 12.0}])
+        with sessions() as db:
+            db.query(AnalysisCheckpoint).filter(AnalysisCheckpoint.job_id == "stale").update(
+                {AnalysisCheckpoint.heartbeat_at: time.time() - 600}
+            )
+            db.commit()
+
+        first, second = CheckpointStore(sessions, owner="worker-b"), CheckpointStore(sessions, owner="worker-c")
+        claimed = first.claim_orphans(stale_seconds=120)
+        assert [state.job_id for state in claimed] == ["stale"]
+        assert second.claim_orphans(stale_seconds=120) == []
+        assert claimed[0].owner == "worker-b" and claimed[0].resumed_count == 1
+        assert claimed[0].status == "queued"
+        # The crashed worker can no longer write to the job
+        assert not crashed.heartbeat("stale")
+
+        checkpoint = JobCheckpoint(first, claimed[0])
+        resume_from, events = checkpoint.resume_point("key-1")
+        assert resume_from == 40.0 and [e["timestamp_seconds"] for e in events] == [12.0]
+        # Progress counts carry on from the checkpoint
+        checkpoint.progress_callback()(60.0, 1, 10, [{"attribute": "Scoreboard", "timestamp_seconds": 50.0}])
+        checkpoint.close()
+        saved = first.get("stale")
+        assert (saved.windows_done, saved.frames_done) == (3, 30)
+        assert "Scoreboard" in saved.events_json and "Main Logo" in saved.events_json
+
+        # Other settings, other analysis: start over
+        assert JobCheckpoint(first, saved).resume_point("key-2") == (0.0, [])
+
+
+def test_job_waiting_for_a_slot_is_not_taken_over():
+    resume_after = 0.2
+    heartbeat_seconds = settings.ANALYSIS_HEARTBEAT_SECONDS
+    settings.ANALYSIS_HEARTBEAT_SECONDS = 0.05
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sessions = make_session_factory(tmp_dir)
+            store, other = CheckpointStore(sessions, owner="worker-a"), CheckpointStore(sessions, owner="worker-b")
+
+            async def scenario():
+                jobs = AnalysisJobManager(max_concurrent_jobs=1)
+                gate = asyncio.Event()
+
+                async def running(progress):
+                    await gate.wait()
+                    return {}
+
+                async def queued(progress):
+                    return {}
+
+                for job_id, work in (("a", running), ("b", queued)):
+                    create_job(store, job_id)
+                    _submit_job(jobs, store, job_id, f"{job_id}.mp4", work)
+                # "b" waits for the slot well past the point where a silent job is resumed
+                await asyncio.sleep(resume_after * 3)
+                states = (jobs.get("a").status, jobs.get("b").status)
+                claimed = other.claim_orphans(resume_after)
+                # Nor does this worker claim a job it holds, however stale it looks
+                reclaimed = store.claim_orphans(0, jobs.unfinished_ids())
+                gate.set()
+                while jobs.unfinished_ids():
+                    await asyncio.sleep(0.01)
+                return states, claimed, reclaimed
+
+            states, claimed, reclaimed = asyncio.run(scenario())
+            assert states == ("running", "queued")
+            assert claimed == [] and reclaimed == []
+            assert store.get("b").owner == "worker-a" and store.get("b").resumed_count == 0
+    finally:
+        settings.ANALYSIS_HEARTBEAT_SECONDS = heartbeat_seconds
+
+
+if __name__ == "__main__":
+    test_progress_is_saved_only_by_the_owner()
+    test_stale_jobs_are_claimed_once_and_resume_where_they_stopped()
+    test_job_waiting_for_a_slot_is_not_taken_over()
+    print("✅ Analysis checkpoint checks passed")
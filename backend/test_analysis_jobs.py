@@ -0,0 +1,121 @@
+"""
+Offline checks for the background analysis job manager: queueing, progress fan-out
+from worker threads, failures and retention.
+"""
+
+import asyncio
+
+from app.services.analysis_jobs import AnalysisJobManager
+
+
+def threaded_work(stages, result=None, error=None, gate: asyncio.Event = None):
+    """Job body that reports each (stage, percent) from a worker thread, like frame sampling does."""
+    async def work(progress):
+        if gate:
+            await gate.wait()
+        for stage, percent in stages:
+            await asyncio.to_thread(progress, stage, percent, f"{stage} {percent}")
+        if error:
+            raise error
+        return result
+    return work
+
+
+async def collect(jobs: AnalysisJobManager, job_id: str):
+    return [snapshot async for snapshot in jobs.subscribe(job_id) if snapshot is not None]
+
+
+def test_subscriber_sees_every_update_then_result():
+    async def scenario():
+        jobs = AnalysisJobManager()
+        job = jobs.submit("a.mp4", threaded_work(
+            [("probing", 5.0), ("analyzing", 50.0), ("saving", 100.0)], result={"events": []}
+        ))
+        return job, await collect(jobs, job.id)
+
+    job, snapshots = asyncio.run(scenario())
+    assert snapshots[0]["status"] == "queued"
+    assert [s["percent"] for s in snapshots if s["status"] == "running"][-3:] == [5.0, 50.0, 100.0]
+    assert snapshots[-1]["status"] == "completed" and snapshots[-1]["result"] == {"events": []}
+    assert job.finished and job.stage == "completed"
+
+
+def test_resumed_job_keeps_its_id():
+    async def scenario():
+        jobs = AnalysisJobManager()
+        job = jobs.submit("a.mp4", threaded_work([("analyzing", 50.0)], result={}), job_id="resumed-job")
+        await collect(jobs, job.id)
+        return jobs
+
+    assert asyncio.run(scenario()).get("resumed-job").status == "completed"
+
+
+def test_jobs_beyond_limit_wait_their_turn():
+    async def scenario():
+        jobs = AnalysisJobManager(max_concurrent_jobs=1)
+        gate = asyncio.Event()
+        first = jobs.submit("a.mp4", threaded_work([("analyzing", 50.0)], gate=gate))
+        second = jobs.submit("b.mp4", threaded_work([("analyzing", 50.0)]))
+        await asyncio.sleep(0.05)
+        states = (first.status, second.status)
+        gate.set()
+        await collect(jobs, second.id)
+        return states, first.status, second.status
+
+    states, first, second = asyncio.run(scenario())
+    assert states == ("running", "queued")
+    assert first == second == "completed"
+
+
+def test_failed_job_reports_error_and_keeps_progress():
+    async def scenario():
+        jobs = AnalysisJobManager()
+        job = jobs.submit("a.mp4", threaded_work([("analyzing", 40.0)], error=RuntimeError("decoder crashed")))
+        snapshots = await collect(jobs, job.id)
+        return snapshots[-1]
+
+    final = asyncio.run(scenario())
+    assert final["status"] == "failed" and final["error"] == "decoder crashed"
+    assert final["stage"] == "analyzing" and final["percent"] == 40.0
+
+
+def test_oldest_finished_jobs_are_forgotten():
+    async def scenario():
+        jobs = AnalysisJobManager(max_concurrent_jobs=4, max_finished_jobs=2)
+        ids = []
+        for i in range(4):
+            job = jobs.submit(f"{i}.mp4", threaded_work([]))
+            ids.append(job.id)
+            await collect(jobs, job.id)
+        return jobs, ids
+
+    jobs, ids = asyncio.run(scenario())
+    # Pruning happens on submit, so the latest job plus the two before it remain
+    assert [jobs.get(job_id) is not None for job_id in ids] == [False, True, True, True]
+
+
+def test_idle_subscription_yields_keepalives():
+    async def scenario():
+        jobs = AnalysisJobManager()
+        gate = asyncio.Event()
+        job = jobs.submit("a.mp4", threaded_work([], gate=gate))
+        seen = []
+        async for snapshot in jobs.subscribe(job.id, keepalive_seconds=0.02):
+            seen.append(snapshot)
+            if seen.count(None) == 2:
+                gate.set()
+        return seen
+
+    seen = asyncio.run(scenario())
+    assert seen.count(None) >= 2
+    assert seen[-1]["status"] == "completed"
+
+
+if __name__ == "__main__":
+    test_subscriber_sees_every_update_then_result()
+    test_resumed_job_keeps_its_id()
+    test_jobs_beyond_limit_wait_their_turn()
+    test_failed_job_reports_error_and_keeps_progress()
+    test_oldest_finished_jobs_are_forgotten()
+    test_idle_subscription_yields_keepalives()
+    print("✅ Analysis job checks passed")
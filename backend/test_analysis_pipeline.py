@@ -0,0 +1,152 @@
+"""
+Offline checks of AnalysisPipeline's stored results (an analysis is only reused
+for the same content, attributes and analysis settings), timestamp refinement and
+the ROI path.
+Uses a throwaway SQLite database.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+# Settings are read at import time (app.models pulls in app.database)
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "test-project")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.services.analysis_pipeline import ANALYSIS_SETTINGS, AnalysisPipeline, analysis_key
+
+
+def make_session(tmp_dir: str):
+    engine = create_engine(f"sqlite:///{tmp_dir}/results.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def test_key_ignores_attribute_order_but_not_settings():
+    key = analysis_key("hash", ["Main Logo", "Scoreboard"])
+    assert analysis_key("hash", ["Scoreboard", "Main Logo", "Scoreboard"]) == key
+    assert analysis_key("hash", ["Main Logo"]) != key
+    assert analysis_key("hash", ["Main Logo", "Scoreboard"], "league-a") != key
+    for name in ANALYSIS_SETTINGS:
+        assert hasattr(settings, name), name
+
+
+def test_changed_setting_misses_the_stored_result():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pipeline = AnalysisPipeline(make_session(tmp_dir), None)
+        attributes = ["Main Logo"]
+        key = analysis_key("hash", attributes)
+        pipeline._store_result(key, "hash", attributes, None, "match", 60.0, 30, [{"timestamp_seconds": 4.0}])
+        assert pipeline._stored_result(analysis_key("hash", attributes)) is not None
+
+        for name, value in (("FRAME_DEDUP_MAX_DISTANCE", settings.FRAME_DEDUP_MAX_DISTANCE + 1),
+                            ("ROI_PROFILES", {"Main Logo": "top-left 20%"}),
+                            ("GEMINI_WINDOW_FRAMES", settings.GEMINI_WINDOW_FRAMES // 2)):
+            original = getattr(settings, name)
+            setattr(settings, name, value)
+            try:
+                assert pipeline._stored_result(analysis_key("hash", attributes)) is None, name
+            finally:
+                setattr(settings, name, original)
+
+
+class SlowRefinement:
+    """Processor and analyzer for TemporalRefiner: each refinement takes a while and moves the event 1s earlier."""
+    def __init__(self):
+        self.calls, self.running, self.most_running = [], 0, 0
+        self.lock = threading.Lock()
+
+    def extract_range(self, video_path, start, end, interval):
+        return [(end - 1.0, b"")]
+
+    def refine_timestamp(self, attribute, clue, frames):
+        with self.lock:
+            self.calls.append(attribute)
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return frames[0][0]
+
+
+def test_refinement_runs_together_on_model_events_only():
+    events = [
+        {"attribute": "Main Logo", "timestamp_seconds": 10.0},
+        {"attribute": "Scoreboard", "timestamp_seconds": 12.0, "source": "template"},
+        {"attribute": "Copyright", "timestamp_seconds": 20.0},
+    ]
+    saved = settings.GEMINI_INPUT_MODE, settings.GEMINI_MAX_CONCURRENCY
+    settings.GEMINI_MAX_CONCURRENCY = 4
+    try:
+        for mode in ("frames", "clip"):
+            settings.GEMINI_INPUT_MODE = mode
+            fake = SlowRefinement()
+            refined = asyncio.run(AnalysisPipeline(None, None)._refine(fake, fake, "video.mp4", events))
+            if mode == "clip":
+                # Clip timestamps are model estimates, not sample points
+                assert refined == events and fake.calls == []
+                continue
+            assert [e["timestamp_seconds"] for e in refined] == [9.0, 12.0, 19.0]
+            assert sorted(fake.calls) == ["Copyright", "Main Logo"] and fake.most_running == 2
+    finally:
+        settings.GEMINI_INPUT_MODE, settings.GEMINI_MAX_CONCURRENCY = saved
+
+
+class RegionStream:
+    """Processor and analyzer for the ROI path: two samples, recording how the regions were sent."""
+    def __init__(self):
+        self.calls = []
+
+    def iter_region_frames(self, video_path, regions, queue_depth, tile_max_width):
+        return iter([(t, {key: b"" for key in regions}) for t in (0.0, 2.0)])
+
+    async def analyze_region_stream(self, tiles, attribute_groups, **kwargs):
+        self.calls.append((attribute_groups, kwargs))
+        return [], sum(1 for _ in tiles), 0
+
+
+def test_roi_mode_warns_that_templates_are_not_used():
+    names = ("GEMINI_INPUT_MODE", "ROI_CROPPING_ENABLED", "ROI_PROFILES", "FRAME_DEDUP_ENABLED",
+             "GEMINI_MAX_CONCURRENCY")
+    saved = {name: getattr(settings, name) for name in names}
+    warnings = []
+    handler = logging.Handler()
+    handler.emit = lambda record: warnings.append(record.getMessage())
+    logger = logging.getLogger("app.services.analysis_pipeline")
+    logger.addHandler(handler)
+    try:
+        for name, value in zip(names, ("frames", True, {"Main Logo": "top-left 20%"}, False, 3)):
+            setattr(settings, name, value)
+        fake = RegionStream()
+        probe = SimpleNamespace(duration_seconds=4.0)
+        events, sampled, _ = asyncio.run(AnalysisPipeline(None, None)._analyze(
+            fake, fake, print, "video.mp4", "hash", probe, ["Main Logo", "Copyright"], "broadcast-a"
+        ))
+        assert (events, sampled) == ([], 2)
+        assert len(warnings) == 1 and "broadcast-a" in warnings[0]
+        # One call for all regions, with their windows sharing the concurrency slots
+        (groups, kwargs), = fake.calls
+        assert sorted(name for group in groups.values() for name in group) == ["Copyright", "Main Logo"]
+        assert kwargs["concurrency"] == 3 and kwargs["on_event"] is print
+    finally:
+        logger.removeHandler(handler)
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+
+if __name__ == "__main__":
+    test_key_ignores_attribute_order_but_not_settings()
+    test_changed_setting_misses_the_stored_result()
+    test_refinement_runs_together_on_model_events_only()
+    test_roi_mode_warns_that_templates_are_not_used()
+    print("✅ Analysis pipeline checks passed")
@@ -0,0 +1,122 @@
+"""
+Offline checks for the Vertex AI call guard: token buckets, retries and the circuit breaker.
+"""
+
+import asyncio
+import time
+
+from google.genai import errors
+
+from app.services.call_guard import CallGuard, CircuitBreaker, CircuitOpenError, TokenBucket, estimate_tokens
+
+
+def api_error(code: int) -> errors.APIError:
+    error_class = errors.ServerError if code >= 500 else errors.ClientError
+    return error_class(code, {"error": {"message": "fake", "status": str(code)}})
+
+
+class FlakyCall:
+    """Raises the given errors in turn, then returns "ok"."""
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return "ok"
+
+
+def fast_guard(**kwargs) -> CallGuard:
+    guard = CallGuard(**kwargs)
+    guard.max_wait_seconds = 0.01
+    return guard
+
+
+def test_token_bucket_spaces_requests_beyond_burst():
+    bucket = TokenBucket(rate_per_minute=600)  # 10/s, burst of 600
+    assert bucket.reserve(600) == 0.0
+    # Bucket is empty: the next two tokens are 0.1s apart
+    assert abs(bucket.reserve(1) - 0.1) < 0.01
+    assert abs(bucket.reserve(1) - 0.2) < 0.01
+    assert TokenBucket(rate_per_minute=0).reserve(10 ** 9) == 0.0
+
+
+def test_retryable_errors_are_retried():
+    guard = fast_guard(max_attempts=4)
+    call = FlakyCall(api_error(429), api_error(503), ConnectionError("reset"))
+
+    assert guard.call(call) == "ok"
+    assert call.calls == 4
+    assert guard.breaker.state == "closed"
+
+
+def test_client_errors_fail_immediately():
+    guard = fast_guard()
+    call = FlakyCall(api_error(400))
+    try:
+        guard.call(call)
+    except errors.ClientError as e:
+        assert e.code == 400
+    else:
+        assert False, "Expected the 400 to be raised"
+    assert call.calls == 1
+
+
+def test_circuit_opens_and_recovers():
+    guard = fast_guard(max_attempts=3, breaker=CircuitBreaker(failure_threshold=3, reset_seconds=0.2))
+    call = FlakyCall(*[api_error(500)] * 3)
+    try:
+        guard.call(call)
+    except errors.ServerError:
+        pass
+    assert guard.breaker.state == "open"
+
+    # Fails fast without touching the backend
+    healthy = FlakyCall()
+    try:
+        asyncio.run(guard.call_async(lambda: asyncio.sleep(0, result=healthy())))
+    except CircuitOpenError:
+        pass
+    else:
+        assert False, "Expected CircuitOpenError"
+    assert healthy.calls == 0
+
+    time.sleep(0.25)
+    assert guard.breaker.state == "half-open"
+    assert guard.call(healthy) == "ok"
+    assert guard.breaker.state == "closed"
+
+
+def test_cancelled_trial_frees_the_half_open_circuit():
+    guard = fast_guard(breaker=CircuitBreaker(failure_threshold=1, reset_seconds=0.05))
+    guard.breaker.record_failure()
+    time.sleep(0.1)
+    assert guard.breaker.state == "half-open"
+
+    async def scenario():
+        trial = asyncio.create_task(guard.call_async(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.02)
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        return await guard.call_async(lambda: asyncio.sleep(0, result="ok"))
+
+    # The cancelled trial told nothing about the backend; the next call is the trial
+    assert asyncio.run(scenario()) == "ok"
+    assert guard.breaker.state == "closed"
+
+
+def test_token_estimate_counts_images():
+    assert estimate_tokens("x" * 400) == 100
+    assert estimate_tokens(["x" * 400, object(), object()]) == 100 + 2 * 258
+
+
+if __name__ == "__main__":
+    test_token_bucket_spaces_requests_beyond_burst()
+    test_retryable_errors_are_retried()
+    test_client_errors_fail_immediately()
+    test_circuit_opens_and_recovers()
+    test_cancelled_trial_frees_the_half_open_circuit()
+    test_token_estimate_counts_images()
+    print("✅ Call guard checks passed")
@@ -0,0 +1,99 @@
+"""
+Offline checks that streamed events stay drafts of their run: a running or failed
+analysis never touches a video's saved ground truth (nor lists a new video), and the
+completed one replaces it at once.
+Uses a throwaway SQLite database.
+"""
+
+import os
+import tempfile
+
+# Settings are read at import time (app.models pulls in app.database)
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "test-project")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import DraftEvent, GroundTruthEvent, Video
+from app.services.analysis_pipeline import AnalysisPipeline
+from app.services.event_recorder import EventRecorder
+from app.services.video_probe import VideoProbe
+
+START = "2026-01-01T19:00:00"
+PROBE = VideoProbe(fps=25.0, frame_count=1500, duration_seconds=60.0, width=640, height=360, codec="h264")
+
+
+def make_session(tmp_dir: str):
+    engine = create_engine(f"sqlite:///{tmp_dir}/events.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def saved_timestamps(db, model, video_id="match"):
+    return sorted(row.timestamp_seconds for row in db.query(model).filter(model.video_id == video_id))
+
+
+def draft_timestamps(db, run_id):
+    return [event['timestamp_seconds'] for event in EventRecorder.drafts(db, run_id)]
+
+
+def test_ground_truth_survives_until_the_analysis_completes():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_session(tmp_dir)
+        db.add(Video(video_id="match", title="match.mp4", duration_seconds=60.0,
+                     broadcast_start_time=START, analysis_key="old-key"))
+        db.add(GroundTruthEvent(video_id="match", attribute="Main Logo", timestamp_seconds=5.0))
+        db.commit()
+
+        # A run that fails after streaming one event leaves it as a draft only
+        failed = EventRecorder(db, "match", START, "run-1")
+        failed.start()
+        failed.add({"attribute": "Main Logo", "timestamp_seconds": 7.0})
+        failed.close()
+        assert saved_timestamps(db, GroundTruthEvent) == [5.0]
+        assert draft_timestamps(db, "run-1") == [7.0]
+        assert db.query(Video).one().analysis_key == "old-key"
+
+        # Another run of the video leaves those drafts alone, then swaps its own events in
+        recorder = EventRecorder(db, "match", START, "run-2")
+        recorder.start()
+        recorder.add({"attribute": "Main Logo", "timestamp_seconds": 8.0})
+        recorder.close()
+        assert draft_timestamps(db, "run-1") == [7.0] and draft_timestamps(db, "run-2") == [8.0]
+        assert saved_timestamps(db, GroundTruthEvent) == [5.0]
+
+        events = [{"attribute": "Main Logo", "timestamp_seconds": 8.0, "clue_description": "Logo"}]
+        saved = AnalysisPipeline(db, None)._save("match", "match.mp4", START, "hash", PROBE, events, "new-key",
+                                                 run_id="run-2")
+        assert saved['database_saved']
+        assert saved_timestamps(db, GroundTruthEvent) == [8.0]
+        assert draft_timestamps(db, "run-2") == [] and draft_timestamps(db, "run-1") == [7.0]
+        assert db.query(Video).one().analysis_key == "new-key"
+
+        # A resumed run starts its drafts over (its checkpoint's events are added again)
+        resumed = EventRecorder(db, "match", START, "run-1")
+        resumed.start()
+        resumed.close()
+        assert saved_timestamps(db, DraftEvent) == []
+
+
+def test_failed_first_analysis_lists_no_video():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_session(tmp_dir)
+        recorder = EventRecorder(db, "new-match", START, "run-1")
+        recorder.start()
+        recorder.add({"attribute": "Scoreboard", "timestamp_seconds": 3.0})
+        recorder.close()
+        assert draft_timestamps(db, "run-1") == [3.0]
+        assert db.query(Video).count() == 0
+
+        AnalysisPipeline(db, None)._save("new-match", "new-match.mp4", START, "hash", PROBE, [], "key", run_id="run-1")
+        assert db.query(Video).one().video_id == "new-match"
+
+
+if __name__ == "__main__":
+    test_ground_truth_survives_until_the_analysis_completes()
+    test_failed_first_analysis_lists_no_video()
+    print("✅ Event recorder checks passed")
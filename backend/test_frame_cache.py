@@ -0,0 +1,73 @@
+"""
+Check that VideoProcessor reuses cached frames and that FrameCache evicts LRU entries.
+"""
+
+import os
+import tempfile
+import time
+
+from app.services.frame_cache import FrameCache
+from app.services.video_processor import VideoProcessor
+from test_frame_extraction import make_test_video
+
+
+def test_second_extraction_is_served_from_cache():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=6)
+        cache = FrameCache(os.path.join(tmp_dir, "cache"), max_bytes=100 * 1024 * 1024)
+        processor = VideoProcessor(frame_interval_seconds=1.0, cache=cache)
+
+        first = processor.extract_frames(video_path)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("decoder should not run on a cache hit")
+        processor._iter_encoded = fail
+
+        assert list(processor.iter_frames(video_path)) == first
+
+        # Different sampling parameters are a different cache entry
+        other = VideoProcessor(frame_interval_seconds=2.0, cache=cache)
+        assert len(other.extract_frames(video_path)) == 3
+
+
+def test_abandoned_stream_is_not_cached():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=4)
+        cache_dir = os.path.join(tmp_dir, "cache")
+        processor = VideoProcessor(frame_interval_seconds=1.0, cache=FrameCache(cache_dir, max_bytes=10**8))
+
+        stream = processor.iter_frames(video_path)
+        next(stream)
+        stream.close()
+
+        assert os.listdir(cache_dir) == []
+
+
+def test_least_recently_used_entry_is_evicted():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = FrameCache(tmp_dir, max_bytes=2500)
+        for key in ("a", "b"):
+            writer = cache.writer(key)
+            writer.append(0.0, b"x" * 1000)
+            writer.commit()
+            time.sleep(0.01)
+
+        # Reading "a" makes "b" the least recently used entry
+        cached = cache.get("a")
+        assert bytes(cached.frame(0)) == b"x" * 1000
+        cached.close()
+
+        writer = cache.writer("c")
+        writer.append(0.0, b"y" * 1000)
+        writer.commit()
+
+        assert cache.get("b") is None
+        assert list(cache.get("a")) == [(0.0, b"x" * 1000)]
+        assert list(cache.get("c")) == [(0.0, b"y" * 1000)]
+
+
+if __name__ == "__main__":
+    test_second_extraction_is_served_from_cache()
+    test_abandoned_stream_is_not_cached()
+    test_least_recently_used_entry_is_evicted()
+    print("✅ Frame cache checks passed")
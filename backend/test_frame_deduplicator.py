@@ -0,0 +1,39 @@
+"""
+Check that FrameDeduplicator collapses static runs and keeps their time spans.
+"""
+
+import cv2
+import numpy as np
+
+from app.utils.frame_deduplicator import FrameDeduplicator
+
+
+def encode(image: np.ndarray) -> bytes:
+    return cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), 85])[1].tobytes()
+
+
+def studio_shot(noise_seed: int) -> np.ndarray:
+    # Same gradient with a little sensor noise, like consecutive samples of a static shot
+    rng = np.random.default_rng(noise_seed)
+    image = np.tile(np.linspace(0, 255, 320, dtype=np.uint8), (180, 1))
+    image = np.clip(image.astype(int) + rng.integers(-3, 4, image.shape), 0, 255).astype(np.uint8)
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+def test_static_runs_collapse_to_first_frame_with_span():
+    black = encode(np.zeros((180, 320, 3), np.uint8))
+    white = encode(np.full((180, 320, 3), 255, np.uint8))
+    frames = [(0.0, black), (2.0, black)]
+    frames += [(4.0 + 2 * i, encode(studio_shot(i))) for i in range(5)]
+    frames += [(14.0, white), (16.0, black)]
+
+    deduplicator = FrameDeduplicator(max_distance=4)
+    kept = list(deduplicator.deduplicate(frames))
+
+    assert [ts for ts, _ in kept] == [0.0, 4.0, 14.0, 16.0]
+    assert deduplicator.spans == {0.0: 2.0, 4.0: 12.0, 14.0: 14.0, 16.0: 16.0}
+
+
+if __name__ == "__main__":
+    test_static_runs_collapse_to_first_frame_with_span()
+    print("✅ Deduplication keeps run starts and spans")
@@ -0,0 +1,298 @@
+"""
+Compare frame extraction sampling modes on a synthetic video.
+
+Run directly for a timing comparison:
+    python test_frame_extraction.py [path/to/video.mp4]
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from app.services import video_probe
+from app.services.video_probe import keyframe_interval
+from app.services.ffmpeg_decoder import FfmpegDecoder
+from app.services.video_processor import VideoProcessor, SAMPLING_MODES
+
+
+def make_test_video(path: str, seconds: int = 20, fps: int = 30, size=(640, 360)) -> str:
+    """Write a video whose frames each carry a distinct gradient so samples are distinguishable."""
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for i in range(seconds * fps):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        frame[:, :, 0] = (i * 3) % 256
+        frame[:, :, 1] = np.linspace(0, 255, width, dtype=np.uint8)
+        cv2.putText(frame, str(i), (20, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def make_long_gop_video(path: str, seconds: int = 20, gop_seconds: int = 5, fps: int = 30) -> str:
+    """make_test_video re-encoded as H.264 with a keyframe exactly every gop_seconds (needs ffmpeg)."""
+    source = make_test_video(path + ".mp4v.mp4", seconds=seconds, fps=fps)
+    gop = str(gop_seconds * fps)
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", source, "-c:v", "libx264", "-g", gop,
+         "-keyint_min", gop, "-sc_threshold", "0", "-pix_fmt", "yuv420p", path],
+        check=True
+    )
+    return path
+
+
+def decode_jpeg(data: bytes) -> np.ndarray:
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def make_scene_video(path: str, scenes, fps: int = 10, size=(320, 180)) -> str:
+    """Write static scenes given as [(seconds, bgr_colour), ...]."""
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for seconds, colour in scenes:
+        frame = np.full((height, width, 3), colour, dtype=np.uint8)
+        for _ in range(seconds * fps):
+            writer.write(frame)
+    writer.release()
+    return path
+
+
+def time_modes(video_path: str, interval: float = 2.0):
+    results = {}
+    for mode in SAMPLING_MODES:
+        processor = VideoProcessor(frame_interval_seconds=interval, sampling_mode=mode)
+        start = time.perf_counter()
+        frames = processor.extract_frames(video_path)
+        results[mode] = (time.perf_counter() - start, frames)
+    return results
+
+
+def time_decoders(video_path: str, interval: float = 2.0, max_width: int = 0):
+    """OpenCV grab vs the ffmpeg pipe (full decode and keyframes only) at the same output size."""
+    configs = {"opencv": {"sampling_mode": "grab"}}
+    if FfmpegDecoder.available():
+        configs["ffmpeg"] = {"decoder": "ffmpeg"}
+        configs["ffmpeg-key"] = {"decoder": "ffmpeg", "keyframes_only": True}
+
+    results = {}
+    for name, kwargs in configs.items():
+        processor = VideoProcessor(frame_interval_seconds=interval, max_width=max_width, **kwargs)
+        start = time.perf_counter()
+        frames = processor.extract_frames(video_path)
+        results[name] = (time.perf_counter() - start, frames)
+    return results
+
+
+def test_sampling_modes_return_same_frames():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"))
+        results = time_modes(video_path)
+
+    baseline = results["sequential"][1]
+    assert len(baseline) == 10
+    assert [ts for ts, _ in baseline] == [i * 2.0 for i in range(10)]
+
+    for mode in ("grab", "seek", "auto"):
+        frames = results[mode][1]
+        assert [ts for ts, _ in frames] == [ts for ts, _ in baseline], mode
+        for (_, a), (_, b) in zip(frames, baseline):
+            decoded_a = cv2.imdecode(np.frombuffer(a, np.uint8), cv2.IMREAD_GRAYSCALE).astype(int)
+            decoded_b = cv2.imdecode(np.frombuffer(b, np.uint8), cv2.IMREAD_GRAYSCALE).astype(int)
+            assert np.abs(decoded_a - decoded_b).mean() < 2.0, mode
+
+
+def test_iter_frames_matches_extract_frames():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=10)
+        processor = VideoProcessor(frame_interval_seconds=1.0)
+        expected = processor.extract_frames(video_path)
+
+        assert list(processor.iter_frames(video_path, queue_depth=2)) == expected
+        assert list(processor.iter_frames(video_path, queue_depth=0)) == expected
+
+        # Closing the stream early must not leave the decoder thread blocked on a full queue
+        stream = processor.iter_frames(video_path, queue_depth=1)
+        assert next(stream) == expected[0]
+        stream.close()
+        assert not any(t.name == "frame-decoder" for t in threading.enumerate())
+
+
+def test_parallel_extraction_matches_serial():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=10)
+        for mode in SAMPLING_MODES:
+            processor = VideoProcessor(frame_interval_seconds=1.0, sampling_mode=mode)
+            expected = processor.extract_frames(video_path)
+            expected_timestamps = [ts for ts, _ in expected]
+
+            # Uneven shard counts put boundaries at different sample points
+            for shards in (2, 3, 7, 50):
+                frames = processor.extract_frames_parallel(video_path, workers=2, shards=shards)
+                assert [ts for ts, _ in frames] == expected_timestamps, (mode, shards)
+                # Timestamps come from frame indices; the content shows the shards decoded the right frames
+                for (_, a), (_, b) in zip(frames, expected):
+                    assert np.array_equal(decode_jpeg(a), decode_jpeg(b)), (mode, shards)
+
+
+def test_shared_process_pool_outlives_extractions():
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp_dir, ProcessPoolExecutor(2, mp_context=context) as pool:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=10)
+        processor = VideoProcessor(frame_interval_seconds=1.0, executor=pool)
+        expected = [ts for ts, _ in VideoProcessor(frame_interval_seconds=1.0).extract_frames(video_path)]
+        for shards in (3, 4):
+            frames = processor.extract_frames_parallel(video_path, workers=2, shards=shards)
+            assert [ts for ts, _ in frames] == expected
+        # Still usable by the next analysis
+        assert pool.submit(abs, -1).result() == 1
+
+
+def test_scene_threshold_keeps_transitions_and_max_gap():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_scene_video(
+            os.path.join(tmp_dir, "scenes.mp4"),
+            [(10, (20, 20, 20)), (6, (200, 200, 200)), (20, (20, 160, 20))]
+        )
+        processor = VideoProcessor(frame_interval_seconds=1.0, scene_threshold=0.15, scene_max_gap_seconds=15.0)
+        timestamps = [ts for ts, _ in processor.extract_frames(video_path)]
+
+    # Start, the two cuts, and one max-gap frame 15s into the last scene
+    assert timestamps == [0.0, 10.0, 16.0, 31.0]
+
+
+def test_probe_reads_metadata_once_per_content_hash():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=4, size=(320, 240))
+        probe = video_probe.probe_video(video_path, content_hash="probe-test")
+
+        assert (probe.fps, probe.frame_count, probe.width, probe.height) == (30.0, 120, 320, 240)
+        assert probe.duration_seconds == 4.0
+        assert probe.codec == "FMP4"
+
+        read_probe = video_probe._read_probe
+        video_probe._read_probe = lambda path: (_ for _ in ()).throw(AssertionError("container reopened"))
+        try:
+            assert VideoProcessor().get_video_duration(video_path, content_hash="probe-test") == 4.0
+        finally:
+            video_probe._read_probe = read_probe
+
+
+def test_ffmpeg_decoder_matches_opencv():
+    if not FfmpegDecoder.available():
+        print("ffmpeg not installed, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=10)
+        for max_width in (0, 320):
+            results = time_decoders(video_path, interval=1.0, max_width=max_width)
+            expected = results["opencv"][1]
+            frames = results["ffmpeg"][1]
+
+            assert [ts for ts, _ in frames] == [ts for ts, _ in expected]
+            for (_, a), (_, b) in zip(frames, expected):
+                decoded_a = cv2.imdecode(np.frombuffer(a, np.uint8), cv2.IMREAD_COLOR)
+                decoded_b = cv2.imdecode(np.frombuffer(b, np.uint8), cv2.IMREAD_COLOR)
+                assert decoded_a.shape == decoded_b.shape == ((180, 320, 3) if max_width else (360, 640, 3))
+                assert np.abs(decoded_a.astype(int) - decoded_b.astype(int)).mean() < 2.0
+
+            # Keyframes only keeps the sample grid, content may lag by up to a GOP
+            assert [ts for ts, _ in results["ffmpeg-key"][1]] == [ts for ts, _ in expected]
+
+        # Shard boundaries seek inside ffmpeg and must land on the same sample points
+        processor = VideoProcessor(frame_interval_seconds=1.0, decoder="ffmpeg")
+        sharded = processor.extract_frames_parallel(video_path, workers=2, shards=3)
+        serial = processor.extract_frames(video_path)
+        assert [ts for ts, _ in sharded] == [ts for ts, _ in expected]
+        for (_, a), (_, b) in zip(sharded, serial):
+            assert np.array_equal(decode_jpeg(a), decode_jpeg(b))
+
+
+def test_ffmpeg_keyframes_only_on_long_gop():
+    if not FfmpegDecoder.available():
+        print("ffmpeg not installed, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_long_gop_video(os.path.join(tmp_dir, "gop.mp4"))
+        # Sampling every GOP lands on the keyframes themselves
+        keyframes = [decode_jpeg(data) for _, data in VideoProcessor(frame_interval_seconds=5.0).extract_frames(video_path)]
+        assert len(keyframes) == 4
+
+        for interval in (1.0, 0.7):
+            expected = [ts for ts, _ in VideoProcessor(frame_interval_seconds=interval).extract_frames(video_path)]
+            processor = VideoProcessor(frame_interval_seconds=interval, decoder="ffmpeg", keyframes_only=True)
+            serial = processor.extract_frames(video_path)
+
+            # Same sample points up to the end, each showing the latest keyframe at or before it
+            assert [ts for ts, _ in serial] == expected, interval
+            for timestamp, data in serial:
+                keyframe = keyframes[int(round(timestamp * 30)) // 150]
+                assert np.abs(decode_jpeg(data).astype(int) - keyframe.astype(int)).mean() < 2.0, timestamp
+
+            # Shards seek to the keyframe before their first sample point, so none is lost or repeated
+            for shards in (3, 7):
+                sharded = processor.extract_frames_parallel(video_path, workers=2, shards=shards)
+                assert [ts for ts, _ in sharded] == expected, (interval, shards)
+                for (_, a), (_, b) in zip(sharded, serial):
+                    assert np.array_equal(decode_jpeg(a), decode_jpeg(b)), (interval, shards)
+
+
+def test_auto_sampling_seeks_only_past_the_keyframe_interval():
+    if not FfmpegDecoder.available():
+        print("ffmpeg not installed, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_long_gop_video(os.path.join(tmp_dir, "gop.mp4"))
+        assert keyframe_interval(video_path) == 150
+
+        # Samples closer together than keyframes: seeking would decode more than grabbing
+        assert VideoProcessor(frame_interval_seconds=1.0)._sampling_strategy(video_path, 30) == "grab"
+        assert VideoProcessor(frame_interval_seconds=10.0)._sampling_strategy(video_path, 300) == "seek"
+        assert VideoProcessor(sampling_mode="grab")._sampling_strategy(video_path, 300) == "grab"
+
+        expected = VideoProcessor(frame_interval_seconds=6.0, sampling_mode="sequential").extract_frames(video_path)
+        frames = VideoProcessor(frame_interval_seconds=6.0).extract_frames(video_path)
+        assert [ts for ts, _ in frames] == [ts for ts, _ in expected] == [0.0, 6.0, 12.0, 18.0]
+        for (_, a), (_, b) in zip(frames, expected):
+            assert np.array_equal(decode_jpeg(a), decode_jpeg(b))
+
+
+def test_unknown_sampling_mode_rejected():
+    try:
+        VideoProcessor(sampling_mode="random")
+    except ValueError:
+        return
+    assert False, "Expected ValueError for unknown sampling mode"
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = sys.argv[1] if len(sys.argv) > 1 else make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=60)
+        print(f"Benchmarking frame extraction on {path}")
+        results = time_modes(path)
+        baseline_time = results["sequential"][0]
+        for mode, (elapsed, frames) in results.items():
+            print(f"  {mode:<10} {elapsed:7.3f}s  {len(frames):4d} frames  {baseline_time / elapsed:5.2f}x vs sequential")
+
+        workers = os.cpu_count() or 1
+        start = time.perf_counter()
+        frames = VideoProcessor(frame_interval_seconds=2.0).extract_frames_parallel(path, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"  {'parallel':<10} {elapsed:7.3f}s  {len(frames):4d} frames  {baseline_time / elapsed:5.2f}x vs sequential ({workers} workers)")
+
+        for max_width in (0, 640):
+            print(f"Decoder backends (max_width={max_width or 'source'})")
+            results = time_decoders(path, max_width=max_width)
+            baseline_time = results["opencv"][0]
+            for name, (elapsed, frames) in results.items():
+                print(f"  {name:<10} {elapsed:7.3f}s  {len(frames):4d} frames  {baseline_time / elapsed:5.2f}x vs opencv")
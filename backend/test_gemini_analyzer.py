@@ -0,0 +1,378 @@
+"""
+Offline checks for GeminiAnalyzer windowing, prompt building and response parsing.
+The Vertex AI client is replaced with a fake, so no credentials are needed.
+"""
+
+import asyncio
+import json
+import os
+import re
+import tempfile
+
+import cv2
+import numpy as np
+
+from app.services.gemini_analyzer import GeminiAnalyzer
+from app.services.proxy_clip import ProxyClipEncoder
+from app.services.response_cache import ResponseCache
+from app.services.temporal_refiner import TemporalRefiner
+from app.services.video_processor import VideoProcessor
+from app.utils.contact_sheet import ContactSheetBuilder
+from app.utils.event_stream_parser import EventStreamParser
+from app.utils.temporal_nms import suppress_duplicate_events
+from test_frame_extraction import make_test_video
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeModels:
+    """
+    Records requests and answers with one event on the given frame of each request,
+    or, with event_timestamp, on whichever frame of the request has that timestamp.
+    """
+    def __init__(self, frame_number: int = 0, extra: dict = None, event_timestamp: float = None):
+        self.frame_number = frame_number
+        self.extra = extra or {}
+        self.event_timestamp = event_timestamp
+        self.requests = []
+
+    def generate_content(self, model, contents, config=None):
+        self.requests.append(contents)
+        frame_number = self.frame_number
+        if self.event_timestamp is not None:
+            listed = {float(ts): int(i) for i, ts in re.findall(r"Frame (\d+): ([\d.]+)s", contents[0])}
+            frame_number = listed.get(self.event_timestamp, -1)
+        event = {
+            "attribute": "Main Logo",
+            "frame_number": frame_number,
+            "clue_description": "Logo appears",
+            "confidence": 0.9,
+        }
+        event.update(self.extra)
+        # frame_number at the top level answers refinement requests
+        body = {"events": [event], "frame_number": self.frame_number}
+        return FakeResponse("```json\n" + json.dumps(body) + "\n```")
+
+
+class FakeAsyncModels:
+    """
+    client.aio.models: streams FakeModels' answer in small chunks after a delay,
+    optionally cut off after truncate_at characters, and tracks streams in flight.
+    """
+    def __init__(self, models: FakeModels, delay: float = 0.0, truncate_at: int = None):
+        self.models = models
+        self.delay = delay
+        self.truncate_at = truncate_at
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        text = self.models.generate_content(model, contents, config).text
+        return self._chunks(text[:self.truncate_at])
+
+    async def _chunks(self, text: str):
+        try:
+            for start in range(0, len(text), 16):
+                await asyncio.sleep(0)
+                yield FakeResponse(text[start:start + 16])
+        finally:
+            self.in_flight -= 1
+
+
+class FakeAio:
+    def __init__(self, models: FakeModels, **kwargs):
+        self.models = FakeAsyncModels(models, **kwargs)
+
+
+class FakeClient:
+    def __init__(self, models: FakeModels, **kwargs):
+        self.models = models
+        self.aio = FakeAio(models, **kwargs)
+
+
+def make_analyzer(models: FakeModels, **kwargs) -> GeminiAnalyzer:
+    return GeminiAnalyzer(project_id="test-project", client=FakeClient(models), **kwargs)
+
+
+def jpeg(value: int, size=(64, 36)) -> bytes:
+    image = np.full((size[1], size[0], 3), value, np.uint8)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def test_frame_stream_is_sent_in_windows():
+    models = FakeModels(frame_number=1)
+    analyzer = make_analyzer(models)
+    frames = ((i * 2.0, jpeg(i)) for i in range(7))
+
+    events, frame_count = asyncio.run(analyzer.analyze_frame_stream(frames, ["Main Logo"], window_size=3))
+
+    assert frame_count == 7
+    assert [len(contents) - 1 for contents in models.requests] == [3, 3, 1]
+    # Frame 1 of each window; the last window only has frame 0 so its answer is dropped
+    assert [e["timestamp_seconds"] for e in events] == [2.0, 8.0]
+
+
+def test_overlapping_windows_report_shared_event_once():
+    models = FakeModels(event_timestamp=4.0)
+    analyzer = make_analyzer(models)
+    frames = [(i * 2.0, jpeg(i)) for i in range(7)]
+
+    events, frame_count = asyncio.run(
+        analyzer.analyze_frame_stream(frames, ["Main Logo"], window_size=3, overlap=1)
+    )
+
+    # Windows 0-2, 2-4, 4-6; frame 2 (4.0s) is in the first two windows
+    assert frame_count == 7
+    assert [len(contents) - 1 for contents in models.requests] == [3, 3, 3]
+    assert [e["timestamp_seconds"] for e in events] == [4.0]
+
+
+def test_windows_run_concurrently_up_to_limit():
+    models = FakeModels(frame_number=0)
+    analyzer = make_analyzer(models)
+    analyzer.client = FakeClient(models, delay=0.05)
+    frames = [(i * 2.0, jpeg(i)) for i in range(20)]
+
+    events, _ = asyncio.run(
+        analyzer.analyze_frame_stream(frames, ["Main Logo"], window_size=2, concurrency=3)
+    )
+
+    assert analyzer.client.aio.models.max_in_flight == 3
+    # Results come back in window order regardless of completion order
+    assert [e["timestamp_seconds"] for e in events] == [i * 4.0 for i in range(10)]
+
+
+def test_region_windows_run_concurrently():
+    models = FakeModels(frame_number=0)
+    analyzer = make_analyzer(models)
+    analyzer.client = FakeClient(models, delay=0.05)
+    tiles = [(i * 2.0, {"top": jpeg(i), "bottom": jpeg(255 - i)}) for i in range(6)]
+    streamed = []
+
+    events, sample_count, sent_count = asyncio.run(analyzer.analyze_region_stream(
+        tiles, {"top": ["Main Logo"], "bottom": ["Score Bug"]},
+        window_size=2, concurrency=4, on_event=streamed.append
+    ))
+
+    # Three windows per region, both regions' windows in flight together
+    assert (sample_count, sent_count, len(models.requests)) == (6, 6, 6)
+    assert analyzer.client.aio.models.max_in_flight == 4
+    # The fake always answers "Main Logo": only the top region may report it
+    assert [e["timestamp_seconds"] for e in events] == [0.0, 4.0, 8.0]
+    assert sorted(e["timestamp_seconds"] for e in streamed) == [0.0, 4.0, 8.0]
+
+
+def test_checkpoint_resume_matches_an_uninterrupted_run():
+    frames = [(i * 2.0, jpeg(i)) for i in range(11)]
+    full_models = FakeModels(frame_number=0)
+    checkpoints = []
+    full_events, _ = asyncio.run(make_analyzer(full_models).analyze_frame_stream(
+        frames, ["Main Logo"], window_size=3, overlap=1, merge_seconds=1.0,
+        on_checkpoint=lambda *checkpoint: checkpoints.append(checkpoint)
+    ))
+
+    # Windows start at 0, 4, 8, 12 and 16s; one checkpoint per window but the last
+    assert [(resume_from, windows, frames_done) for resume_from, windows, frames_done, _ in checkpoints] == [
+        (4.0, 1, 3), (8.0, 2, 5), (12.0, 3, 7), (16.0, 4, 9)
+    ]
+
+    # Stopped after two windows: the rest of the video goes up from 8s on
+    resume_from, _, _, done_events = checkpoints[1]
+    models = FakeModels(frame_number=0)
+    events, frame_count = asyncio.run(make_analyzer(models).analyze_frame_stream(
+        [frame for frame in frames if frame[0] >= resume_from], ["Main Logo"],
+        window_size=3, overlap=1, merge_seconds=1.0
+    ))
+    resumed = suppress_duplicate_events(done_events + events, 1.0)
+
+    assert frame_count == 7 and len(models.requests) == len(full_models.requests) - 2
+    assert [e["timestamp_seconds"] for e in resumed] == [e["timestamp_seconds"] for e in full_events]
+
+
+def test_stream_parser_yields_events_as_they_complete():
+    parser = EventStreamParser()
+    text = '```json\n{"events": [{"attribute": "Main Logo", "clue_description": "a {brace} and \\"quote\\"", "frame_number": 1}, {"attribute": "Copy'
+    found = []
+    for start in range(0, len(text), 5):
+        found.extend(parser.feed(text[start:start + 5]))
+
+    assert [e["attribute"] for e in found] == ["Main Logo"]
+    assert found[0]["clue_description"] == 'a {brace} and "quote"'
+    assert not parser.done
+    assert [e["attribute"] for e in parser.feed('right", "frame_number": 2}]}\n```')] == ["Copyright"]
+    assert parser.done
+
+
+def test_truncated_stream_keeps_events_parsed_so_far():
+    class TwoEvents(FakeModels):
+        def generate_content(self, model, contents, config=None):
+            self.requests.append(contents)
+            events = [
+                {"attribute": "Main Logo", "frame_number": 0, "clue_description": "Logo", "confidence": 0.9},
+                {"attribute": "Copyright", "frame_number": 2, "clue_description": "Text", "confidence": 0.8},
+            ]
+            return FakeResponse(json.dumps({"events": events}))
+
+    models = TwoEvents()
+    full_text = models.generate_content(None, [""]).text
+    analyzer = make_analyzer(models)
+    # Cut the response in the middle of the second event
+    analyzer.client = FakeClient(models, truncate_at=full_text.index("Copyright") + 4)
+    frames = [(i * 2.0, jpeg(i)) for i in range(3)]
+    streamed = []
+
+    events = asyncio.run(analyzer.analyze_frames_async(frames, ["Main Logo", "Copyright"], on_event=streamed.append))
+
+    assert [(e["attribute"], e["timestamp_seconds"]) for e in events] == [("Main Logo", 0.0)]
+    assert streamed == events
+
+
+def test_temporal_nms_keeps_most_confident_event():
+    events = [
+        {"attribute": "Main Logo", "timestamp_seconds": 10.0, "confidence_score": 0.6},
+        {"attribute": "Main Logo", "timestamp_seconds": 12.0, "confidence_score": 0.9},
+        {"attribute": "Copyright", "timestamp_seconds": 12.0, "confidence_score": 0.5},
+        {"attribute": "Main Logo", "timestamp_seconds": 30.0, "confidence_score": 0.4},
+    ]
+
+    kept = suppress_duplicate_events(events, window_seconds=4.0)
+
+    assert [(e["attribute"], e["timestamp_seconds"]) for e in kept] == [
+        ("Main Logo", 12.0), ("Copyright", 12.0), ("Main Logo", 30.0)
+    ]
+    assert len(suppress_duplicate_events(events)) == 4
+
+
+def test_response_cache_answers_identical_requests():
+    models = FakeModels(frame_number=1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ResponseCache(os.path.join(tmp_dir, "responses.db"), max_bytes=1 << 20, ttl_seconds=3600)
+        analyzer = make_analyzer(models, response_cache=cache)
+        frames = [(i * 2.0, jpeg(i)) for i in range(3)]
+
+        first = analyzer.analyze_frames(frames, ["Main Logo"])
+        events, _ = asyncio.run(analyzer.analyze_frame_stream(frames, ["Main Logo"], window_size=3))
+        assert events == first
+        assert len(models.requests) == 1
+
+        # Any change to what is sent is a different request
+        analyzer.analyze_frames(frames, ["Main Logo", "Copyright"])
+        analyzer.analyze_frames(frames[:2] + [(4.0, jpeg(200))], ["Main Logo"])
+        assert len(models.requests) == 3
+        assert (cache.hits, cache.misses) == (1, 3)
+
+        # Persisted: a new cache on the same file still answers
+        reopened = ResponseCache(cache.db_path, max_bytes=1 << 20, ttl_seconds=3600)
+        assert make_analyzer(models, response_cache=reopened).analyze_frames(frames, ["Main Logo"]) == first
+        assert len(models.requests) == 3
+        cache.close()
+        reopened.close()
+
+
+def test_response_cache_expiry_and_eviction():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ResponseCache(os.path.join(tmp_dir, "responses.db"), max_bytes=25, ttl_seconds=3600)
+        cache.put("a", "x" * 10)
+        cache.put("b", "y" * 10)
+        assert cache.get("a") == "x" * 10
+        # Over budget: "b" is now least recently used
+        cache.put("c", "z" * 10)
+        assert cache.get("b") is None
+        assert cache.stats()["entries"] == 2
+
+        cache.ttl_seconds = -1
+        assert cache.get("a") is None
+        assert cache.stats()["entries"] == 1
+        cache.close()
+
+
+def test_prompt_marks_deduplicated_spans():
+    models = FakeModels()
+    analyzer = make_analyzer(models)
+    analyzer.analyze_frames([(0.0, jpeg(0)), (10.0, jpeg(255))], ["Main Logo"], frame_spans={0.0: 8.0})
+
+    prompt = models.requests[0][0]
+    assert "Frame 0: 0.00s (unchanged until 8.00s)" in prompt
+    assert "Frame 1: 10.00s\n" in prompt
+
+
+def test_contact_sheet_cells_map_back_to_timestamps():
+    sheet = ContactSheetBuilder(columns=2, rows=2, cell_width=64)
+    models = FakeModels(extra={"frame_number": None, "sheet_number": 1, "cell_number": 2})
+    analyzer = make_analyzer(models, contact_sheet=sheet)
+    frames = [(i * 2.0, jpeg(i * 20)) for i in range(7)]
+
+    events = analyzer.analyze_frames(frames, ["Main Logo"])
+
+    # 7 frames on 2x2 sheets -> 2 image parts; sheet 1 cell 2 is frame 6
+    assert len(models.requests[0]) == 3
+    assert events[0]["timestamp_seconds"] == 12.0
+    assert "2x2 grid" in models.requests[0][0]
+
+    image = cv2.imdecode(np.frombuffer(sheet.build(frames[:4]), np.uint8), cv2.IMREAD_COLOR)
+    assert image.shape[:2] == (72, 128)
+
+
+def test_refinement_reextracts_window_before_coarse_detection():
+    models = FakeModels(frame_number=3)
+    analyzer = make_analyzer(models)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=10)
+        refiner = TemporalRefiner(VideoProcessor(), analyzer, coarse_interval_seconds=2.0, fine_interval_seconds=0.2)
+        event = {"attribute": "Main Logo", "timestamp_seconds": 6.0, "clue_description": "Logo appears"}
+
+        refined = refiner.refine_event(video_path, event)
+
+    # Window 4.0s..6.0s at 0.2s -> 11 frames; frame 3 is 4.6s
+    assert len(models.requests[0]) == 1 + 11
+    assert abs(refined["timestamp_seconds"] - 4.6) < 1e-9
+    assert refined["coarse_timestamp_seconds"] == 6.0
+
+
+def test_clip_mode_anchors_offsets_to_broadcast_time():
+    if not ProxyClipEncoder.available():
+        print("ffmpeg not installed, skipping")
+        return
+
+    models = FakeModels(extra={"offset_seconds": "0:12"})
+    analyzer = make_analyzer(models)
+    encoder = ProxyClipEncoder(max_width=160, fps=1.0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=40)
+        frames_bytes = os.path.getsize(video_path)
+        events, clip_count = asyncio.run(analyzer.analyze_video_clips(
+            video_path, ["Main Logo"], 40.0, encoder, window_seconds=20, overlap_seconds=5, concurrency=2
+        ))
+
+    # Windows start at 0s, 15s and 30s (the last one only 10s long, too short for a 12s offset)
+    assert clip_count == 3
+    assert [e["timestamp_seconds"] for e in events] == [12.0, 27.0]
+    prompt, clip = next(request for request in models.requests if "starting 15.00s" in request[0])
+    assert "20.0-second excerpt" in prompt
+    assert clip.inline_data.mime_type == "video/mp4" and clip.video_metadata.fps == 1.0
+    assert len(clip.inline_data.data) < frames_bytes / 10
+
+
+if __name__ == "__main__":
+    test_refinement_reextracts_window_before_coarse_detection()
+    test_frame_stream_is_sent_in_windows()
+    test_overlapping_windows_report_shared_event_once()
+    test_windows_run_concurrently_up_to_limit()
+    test_region_windows_run_concurrently()
+    test_checkpoint_resume_matches_an_uninterrupted_run()
+    test_stream_parser_yields_events_as_they_complete()
+    test_truncated_stream_keeps_events_parsed_so_far()
+    test_temporal_nms_keeps_most_confident_event()
+    test_response_cache_answers_identical_requests()
+    test_response_cache_expiry_and_eviction()
+    test_prompt_marks_deduplicated_spans()
+    test_contact_sheet_cells_map_back_to_timestamps()
+    test_clip_mode_anchors_offsets_to_broadcast_time()
+    print("✅ GeminiAnalyzer offline checks passed")
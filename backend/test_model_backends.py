@@ -0,0 +1,142 @@
+"""
+Offline checks for the stub, record and replay model backends. The stub runs on a
+local port and is reached through the real genai SDK, so no credentials are needed.
+"""
+
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import uvicorn
+from google.genai import errors
+
+from app.services.call_guard import CallGuard
+from app.services.call_metrics import CallMetrics
+from app.services.gemini_analyzer import GeminiAnalyzer
+from app.services.model_backends import RecordingClient, ReplayClient, create_model_client
+from app.services.model_stub import create_stub_app, synthesize_response
+from test_gemini_analyzer import jpeg
+
+ATTRIBUTES = ["Main Logo", "Goal Celebration"]
+
+
+@contextmanager
+def running_stub(**kwargs):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    stub_app = create_stub_app(**kwargs)
+    server = uvicorn.Server(uvicorn.Config(stub_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.02)
+    try:
+        yield stub_app, f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def make_analyzer(client, metrics=None, **guard_kwargs) -> GeminiAnalyzer:
+    guard = CallGuard(**guard_kwargs)
+    guard.max_wait_seconds = 0.01
+    return GeminiAnalyzer(project_id="test-project", client=client, call_guard=guard, metrics=metrics)
+
+
+def frames(count: int = 6):
+    return [(i * 2.0, jpeg(i)) for i in range(count)]
+
+
+def test_stub_answers_analysis_prompts():
+    with running_stub() as (stub_app, url):
+        analyzer = make_analyzer(create_model_client("stub", stub_url=url))
+
+        events = analyzer.analyze_frames(frames(), ATTRIBUTES)
+        streamed = asyncio.run(analyzer.analyze_frames_async(frames(), ATTRIBUTES))
+
+    assert sorted(e["attribute"] for e in events) == sorted(ATTRIBUTES)
+    assert streamed == events
+    assert stub_app.state.requests == 2
+
+
+def test_call_metrics_record_usage_and_timing():
+    process_metrics = CallMetrics(max_recent=1)
+    metrics = CallMetrics(parent=process_metrics)
+    with running_stub(latency_seconds=0.05) as (stub_app, url):
+        analyzer = make_analyzer(create_model_client("stub", stub_url=url), metrics=metrics)
+        analyzer.analyze_frames(frames(), ATTRIBUTES)
+        asyncio.run(analyzer.analyze_frames_async(frames(), ATTRIBUTES))
+
+    plain, streamed = metrics.calls
+    assert plain['ttfb_seconds'] is None and not plain['streamed']
+    assert 0.05 <= streamed['ttfb_seconds'] <= streamed['wall_seconds']
+    for call in (plain, streamed):
+        assert call['ok'] and call['retries'] == 0
+        assert call['images'] == 6 and call['payload_bytes'] > sum(len(image) for _, image in frames())
+        # The stub charges the same fixed cost per image as Gemini
+        assert call['prompt_tokens'] > 6 * 258 and call['output_tokens'] > 0
+
+    summary = metrics.summary()
+    assert summary['calls'] == 2 and summary['wall_seconds']['count'] == 2
+    assert summary['total_tokens'] == plain['total_tokens'] + streamed['total_tokens']
+    # The process-wide collector keeps totals beyond its recent-call window
+    assert process_metrics.summary()['total_tokens'] == summary['total_tokens']
+    assert len(process_metrics.summary(include_calls=True)['call_details']) == 1
+
+
+def test_stub_errors_are_retried_then_raised():
+    metrics = CallMetrics()
+    with running_stub(error_rate=1.0) as (stub_app, url):
+        analyzer = make_analyzer(create_model_client("stub", stub_url=url), metrics=metrics, max_attempts=3)
+        try:
+            analyzer.analyze_frames(frames(), ATTRIBUTES)
+        except errors.ServerError as e:
+            assert e.code == 503
+        else:
+            assert False, "Expected the injected 503 to be raised"
+
+    assert stub_app.state.requests == 3
+    call, = metrics.calls
+    assert not call['ok'] and call['retries'] == 2
+
+
+def test_recording_replays_without_network():
+    recording_path = os.path.join(tempfile.mkdtemp(), "recording.jsonl")
+    with running_stub() as (stub_app, url):
+        recorder = make_analyzer(RecordingClient(create_model_client("stub", stub_url=url), recording_path))
+        recorded = recorder.analyze_frames(frames(), ATTRIBUTES)
+        recorded_stream = asyncio.run(recorder.analyze_frames_async(frames(4), ATTRIBUTES))
+
+    # The stub is down: every answer now comes from the recording
+    replayer = make_analyzer(ReplayClient(recording_path))
+    assert replayer.analyze_frames(frames(), ATTRIBUTES) == recorded
+    assert asyncio.run(replayer.analyze_frames_async(frames(4), ATTRIBUTES)) == recorded_stream
+    # A streamed recording also answers the non-streaming call
+    assert replayer.analyze_frames(frames(4), ATTRIBUTES) == recorded_stream
+
+    try:
+        replayer.analyze_frames(frames(5), ATTRIBUTES)
+    except LookupError:
+        pass
+    else:
+        assert False, "Expected LookupError for an unrecorded request"
+
+
+def test_synthesized_answers_are_repeatable():
+    prompt = "Analyze these 10 frames and identify these event types:\nMain Logo, Red Card\n"
+    assert synthesize_response(prompt) == synthesize_response(prompt)
+    assert '"attribute": "Red Card"' in synthesize_response(prompt)
+
+
+if __name__ == "__main__":
+    test_stub_answers_analysis_prompts()
+    test_call_metrics_record_usage_and_timing()
+    test_stub_errors_are_retried_then_raised()
+    test_recording_replays_without_network()
+    test_synthesized_answers_are_repeatable()
+    print("✅ Model backend checks passed")
@@ -0,0 +1,64 @@
+"""
+Check ROI region parsing, attribute grouping and per-region tile extraction.
+"""
+
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from app.services.roi_profiles import FULL_FRAME, group_attributes, parse_region
+from app.services.video_processor import VideoProcessor
+from test_frame_extraction import make_test_video
+
+
+def test_parse_region_specs():
+    region = parse_region("top-right 20%")
+    assert (region.x, region.y, region.width, region.height) == (0.8, 0.0, 0.2, 0.2)
+
+    region = parse_region("bottom 15%")
+    assert (region.x, region.width) == (0.0, 1.0)
+    assert abs(region.y - 0.85) < 1e-9
+
+    region = parse_region("0.5,0.5,0.25,0.25")
+    assert (region.x, region.y, region.width, region.height) == (0.5, 0.5, 0.25, 0.25)
+
+    for bad in ("sideways 20%", "top-right big", "0.9,0,0.5,0.5"):
+        try:
+            parse_region(bad)
+        except ValueError:
+            continue
+        assert False, f"Expected ValueError for {bad}"
+
+
+def test_group_attributes_by_region():
+    groups = group_attributes(
+        ["Main Logo", "Scoreboard", "Replay Graphic", "Post-Game Start"],
+        {"Main Logo": "top-right 20%", "Scoreboard": "top-right 20%"}
+    )
+    assert groups["top-right 20%"][1] == ["Main Logo", "Scoreboard"]
+    assert groups[FULL_FRAME][1] == ["Replay Graphic", "Post-Game Start"]
+
+
+def test_region_tiles_are_cropped_and_downscaled():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_test_video(os.path.join(tmp_dir, "sample.mp4"), seconds=4, size=(1280, 720))
+        regions = {"top-right 20%": parse_region("top-right 20%"), FULL_FRAME: parse_region(FULL_FRAME)}
+        tiles = list(VideoProcessor(frame_interval_seconds=2.0).iter_region_frames(
+            video_path, regions, tile_max_width=320
+        ))
+
+    assert [ts for ts, _ in tiles] == [0.0, 2.0]
+    corner = cv2.imdecode(np.frombuffer(tiles[0][1]["top-right 20%"], np.uint8), cv2.IMREAD_COLOR)
+    full = cv2.imdecode(np.frombuffer(tiles[0][1][FULL_FRAME], np.uint8), cv2.IMREAD_COLOR)
+    assert corner.shape[:2] == (144, 256)
+    assert full.shape[:2] == (180, 320)
+    assert len(tiles[0][1]["top-right 20%"]) < len(tiles[0][1][FULL_FRAME])
+
+
+if __name__ == "__main__":
+    test_parse_region_specs()
+    test_group_attributes_by_region()
+    test_region_tiles_are_cropped_and_downscaled()
+    print("✅ ROI checks passed")
@@ -0,0 +1,96 @@
+"""
+Offline checks for SingleFlight, which coalesces identical analyses in progress.
+"""
+
+import asyncio
+
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    calls = []
+
+    async def analyse():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"events": [1, 2]}
+
+    async def scenario():
+        flights = SingleFlight()
+        first = asyncio.create_task(flights.run("video-a", analyse))
+        await asyncio.sleep(0)
+        assert flights.running("video-a") and not flights.running("video-b")
+        results = await asyncio.gather(first, flights.run("video-a", analyse), flights.run("video-b", analyse))
+        return flights, results
+
+    flights, results = asyncio.run(scenario())
+    assert len(calls) == 2  # one per key
+    assert results[0] is results[1]
+    assert not flights.running("video-a")
+
+
+def test_waiters_share_the_error_and_the_key_is_freed():
+    async def failing():
+        await asyncio.sleep(0.02)
+        raise ValueError("unreadable")
+
+    async def scenario():
+        flights = SingleFlight()
+        outcomes = await asyncio.gather(
+            flights.run("k", failing), flights.run("k", failing), return_exceptions=True
+        )
+        again = await flights.run("k", lambda: asyncio.sleep(0, result="fresh"))
+        return outcomes, again
+
+    outcomes, again = asyncio.run(scenario())
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert again == "fresh"
+
+
+def test_cancelled_waiter_leaves_the_run_alone():
+    async def analyse():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        flights = SingleFlight()
+        leader = asyncio.create_task(flights.run("k", analyse))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.run("k", analyse))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader, waiter.cancelled()
+
+    assert asyncio.run(scenario()) == ("done", True)
+
+
+def test_waiter_takes_over_from_a_cancelled_leader():
+    calls = []
+
+    async def analyse(name):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        return f"done by {name}"
+
+    async def scenario():
+        flights = SingleFlight()
+        leader = asyncio.create_task(flights.run("k", lambda: analyse("leader")))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(flights.run("k", lambda name=name: analyse(name))) for name in ("a", "b")]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        return leader.cancelled(), results, flights.running("k")
+
+    cancelled, results, running = asyncio.run(scenario())
+    assert cancelled
+    # The first waiter runs the analysis again, the second waits for it
+    assert results == ["done by a", "done by a"]
+    assert calls == ["leader", "a"] and not running
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_one_run()
+    test_waiters_share_the_error_and_the_key_is_freed()
+    test_cancelled_waiter_leaves_the_run_alone()
+    test_waiter_takes_over_from_a_cancelled_leader()
+    print("✅ Single flight checks passed")
@@ -0,0 +1,115 @@
+"""
+Check the local template pre-detector on synthetic frames with a corner logo.
+"""
+
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from app.services.template_detector import TemplateDetector
+
+
+def make_logo() -> np.ndarray:
+    logo = np.zeros((40, 60), np.uint8)
+    cv2.putText(logo, "TV", (5, 32), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 255, 3)
+    return logo
+
+
+def make_frame(seed: int, logo: np.ndarray = None, logo_strength: float = 1.0) -> bytes:
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 80, (180, 320), dtype=np.uint8)
+    if logo is not None:
+        patch = frame[10:50, 250:310].astype(float)
+        frame[10:50, 250:310] = np.clip(patch * (1 - logo_strength) + logo * logo_strength, 0, 255).astype(np.uint8)
+    return cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR), [int(cv2.IMWRITE_JPEG_QUALITY), 95])[1].tobytes()
+
+
+def load_detector(tmp_dir: str, logo: np.ndarray, **kwargs) -> TemplateDetector:
+    attribute_dir = os.path.join(tmp_dir, "network_a", "Main Logo")
+    os.makedirs(attribute_dir)
+    cv2.imwrite(os.path.join(attribute_dir, "logo.png"), logo)
+    return TemplateDetector.from_library(
+        tmp_dir, "network_a", ["Main Logo", "Scoreboard"], roi_profiles={"Main Logo": "top-right 30%"}, **kwargs
+    )
+
+
+def test_confident_logo_appearance_becomes_local_event():
+    logo = make_logo()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        detector = load_detector(tmp_dir, logo)
+
+    # Scoreboard has no templates and stays with Gemini
+    assert detector.attributes == ["Main Logo"]
+
+    frames = [(i * 2.0, make_frame(i, logo if i >= 3 else None)) for i in range(6)]
+    assert list(detector.screen(frames)) == frames
+
+    assert [(e['attribute'], e['timestamp_seconds']) for e in detector.events] == [("Main Logo", 6.0)]
+    assert detector.ambiguous_frames == []
+
+
+def test_faint_logo_is_left_to_gemini():
+    logo = make_logo()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        detector = load_detector(tmp_dir, logo)
+
+    frames = [(0.0, make_frame(0)), (2.0, make_frame(1, logo, logo_strength=0.2)), (4.0, make_frame(2, logo))]
+    for frame in frames:
+        detector.process(*frame)
+
+    # Faint frame is ambiguous, so the transition is not decided locally
+    assert detector.events == []
+    assert [ts for ts, _ in detector.ambiguous_frames] == [0.0, 2.0, 4.0]
+    # The stretch runs from the context frame to the frame where the logo settles
+    assert detector.ambiguous_spans["Main Logo"] == [[0.0, 4.0]]
+
+    remote = [
+        {'attribute': 'Main Logo', 'timestamp_seconds': 0.0},  # on the context frame
+        {'attribute': 'Main Logo', 'timestamp_seconds': 3.0},  # between samples
+        {'attribute': 'Main Logo', 'timestamp_seconds': 4.8},
+        {'attribute': 'Main Logo', 'timestamp_seconds': 9.0},
+        {'attribute': 'Scoreboard', 'timestamp_seconds': 2.0},
+    ]
+    assert detector.keep_remote_events(remote) == remote[:2]
+    assert detector.keep_remote_events(remote, tolerance_seconds=1.0) == remote[:3]
+
+
+def test_ambiguous_frames_are_handed_over_in_windows():
+    logo = make_logo()
+    windows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        detector = load_detector(
+            tmp_dir, logo, window_size=4, on_window=lambda frames, attributes: windows.append(
+                ([ts for ts, _ in frames], attributes)
+            )
+        )
+
+    # Three faint stretches, each with a clear frame before it
+    frames = []
+    for stretch in range(3):
+        base = stretch * 10.0
+        frames += [(base, make_frame(stretch * 3)),
+                   (base + 2.0, make_frame(stretch * 3 + 1, logo, logo_strength=0.2)),
+                   (base + 4.0, make_frame(stretch * 3 + 2))]
+    for frame in detector.screen(frames):
+        # Never more than a window's worth waiting
+        assert len(detector.ambiguous_frames) <= 4
+
+    assert windows == [([0.0, 2.0, 10.0, 12.0], ["Main Logo"]), ([20.0, 22.0], ["Main Logo"])]
+    assert detector.ambiguous_frames == [] and detector.ambiguous_count == 6
+    assert detector.ambiguous_spans["Main Logo"] == [[0.0, 2.0], [10.0, 12.0], [20.0, 22.0]]
+
+
+def test_missing_family_disables_detector():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        assert TemplateDetector.from_library(tmp_dir, "unknown", ["Main Logo"]) is None
+
+
+if __name__ == "__main__":
+    test_confident_logo_appearance_becomes_local_event()
+    test_faint_logo_is_left_to_gemini()
+    test_ambiguous_frames_are_handed_over_in_windows()
+    test_missing_family_disables_detector()
+    print("✅ Template detector checks passed")
@@ -0,0 +1,114 @@
+"""
+Offline checks for streamed uploads: hashing while copying, unique files,
+format and size enforcement, and early 413s from the size limit middleware.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+
+from app.services.upload_store import (
+    UnsupportedVideoFormatError, UploadSizeLimitMiddleware, UploadStore, UploadTooLargeError
+)
+
+
+def upload_file(data: bytes, filename: str = "match.mp4", content_type: str = "video/mp4") -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=filename, headers=Headers({"content-type": content_type}))
+
+
+def make_store(upload_dir: str, max_bytes: int = 1024 * 1024) -> UploadStore:
+    return UploadStore(upload_dir, max_bytes=max_bytes, allowed_formats=["mp4", "webm", "mov"], chunk_size=1000)
+
+
+def test_upload_is_hashed_while_copied_to_unique_files():
+    data = os.urandom(10_500)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = make_store(tmp_dir)
+
+        async def both():
+            return await asyncio.gather(store.save(upload_file(data)), store.save(upload_file(data)))
+
+        first, second = asyncio.run(both())
+        assert first.path != second.path
+        assert first.content_hash == second.content_hash == hashlib.sha256(data).hexdigest()
+        assert first.size_bytes == len(data) and first.filename == "match.mp4"
+        assert first.path.endswith(".mp4")
+        with open(first.path, "rb") as f:
+            assert f.read() == data
+
+
+def test_oversized_upload_stops_early_and_leaves_nothing():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = io.BytesIO(os.urandom(50_000))
+        upload = UploadFile(source, filename="match.mp4")
+        try:
+            asyncio.run(make_store(tmp_dir, max_bytes=5_000).save(upload))
+        except UploadTooLargeError:
+            pass
+        else:
+            assert False, "Expected UploadTooLargeError"
+        assert os.listdir(tmp_dir) == []
+        # Stopped at the first chunk past the limit instead of reading the rest
+        assert source.tell() <= 6_000
+
+
+def test_formats_follow_allowed_list():
+    store = make_store(tempfile.gettempdir())
+    assert store.video_format("match.MOV", "application/octet-stream") == "mov"
+    assert store.video_format("blob", "video/webm") == "webm"
+    for filename, content_type in (("match.avi", "video/x-msvideo"), ("setup.exe", "application/octet-stream")):
+        try:
+            store.video_format(filename, content_type)
+        except UnsupportedVideoFormatError:
+            continue
+        assert False, f"Expected {filename} to be rejected"
+
+
+def make_limited_app(max_bytes: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(video_file: UploadFile = File(...)):
+        return {"size": len(await video_file.read())}
+
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=max_bytes, path_prefix="/upload")
+    return app
+
+
+def test_middleware_rejects_declared_and_streamed_oversized_bodies():
+    client = TestClient(make_limited_app(max_bytes=2_000))
+    small = client.post("/upload", files={"video_file": ("a.mp4", b"x" * 500, "video/mp4")})
+    assert small.status_code == 200 and small.json() == {"size": 500}
+
+    declared = client.post("/upload", files={"video_file": ("a.mp4", b"x" * 5_000, "video/mp4")})
+    assert declared.status_code == 413
+
+    # Chunked transfer: no Content-Length, so the limit applies as the body streams in
+    boundary = "limit-test"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"video_file\"; filename=\"a.mp4\"\r\n"
+            f"Content-Type: video/mp4\r\n\r\n").encode()
+
+    def body():
+        yield head
+        for _ in range(10):
+            yield b"x" * 1_000
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    streamed = client.post(
+        "/upload", content=body(), headers={"content-type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert streamed.status_code == 413
+
+
+if __name__ == "__main__":
+    test_upload_is_hashed_while_copied_to_unique_files()
+    test_oversized_upload_stops_early_and_leaves_nothing()
+    test_formats_follow_allowed_list()
+    test_middleware_rejects_declared_and_streamed_oversized_bodies()
+    print("✅ Upload store checks passed")
@@ -7,7 +7,7 @@ mkdir -p /app/backend/data /app/backend/uploads/videos
 # Initialise DB tables and seed demo data (idempotent — safe to run every boot)
 cd /app/backend
 echo "--- Initialising database tables ---"
-python -c "from app.database import engine, Base; import app.models; Base.metadata.create_all(bind=engine); print('✅ Tables ready')"
+python -m app.init_db
 
 echo "--- Seeding demo data ---"
 python seed_ground_truth.py